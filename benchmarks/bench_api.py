@@ -0,0 +1,93 @@
+"""以模拟 API 进行的端到端基准测试, 覆盖链接解析, 曲目详情分块获取, 歌词获取与写入
+
+运行: python -m benchmarks.bench_api [--latency 0.05] [--error-rate 0.02] [--json result.json]
+"""
+
+from argparse import ArgumentParser
+from asyncio import run
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from ncmlyrics.app import NCMLyricsApp
+from ncmlyrics.type import CacheMode, LrcType
+from ncmlyrics.util import dumpJson
+
+from .mock import MockNCMTransport
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的平均延迟, 单位为秒")
+    parser.add_argument("--jitter", type=float, default=0.2, help="延迟的浮动比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="响应 503 的概率")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="连接错误的概率")
+    parser.add_argument("--playlists", type=int, default=2)
+    parser.add_argument("--tracks", type=int, default=1000, help="每个歌单的曲目数量")
+    parser.add_argument("--embedded", type=int, default=100, help="每个歌单中附带详情的曲目数量")
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="将结果以 Json 格式写入此文件, 以便在提交之间比较")
+    args = parser.parse_args()
+
+    transport = MockNCMTransport(
+        latency=args.latency,
+        jitter=args.jitter,
+        errorRate=args.error_rate,
+        resetRate=args.reset_rate,
+        playlists=args.playlists,
+        tracks=args.tracks,
+        embedded=args.embedded,
+        seed=args.seed,
+    )
+
+    with TemporaryDirectory() as directory:
+        app = NCMLyricsApp(
+            exist=False,
+            noPureMusic=False,
+            noProgressBar=True,
+            overwrite=False,
+            quiet=True,
+            types=tuple(LrcType),
+            outputs=(Path(directory),),
+            links=tuple(f"playlist:{playlistId}" for playlistId in transport.playlists),
+            jobs=args.jobs,
+            cacheMode=CacheMode.Bypass,
+            pipeline=args.pipeline,
+            transport=transport,
+            cookiePath=Path(directory) / "cookies.txt",
+            statePath=Path(directory) / "state",
+        )
+
+        start = perf_counter()
+        run(app.run())
+        duration = perf_counter() - start
+
+        written = len(list(Path(directory).glob("*.lrc")))
+
+    counters = app.stats.counters
+    print(f"{written} lyric files in {duration:.2f} s ({written / duration:.1f} files/s), failed {app.failedCount}")
+    print(f"requests {sum(transport.requests.values())}, max in flight {transport.maxInFlight}")
+    for path, count in sorted(transport.requests.items()):
+        print(f"{count:>10} {path}")
+    print(f"retries {counters.get('api.retries', 0)}, coalesced {counters.get('api.coalesced', 0)}")
+
+    if args.json is not None:
+        args.json.write_bytes(
+            dumpJson(
+                {
+                    "arguments": {name: value for name, value in vars(args).items() if name != "json"},
+                    "duration": duration,
+                    "written": written,
+                    "failed": app.failedCount,
+                    "requests": transport.requests,
+                    "maxInFlight": transport.maxInFlight,
+                    "stats": app.stats.toData(),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""API 响应 Json 解析的微基准测试
+
+运行: python -m benchmarks.bench_json
+"""
+
+from json import dumps, loads
+from timeit import repeat
+from tracemalloc import get_traced_memory, start, stop
+
+from ncmlyrics.util import loadJson, orjson
+
+from .fixture import syntheticPlaylistData
+
+
+def peakMemory(decode, content: bytes) -> int:
+    start()
+    decode(content)
+    peak = get_traced_memory()[1]
+    stop()
+    return peak
+
+
+def main() -> None:
+    content = dumps(syntheticPlaylistData(10000, 10000), ensure_ascii=False).encode()
+    print(f"{len(content) / 1024:.0f} KiB playlist response, orjson {'enabled' if orjson else 'not installed'}")
+
+    for name, decode in (("json", loads), ("loadJson", loadJson)):
+        best = min(repeat(lambda decode=decode: decode(content), number=5, repeat=5)) / 5
+        print(f"{name:>10}: {best * 1000:8.3f} ms, peak {peakMemory(decode, content) / 1024 / 1024:.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
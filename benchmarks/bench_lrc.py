@@ -0,0 +1,66 @@
+"""Lrc 解析与序列化的微基准测试
+
+运行: python -m benchmarks.bench_lrc
+"""
+
+from re import Match
+from re import compile as compileRegex
+from timeit import repeat
+
+from ncmlyrics.lrc import Lrc
+from ncmlyrics.type import LrcMetaType, LrcType
+
+from .fixture import syntheticNCMLyrics
+
+LEGACY_RE_COMMIT = compileRegex(r"^\s*#")
+LEGACY_RE_META = compileRegex(r"^\s*\[(?P<type>ti|ar|al|au|length|by|offset):\s*(?P<content>.+?)\s*\]\s*$")
+LEGACY_RE_META_NCM_SPECIAL = compileRegex(r"^\s*\{.*\}\s*$")
+LEGACY_RE_LYRIC = compileRegex(
+    r"^\s*(?P<timeLabels>(?:\s*\[\d{1,2}:\d{1,2}(?:\.\d{1,3})?\])+)\s*(?P<lyric>.+?)\s*$",
+)
+LEGACY_RE_LYRIC_TIMELABEL = compileRegex(r"\[(?P<minutes>\d{1,2}):(?P<seconds>\d{1,2}(?:\.\d{1,3})?)\]")
+
+
+class LegacyLrc(Lrc):
+    """基于正则表达式逐条尝试的旧版解析实现, 作为对照"""
+
+    def parseLyricRow(self, lrcType: LrcType, lrcRow: str) -> None:
+        if LEGACY_RE_COMMIT.match(lrcRow) is not None:
+            return
+
+        if LEGACY_RE_META_NCM_SPECIAL.match(lrcRow) is not None:
+            self.appendSpecialNCMMetaDataRow(lrcRow)
+            return
+
+        matched: Match[str] | None = LEGACY_RE_META.match(lrcRow)
+        if matched is not None:
+            self.appendMetaData(lrcType, LrcMetaType(matched["type"]), matched["content"])
+            return
+
+        matched = LEGACY_RE_LYRIC.match(lrcRow)
+        if matched is not None:
+            timestamps = [
+                self._timeLabel2Timestamp(*timeLabel.groups())
+                for timeLabel in LEGACY_RE_LYRIC_TIMELABEL.finditer(matched["timeLabels"])
+            ]
+            self.appendLyricRow(lrcType, timestamps, matched["lyric"])
+
+
+def main() -> None:
+    lyrics = syntheticNCMLyrics()
+    rows = sum(len(lrcStr.splitlines()) for lrcStr in lyrics.lyrics.values())
+
+    legacy = LegacyLrc.fromNCMLyrics(lyrics)
+    current = Lrc.fromNCMLyrics(lyrics)
+    assert (legacy.metadata, legacy.lyrics, legacy.specials) == (current.metadata, current.lyrics, current.specials)
+
+    for name, cls in (("regex", LegacyLrc), ("tokenizer", Lrc)):
+        best = min(repeat(lambda cls=cls: cls.fromNCMLyrics(lyrics), number=10, repeat=5)) / 10
+        print(f"{name:>10}: {best * 1000:8.3f} ms / {rows} rows ({best / rows * 1e6:.3f} us/row)")
+
+    best = min(repeat(current.serializeLyricFile, number=10, repeat=5)) / 10
+    print(f"{'serialize':>10}: {best * 1000:8.3f} ms / {rows} rows ({best / rows * 1e6:.3f} us/row)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""数据模型内存占用的基准测试
+
+运行: python -m benchmarks.bench_models
+"""
+
+from dataclasses import dataclass
+from json import dumps
+from tracemalloc import get_traced_memory, start, stop
+
+from ncmlyrics.object import NCMTrack
+from ncmlyrics.util import loadJson
+
+from .fixture import syntheticPlaylistData
+
+
+@dataclass
+class LegacyTrack:
+    """以字典保存属性, 每首曲目各自持有歌手列表的旧版实现, 作为对照"""
+
+    id: int
+    name: str
+    artists: list[str]
+
+    @classmethod
+    def fromData(cls, data: dict) -> "LegacyTrack":
+        return cls(id=data["id"], name=data["name"], artists=[artist["name"] for artist in data["ar"]])
+
+
+def retainedMemory(cls, content: bytes) -> int:
+    start()
+    # Decoded from Json as responses are, so equal artist names are distinct strings
+    tracksData = loadJson(content)
+    tracks = [cls.fromData(trackData) for trackData in tracksData]
+    # Response dicts are released after parsing, only the models are kept
+    del tracksData
+    retained = get_traced_memory()[0]
+    stop()
+    del tracks
+    return retained
+
+
+def main() -> None:
+    tracks = 100000
+    content = dumps(syntheticPlaylistData(tracks, tracks)["playlist"]["tracks"]).encode()
+
+    for name, cls in (("legacy", LegacyTrack), ("slots", NCMTrack)):
+        retained = retainedMemory(cls, content)
+        print(f"{name:>10}: {retained / 1024 / 1024:8.2f} MiB / {tracks} tracks ({retained / tracks:.0f} B/track)")
+
+
+if __name__ == "__main__":
+    main()
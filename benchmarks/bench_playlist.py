@@ -0,0 +1,88 @@
+"""歌单解析的微基准测试
+
+运行: python -m benchmarks.bench_playlist
+"""
+
+from json import dumps
+from timeit import repeat
+from tracemalloc import get_traced_memory, start, stop
+
+from ncmlyrics.error import ObjectParseError
+from ncmlyrics.jsonstream import JsonStreamParser
+from ncmlyrics.object import NCMPlaylist, NCMTrack
+from ncmlyrics.util import loadJson
+
+from .fixture import syntheticPlaylistData
+
+
+class LegacyPlaylist(NCMPlaylist):
+    """对每首附带详情的曲目调用 list.remove 的旧版解析实现, 作为对照"""
+
+    @classmethod
+    def fromData(cls, data: dict) -> "LegacyPlaylist":
+        playlist = data.get("playlist")
+        if playlist is None:
+            raise ObjectParseError("不存在歌单对应的结构")
+
+        try:
+            tracks: list[NCMTrack] = []
+            trackIds: list[int] = [track["id"] for track in playlist["trackIds"]]
+
+            for track in playlist["tracks"]:
+                parsedTrack = NCMTrack.fromData(track)
+                trackIds.remove(parsedTrack.id)
+                tracks.append(parsedTrack)
+
+            return cls(id=playlist["id"], name=playlist["name"], tracks=tracks, trackIds=trackIds)
+        except KeyError as e:
+            raise ObjectParseError(f"需要的键不存在: {e}")
+
+
+def parseWhole(content: bytes) -> int:
+    return len(NCMPlaylist.fromData(loadJson(content)).allTrackIds)
+
+
+def parseStream(content: bytes) -> int:
+    parser = JsonStreamParser(items=(("playlist", "tracks"), ("playlist", "trackIds")))
+    trackIds = 0
+    for seek in range(0, len(content), 65536):
+        for path, value in parser.feed(content[seek : seek + 65536]):
+            if path == ("playlist", "tracks"):
+                NCMTrack.fromData(value)
+            else:
+                trackIds += 1
+    parser.close()
+    return trackIds
+
+
+def peakMemory(parse, content: bytes) -> int:
+    start()
+    parse(content)
+    peak = get_traced_memory()[1]
+    stop()
+    return peak
+
+
+def main() -> None:
+    for tracks, embedded in ((10000, 1000), (10000, 10000)):
+        data = syntheticPlaylistData(tracks, embedded)
+
+        legacy = LegacyPlaylist.fromData(data)
+        current = NCMPlaylist.fromData(data)
+        assert (legacy.tracks, legacy.trackIds) == (current.tracks, current.trackIds)
+
+        print(f"{tracks} tracks, {embedded} with details:")
+        for name, cls in (("list", LegacyPlaylist), ("set", NCMPlaylist)):
+            best = min(repeat(lambda cls=cls, data=data: cls.fromData(data), number=5, repeat=5)) / 5
+            print(f"{name:>10}: {best * 1000:8.3f} ms")
+
+    # The response body itself is not counted, it never exists as a whole while streaming
+    print("peak memory while parsing, excluding the response body:")
+    for tracks in (10000, 50000):
+        content = dumps(syntheticPlaylistData(tracks, tracks)).encode()
+        for name, parse in (("whole", parseWhole), ("stream", parseStream)):
+            print(f"{name:>10}: {peakMemory(parse, content) / 1024 / 1024:8.2f} MiB / {tracks} tracks")
+
+
+if __name__ == "__main__":
+    main()
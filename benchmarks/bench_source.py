@@ -0,0 +1,76 @@
+"""源文件扫描与歌词文件路径匹配的基准测试
+
+运行: python -m benchmarks.bench_source
+"""
+
+from asyncio import run
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from timeit import repeat
+
+from ncmlyrics.app import NCMLyricsApp
+from ncmlyrics.object import NCMTrack
+from ncmlyrics.source import SourceScanner
+from ncmlyrics.type import CacheMode, LrcType
+
+from .fixture import syntheticSourceFiles, syntheticTrackData
+
+
+def main() -> None:
+    files, lookups = 100000, 10000
+    random = Random(0)
+    trackIds = random.sample(range(100000, 100000000), files + lookups // 2)
+
+    with TemporaryDirectory() as directory:
+        output = Path(directory) / "music"
+        snapshotPath = Path(directory) / "sources.json"
+
+        nested = Path(directory) / "nested"
+
+        start = perf_counter()
+        syntheticSourceFiles(output, trackIds[:files])
+        # The same files spread over album directories of 100 files
+        for seek in range(0, files, 100):
+            syntheticSourceFiles(nested / str(seek // 100), trackIds[seek : seek + 100])
+        print(f"created {files} source files twice in {perf_counter() - start:.2f} s")
+
+        for root, recursive in ((output, False), (nested, True)):
+            for name, cacheMode in (
+                ("cold", CacheMode.Bypass),
+                ("snapshot", CacheMode.Refresh),
+                ("warm", CacheMode.Normal),
+            ):
+                scanner = SourceScanner(recursive=recursive, cacheMode=cacheMode, snapshotPath=snapshotPath)
+                start = perf_counter()
+                index = run(scanner.scan((root,)))
+                print(f"{root.name:>6} {name:>8}: {(perf_counter() - start) * 1000:8.3f} ms scan / {len(index)} files")
+
+        app = NCMLyricsApp(
+            exist=False,
+            noPureMusic=False,
+            noProgressBar=True,
+            overwrite=False,
+            quiet=True,
+            types=tuple(LrcType),
+            outputs=(output,),
+            links=(),
+            cacheMode=CacheMode.Bypass,
+            cookiePath=Path(directory) / "cookies.txt",
+            statePath=Path(directory) / "state",
+        )
+
+        # Half of the tracks have a source file
+        tracks = [
+            NCMTrack.fromData(syntheticTrackData(trackId))
+            for trackId in random.sample(trackIds[:files], lookups // 2) + trackIds[files:]
+        ]
+        assert sum(index.find(track) is not None for track in tracks) == lookups // 2
+
+        best = min(repeat(lambda: [app.resolvePath(index, track) for track in tracks], number=1, repeat=5))
+        print(f"{'resolve':>10}: {best * 1000:8.3f} ms / {lookups} tracks ({best / lookups * 1e6:.3f} us/track)")
+
+
+if __name__ == "__main__":
+    main()
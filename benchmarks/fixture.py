@@ -0,0 +1,82 @@
+from pathlib import Path
+from random import Random
+
+from ncmlyrics.object import NCMLyrics
+from ncmlyrics.type import LrcType
+
+__all__ = ["syntheticNCMLyrics", "syntheticPlaylistData", "syntheticSourceFiles", "syntheticTrackData"]
+
+WORDS = ("夜空", "星星", "you", "never", "know", "心跳", "さくら", "のに", "walking", "away", "城市", "light")
+
+
+def _timeLabel(timestamp: int) -> str:
+    return f"[{timestamp // 60000:02d}:{timestamp // 1000 % 60:02d}.{timestamp % 1000:03d}]"
+
+
+def syntheticNCMLyrics(rows: int = 2000, seed: int = 0) -> NCMLyrics:
+    """生成与网易云音乐 API 返回格式一致的三种类型歌词"""
+    random = Random(seed)
+
+    origin = [
+        '{"t":0,"c":[{"tx":"作词: "},{"tx":"Someone","li":"http://p1.music.126.net/x.jpg","or":"orpheus://x"}]}',
+        '{"t":1000,"c":[{"tx":"作曲: "},{"tx":"Someone Else"}]}',
+        '{"t":2000,"c":[{"tx":"编曲：Nobody"}]}',
+    ]
+    translation = ["[by:translator]"]
+    romaji = ["[by:romanizer]"]
+
+    timestamp = 5000
+    for _ in range(rows):
+        timestamp += random.randint(800, 4000)
+        words = " ".join(random.choice(WORDS) for _ in range(random.randint(3, 9)))
+        origin.append(f"{_timeLabel(timestamp)}{words}")
+        translation.append(f"{_timeLabel(timestamp + random.randint(-40, 40))}{words[::-1]}")
+        romaji.append(f"{_timeLabel(timestamp)} {words.upper()} ")
+
+    return NCMLyrics(
+        id=None,
+        isPureMusic=False,
+        lyrics={
+            LrcType.Origin: "\n".join(origin) + "\n",
+            LrcType.Translation: "\n".join(translation) + "\n",
+            LrcType.Romaji: "\n".join(romaji) + "\n",
+        },
+    )
+
+
+def syntheticPlaylistData(tracks: int = 10000, embedded: int = 1000, seed: int = 0) -> dict:
+    """生成与网易云音乐歌单详情 API 返回格式一致的数据, 仅前 embedded 首附带详情"""
+    random = Random(seed)
+
+    trackIds = random.sample(range(100000, 100000000), tracks)
+
+    return {
+        "code": 200,
+        "playlist": {
+            "id": 444817519,
+            "name": "synthetic",
+            "tracks": [
+                {"id": trackId, "name": random.choice(WORDS), "ar": [{"name": random.choice(WORDS)}]}
+                for trackId in trackIds[:embedded]
+            ],
+            "trackIds": [{"id": trackId} for trackId in trackIds],
+        },
+    }
+
+
+def syntheticTrackData(trackId: int) -> dict:
+    """生成与网易云音乐曲目详情 API 返回格式一致的曲目, 内容仅由 trackId 决定"""
+    artists = [{"name": WORDS[trackId % len(WORDS)]}]
+    if trackId % 5 == 0:
+        artists.append({"name": WORDS[trackId // len(WORDS) % len(WORDS)]})
+
+    return {"id": trackId, "name": f"{WORDS[trackId // 7 % len(WORDS)]} {trackId}", "ar": artists}
+
+
+def syntheticSourceFiles(directory: Path, trackIds: list[int], extension: str = ".mp3") -> None:
+    """在 directory 下为每首曲目创建空的音频源文件, 文件名格式为 <歌手> - <标题><扩展名>"""
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for trackId in trackIds:
+        track = syntheticTrackData(trackId)
+        (directory / f"{','.join(artist['name'] for artist in track['ar'])} - {track['name']}{extension}").touch()
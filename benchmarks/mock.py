@@ -0,0 +1,100 @@
+from asyncio import sleep
+from json import dumps, loads
+from random import Random
+
+from httpx2 import AsyncBaseTransport, ConnectError, Request, Response
+
+from .fixture import syntheticNCMLyrics, syntheticPlaylistData, syntheticTrackData
+
+__all__ = ["MockNCMTransport"]
+
+
+class MockNCMTransport(AsyncBaseTransport):
+    """模拟网易云音乐 API 的传输层, 以合成数据响应歌单, 曲目详情与歌词请求
+
+    每个请求等待 latency 秒, 并上下浮动 jitter 比例; 以 errorRate 的概率响应 503, 以 resetRate 的概率抛出连接错误。
+    歌单 ID 为 1 至 playlists, 每个歌单含 tracks 首曲目, 其中前 embedded 首附带详情。随机过程由 seed 决定。
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.2,
+        errorRate: float = 0.0,
+        resetRate: float = 0.0,
+        playlists: int = 1,
+        tracks: int = 1000,
+        embedded: int = 1000,
+        lyricRows: int = 60,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = errorRate
+        self.resetRate = resetRate
+        self.random = Random(seed)
+
+        # playlistId: response
+        self.playlists: dict[int, dict] = {}
+        for playlistId in range(1, playlists + 1):
+            data = syntheticPlaylistData(tracks, embedded, seed + playlistId)
+            data["playlist"]["id"] = playlistId
+            data["playlist"]["tracks"] = [syntheticTrackData(track["id"]) for track in data["playlist"]["tracks"]]
+            self.playlists[playlistId] = data
+
+        self.lyrics = {"code": 200, **syntheticNCMLyrics(lyricRows, seed).toData()}
+
+        # endpoint: count
+        self.requests: dict[str, int] = {}
+        self.inFlight = 0
+        self.maxInFlight = 0
+
+    async def handle_async_request(self, request: Request) -> Response:
+        path = request.url.path
+        self.requests[path] = self.requests.get(path, 0) + 1
+        self.inFlight += 1
+        self.maxInFlight = max(self.maxInFlight, self.inFlight)
+
+        try:
+            await sleep(self.latency * (1 + self.jitter * (self.random.random() * 2 - 1)))
+
+            roll = self.random.random()
+            if roll < self.resetRate:
+                raise ConnectError("Connection reset by mock transport", request=request)
+            if roll < self.resetRate + self.errorRate:
+                return Response(503, request=request)
+
+            return self._route(request)
+        finally:
+            self.inFlight -= 1
+
+    def _route(self, request: Request) -> Response:
+        path = request.url.path
+        params = request.url.params
+
+        if path == "/api/v6/playlist/detail":
+            data = self.playlists.get(int(params["id"]))
+            if data is None:
+                return self._json(request, {"code": 404})
+            if params.get("n") == "0":
+                data = {"code": 200, "playlist": {**data["playlist"], "tracks": []}}
+            return self._json(request, data)
+
+        if path == "/api/v3/song/detail":
+            # Single track requests use single quotes
+            trackIds = [track["id"] for track in loads(params["c"].replace("'", '"'))]
+            return self._json(request, {"code": 200, "songs": [syntheticTrackData(trackId) for trackId in trackIds]})
+
+        if path == "/api/song/lyric/v1":
+            return self._json(request, self.lyrics)
+
+        return Response(404, request=request)
+
+    @staticmethod
+    def _json(request: Request, data: dict) -> Response:
+        return Response(
+            200,
+            headers={"Content-Type": "application/json"},
+            content=dumps(data, ensure_ascii=False).encode(),
+            request=request,
+        )
@@ -1,4 +1,26 @@
-from .__main__ import main
+from typing import TYPE_CHECKING
+
 from .__version__ import __description__, __title__, __version__
+from .export import NCMExporter, NCMExportResult, NCMExportStatus
+
+if TYPE_CHECKING:
+    from .__main__ import main
+
+__all__ = [
+    "NCMExportResult",
+    "NCMExportStatus",
+    "NCMExporter",
+    "__description__",
+    "__title__",
+    "__version__",
+    "main",
+]
+
+
+def __getattr__(name: str) -> object:
+    # Only the command line needs click and rich
+    if name == "main":
+        from .__main__ import main
 
-__all__ = ["__description__", "__title__", "__version__", "main"]
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,14 +2,65 @@ import asyncio
 from pathlib import Path
 
 from click import Path as clickPath
-from click import argument, command, option, echo
+from click import FloatRange, IntRange, UsageError, argument, command, option, echo
 
 from .app import NCMLyricsApp
-from .type import LrcType
+from .connection import ConnectionPolicy
+from .constant import (
+    CONFIG_API_KEEPALIVE_EXPIRY,
+    CONFIG_API_TIMEOUT_CONNECT,
+    CONFIG_API_TIMEOUT_POOL,
+    CONFIG_API_TIMEOUT_READ,
+    CONFIG_CONCURRENCY,
+    CONFIG_SERVE_HOST,
+    CONFIG_SERVE_PORT,
+    CONFIG_SOURCE_EXTENSIONS,
+)
+from .error import NCMLyricsServeError
+from .profiler import NCMProfiler
+from .serve import NCMLyricsServer
+from .transport import NCMRecordingTransport, NCMReplayTransport
+from .type import CacheMode, LrcType
 
 
 @command
+@option(
+    "--connect-timeout",
+    envvar="NCMLYRICS_CONNECT_TIMEOUT",
+    type=FloatRange(min=0, min_open=True),
+    default=CONFIG_API_TIMEOUT_CONNECT,
+    help=f"建立连接的超时秒数，默认值为: {CONFIG_API_TIMEOUT_CONNECT:g}。",
+)
 @option("-e", "--exist", envvar="NCMLYRICS_EXIST", is_flag=True, help="仅在源文件存在时保存歌词文件。")
+@option(
+    "--extensions",
+    envvar="NCMLYRICS_EXTENSIONS",
+    default=",".join(extension.lstrip(".") for extension in CONFIG_SOURCE_EXTENSIONS),
+    help="识别为源文件的音频文件扩展名，逗号分隔，默认值为: 'ncm,mp3,flac'。",
+)
+@option(
+    "-j",
+    "--jobs",
+    envvar="NCMLYRICS_JOBS",
+    type=IntRange(min=1),
+    default=CONFIG_CONCURRENCY,
+    help=f"同时进行的网络请求与文件写入数量上限，将根据响应延迟与错误率自动下调，默认值为: {CONFIG_CONCURRENCY}。",
+)
+@option(
+    "--keepalive-expiry",
+    envvar="NCMLYRICS_KEEPALIVE_EXPIRY",
+    type=FloatRange(min=0),
+    default=CONFIG_API_KEEPALIVE_EXPIRY,
+    help=f"空闲连接保持的秒数，默认值为: {CONFIG_API_KEEPALIVE_EXPIRY:g}。",
+)
+@option(
+    "--max-connections",
+    envvar="NCMLYRICS_MAX_CONNECTIONS",
+    type=IntRange(min=1),
+    help="连接池中的连接数量上限，默认与 --jobs 相同。",
+)
+@option("--no-cache", envvar="NCMLYRICS_NO_CACHE", is_flag=True, help="不读取也不写入本地歌词缓存。")
+@option("--no-http2", envvar="NCMLYRICS_NO_HTTP2", is_flag=True, help="不使用 HTTP/2，默认在已安装 h2 时使用。")
 @option("-n", "--no-pure-music", envvar="NCMLYRICS_NO_PURE_MUSIC", is_flag=True, help="不为纯音乐曲目保存歌词文件。")
 @option("--no-progress-bar", envvar="NCMLYRICS_NO_PROGRESS_BAR", is_flag=True, help="不显示进度条。")
 @option(
@@ -22,7 +73,104 @@ from .type import LrcType
 @option(
     "-O", "--overwrite", envvar="NCMLYRICS_OVERWRITE", is_flag=True, help="在歌词文件已存在时重新获取歌词并覆盖写入。"
 )
+@option(
+    "-p",
+    "--pipeline",
+    envvar="NCMLYRICS_PIPELINE",
+    is_flag=True,
+    help="边解析链接边输出歌词文件，不列出曲目也不进行确认，可缩短首个歌词文件输出前的等待时间。",
+)
+@option(
+    "--pool-timeout",
+    envvar="NCMLYRICS_POOL_TIMEOUT",
+    type=FloatRange(min=0, min_open=True),
+    default=CONFIG_API_TIMEOUT_POOL,
+    help=f"等待连接池中的空闲连接的超时秒数，超时将单独报告而不重试，默认值为: {CONFIG_API_TIMEOUT_POOL:g}。",
+)
+@option(
+    "--profile",
+    envvar="NCMLYRICS_PROFILE",
+    type=clickPath(dir_okay=False, writable=True, path_type=Path),
+    help="记录整个运行过程的 CPU 性能剖析（pstats 格式）写入此文件，并将 asyncio 任务耗时写入同目录下的 <文件>.tasks.json。",
+)
 @option("-q", "--quiet", envvar="NCMLYRICS_QUIET", is_flag=True, help="不进行任何提示并跳过所有确认。")
+@option(
+    "--read-timeout",
+    envvar="NCMLYRICS_READ_TIMEOUT",
+    type=FloatRange(min=0, min_open=True),
+    default=CONFIG_API_TIMEOUT_READ,
+    help=f"等待响应数据的超时秒数，默认值为: {CONFIG_API_TIMEOUT_READ:g}。",
+)
+@option(
+    "--record",
+    envvar="NCMLYRICS_RECORD",
+    type=clickPath(dir_okay=False, writable=True, path_type=Path),
+    help="将本次运行的所有 API 响应及其耗时记录到此存档文件，以供 --replay 回放。",
+)
+@option("-r", "--recursive", envvar="NCMLYRICS_RECURSIVE", is_flag=True, help="递归扫描输出目录的子目录以匹配源文件。")
+@option("--refresh-cache", envvar="NCMLYRICS_REFRESH_CACHE", is_flag=True, help="忽略本地缓存重新获取，并更新缓存。")
+@option(
+    "--replay",
+    envvar="NCMLYRICS_REPLAY",
+    type=clickPath(exists=True, dir_okay=False, path_type=Path),
+    help="不访问网络，以 --record 记录的存档文件响应所有 API 请求。",
+)
+@option(
+    "--replay-latency",
+    envvar="NCMLYRICS_REPLAY_LATENCY",
+    type=FloatRange(min=0),
+    default=1.0,
+    help="回放时每个响应的延迟相对于记录时耗时的倍数，0 为不等待，默认值为: 1。",
+)
+@option(
+    "--resume",
+    envvar="NCMLYRICS_RESUME",
+    is_flag=True,
+    help="记录任务日志，并从上次中断的相同任务继续，不重新解析链接，仅处理未完成的曲目；不指定时不记录任务日志。",
+)
+@option(
+    "--serve",
+    envvar="NCMLYRICS_SERVE",
+    is_flag=True,
+    help="常驻运行本地 HTTP 歌词服务，以 GET /lyrics?id=<曲目 ID> 或 GET /lyrics?link=<单曲链接> 获取 LRC 格式的歌词，不需要给出链接。",
+)
+@option(
+    "--serve-host",
+    envvar="NCMLYRICS_SERVE_HOST",
+    default=CONFIG_SERVE_HOST,
+    help=f"歌词服务监听的地址，默认值为: {CONFIG_SERVE_HOST}。",
+)
+@option(
+    "--serve-port",
+    envvar="NCMLYRICS_SERVE_PORT",
+    type=IntRange(min=0, max=65535),
+    default=CONFIG_SERVE_PORT,
+    help=f"歌词服务监听的端口，默认值为: {CONFIG_SERVE_PORT}。",
+)
+@option(
+    "--serve-socket",
+    envvar="NCMLYRICS_SERVE_SOCKET",
+    type=clickPath(dir_okay=False, path_type=Path),
+    help="歌词服务改为监听此 Unix 套接字，忽略 --serve-host 与 --serve-port。",
+)
+@option(
+    "--stats",
+    envvar="NCMLYRICS_STATS",
+    type=clickPath(dir_okay=False, writable=True, path_type=Path),
+    help="运行结束后将各阶段耗时，请求计数与延迟分布，重试，流量与缓存命中写入此 Json 文件。",
+)
+@option(
+    "--sync",
+    envvar="NCMLYRICS_SYNC",
+    is_flag=True,
+    help="同步歌单，仅处理自上次同步以来新增的曲目，无变化时只需一次轻量请求。",
+)
+@option(
+    "--sync-remove",
+    envvar="NCMLYRICS_SYNC_REMOVE",
+    is_flag=True,
+    help="同步歌单时删除由本程序写入的、已从歌单移除的曲目的歌词文件，默认仅列出。",
+)
 @option(
     "-t",
     "--types",
@@ -30,18 +178,49 @@ from .type import LrcType
     default="origin,translation,romaji",
     help="指定输出的歌词所包含的歌词类型与顺序，默认值为: 'origin,translation,romaji'。",
 )
+@option(
+    "--write-identical",
+    envvar="NCMLYRICS_WRITE_IDENTICAL",
+    is_flag=True,
+    help="覆盖写入时即使歌词文件内容未变化也重新写入，默认跳过以免触发媒体库的文件监视。",
+)
 @argument("links", nargs=-1)
 def main(
+    connect_timeout: float,
     exist: bool,
+    extensions: str,
+    jobs: int,
+    keepalive_expiry: float,
+    max_connections: int | None,
+    no_cache: bool,
+    no_http2: bool,
     no_pure_music: bool,
     no_progress_bar: bool,
     outputs: list[Path],
     overwrite: bool,
+    pipeline: bool,
+    pool_timeout: float,
+    profile: Path | None,
     quiet: bool,
+    read_timeout: float,
+    record: Path | None,
+    recursive: bool,
+    refresh_cache: bool,
+    replay: Path | None,
+    replay_latency: float,
+    resume: bool,
+    serve: bool,
+    serve_host: str,
+    serve_port: int,
+    serve_socket: Path | None,
+    stats: Path | None,
+    sync: bool,
+    sync_remove: bool,
     types: str,
+    write_identical: bool,
     links: list[str],
 ) -> None:
-    if len(links) == 0:
+    if len(links) == 0 and not serve:
         echo("请给出至少一个链接以解析曲目以获取其歌词！支持输入单曲，专辑与歌单的分享或网页链接。")
         return
 
@@ -51,18 +230,99 @@ def main(
         echo(f"歌词类型解析失败，请检查帮助：{types}")
         return
 
-    app = NCMLyricsApp(
-        exist=exist,
-        noPureMusic=no_pure_music,
-        noProgressBar=no_progress_bar,
-        overwrite=overwrite,
-        quiet=quiet,
-        types=type_list,
-        outputs=tuple(outputs),
-        links=tuple(links),
+    extension_list = tuple(f".{extension.strip(' .')}" for extension in extensions.split(",") if extension.strip(" ."))
+
+    if record is not None and replay is not None:
+        raise UsageError("--record 与 --replay 不能同时使用！")
+
+    if no_cache and refresh_cache:
+        raise UsageError("--no-cache 与 --refresh-cache 不能同时使用！")
+
+    connection_policy = ConnectionPolicy(
+        maxConnections=max_connections,
+        keepaliveExpiry=keepalive_expiry,
+        connectTimeout=connect_timeout,
+        readTimeout=read_timeout,
+        poolTimeout=pool_timeout,
+        http2=not no_http2,
     )
 
-    asyncio.run(app.run())
+    transport = None
+    if record is not None:
+        try:
+            transport = NCMRecordingTransport(record, connection_policy.transport(jobs))
+        except OSError as e:
+            echo(f"无法创建记录存档：{record} ({e})")
+            return
+    elif replay is not None:
+        try:
+            transport = NCMReplayTransport(replay, replay_latency)
+        except (OSError, ValueError) as e:
+            echo(f"无法读取回放存档：{replay} ({e})")
+            return
+
+    if no_cache:
+        cache_mode = CacheMode.Bypass
+    elif refresh_cache:
+        cache_mode = CacheMode.Refresh
+    else:
+        cache_mode = CacheMode.Normal
+
+    if serve:
+        server = NCMLyricsServer(
+            types=type_list,
+            host=serve_host,
+            port=serve_port,
+            socketPath=serve_socket,
+            jobs=jobs,
+            cacheMode=cache_mode,
+            statsPath=stats,
+            transport=transport,
+            connectionPolicy=connection_policy,
+            quiet=quiet,
+        )
+        run = server.run
+    else:
+        app = NCMLyricsApp(
+            exist=exist,
+            noPureMusic=no_pure_music,
+            noProgressBar=no_progress_bar,
+            overwrite=overwrite,
+            quiet=quiet,
+            types=type_list,
+            outputs=tuple(outputs),
+            links=tuple(links),
+            jobs=jobs,
+            cacheMode=cache_mode,
+            recursive=recursive,
+            extensions=extension_list,
+            pipeline=pipeline,
+            writeIdentical=write_identical,
+            resume=resume,
+            sync=sync or sync_remove,
+            syncRemove=sync_remove,
+            statsPath=stats,
+            transport=transport,
+            connectionPolicy=connection_policy,
+        )
+        run = app.run
+
+    try:
+        if profile is None:
+            asyncio.run(run())
+            return
+
+        profiler = NCMProfiler()
+        try:
+            asyncio.run(profiler.run(run()))
+        finally:
+            profiler.save(profile)
+    except NCMLyricsServeError as e:
+        echo(str(e))
+    except KeyboardInterrupt:
+        # Ctrl-C is the normal way to stop the server
+        if not serve:
+            raise
 
 
 if __name__ == "__main__":
@@ -1,17 +1,36 @@
-from asyncio import TaskGroup
+from asyncio import Task, TaskGroup, create_task, gather, shield, sleep
+from collections.abc import Awaitable, Callable, Iterable
 from http.cookiejar import LoadError, MozillaCookieJar
+from json import JSONDecodeError
 from json import dumps as dumpJson
+from pathlib import Path
+from time import perf_counter
+from typing import Any, TypeVar, cast
+from urllib.parse import urlsplit
 
+from httpx2 import AsyncBaseTransport as HttpXAsyncBaseTransport
 from httpx2 import AsyncClient as HttpXClient
+from httpx2 import HTTPError as HttpXError
+from httpx2 import PoolTimeout as HttpXPoolTimeout
 from httpx2 import Request as HttpXRequest
 from httpx2 import Response as HttpXResponse
+from httpx2 import TransportError as HttpXTransportError
 
-from .constant import CONFIG_API_DETAIL_TRACK_PER_REQUEST, NCM_API_BASE_URL, PLATFORM
+from .cache import NCMCache
+from .connection import ConnectionPolicy
+from .constant import CONFIG_API_DETAIL_TRACK_PER_REQUEST, CONFIG_CONCURRENCY, NCM_API_BASE_URL, PLATFORM
 from .error import (
+    NCMApiPoolTimeoutError,
     NCMApiRequestError,
     NCMApiRetryLimitExceededError,
+    ObjectParseError,
 )
+from .jsonstream import JsonPath, JsonStreamParser
+from .limiter import AdaptiveLimiter
 from .object import NCMAlbum, NCMLyrics, NCMPlaylist, NCMTrack
+from .retry import CircuitBreaker, RetryPolicy, parseRetryAfter
+from .stats import NCMStats
+from .util import redirectLocation
 
 try:
     import brotlicffi as brotli  # type: ignore
@@ -26,13 +45,10 @@ try:
 except ImportError:
     zstandard = None  # type: ignore
 
-try:
-    import h2  # type: ignore
-except ImportError:
-    h2 = None  # type: ignore
-
 __all__ = ["NCMApi"]
 
+T = TypeVar("T")
+
 REQUEST_HEADERS = {
     "Accept": "application/json",
     "Accept-Encoding": f"{'zstd, ' if zstandard is not None else ''}{'br, ' if brotli is not None else ''}gzip, deflate",
@@ -41,10 +57,25 @@ REQUEST_HEADERS = {
 }
 
 
+async def readResponse(response: HttpXResponse) -> HttpXResponse:
+    await response.aread()
+    return response
+
+
 class NCMApi:
-    def __init__(self) -> None:
-        self._cookiePath = PLATFORM.user_config_path / "cookies.txt"
+    def __init__(
+        self,
+        concurrency: int = CONFIG_CONCURRENCY,
+        retryPolicy: RetryPolicy | None = None,
+        cache: NCMCache | None = None,
+        stats: NCMStats | None = None,
+        transport: HttpXAsyncBaseTransport | None = None,
+        connectionPolicy: ConnectionPolicy | None = None,
+        cookiePath: Path | None = None,
+    ) -> None:
+        self._cookiePath = cookiePath or PLATFORM.user_config_path / "cookies.txt"
         self._cookieJar = MozillaCookieJar()
+        self._connectionPolicy = connectionPolicy or ConnectionPolicy()
 
         try:
             self._cookieJar.load(str(self._cookiePath))
@@ -55,32 +86,200 @@ class NCMApi:
             base_url=NCM_API_BASE_URL,
             cookies=self._cookieJar,
             headers=REQUEST_HEADERS,
-            http2=h2 is not None,
+            timeout=self._connectionPolicy.timeout(),
+            transport=transport or self._connectionPolicy.transport(concurrency),
         )
 
-    async def _fetch(self, request: HttpXRequest, retry: int | None = 4) -> HttpXResponse:
-        if retry is not None:  # None => Disable retry
-            retry = max(retry, 0)
+        # Connections opened by warmUp, only for the network transport built here
+        if transport is not None:
+            self._warmUpConnections = 0
+        elif self._connectionPolicy.useHttp2:
+            # Every request is multiplexed onto one connection
+            self._warmUpConnections = 1
+        else:
+            self._warmUpConnections = min(concurrency, self._connectionPolicy.connections(concurrency))
 
-            while retry >= 0:
-                try:
-                    return await self._httpClient.send(request)
-                except Exception:
-                    retry -= 1
+        self._limiter = AdaptiveLimiter(concurrency)
+        self._retryPolicy = retryPolicy or RetryPolicy()
+        self._breakers: dict[str, CircuitBreaker] = {}
 
-            raise NCMApiRetryLimitExceededError
+        # method url: shared in-flight request
+        self._inFlight: dict[tuple[str, str], Task[HttpXResponse]] = {}
 
-        try:
-            return await self._httpClient.send(request)
-        except Exception as e:
-            raise NCMApiRequestError(e.__repr__())
+        self.cache = cache
+        self.stats = stats
+
+    async def _fetch(self, request: HttpXRequest, retryPolicy: RetryPolicy | None = None) -> HttpXResponse:
+        if request.method not in ("GET", "HEAD"):
+            return await self._fetchWithRetry(request, retryPolicy)
+
+        # Identical concurrent requests share one response
+        key = (request.method, str(request.url))
+        task = self._inFlight.get(key)
+        if task is None:
+            task = self._inFlight[key] = create_task(self._fetchWithRetry(request, retryPolicy))
+            task.add_done_callback(lambda done: self._fetchDone(key, done))
+        elif self.stats is not None:
+            self.stats.count("api.coalesced")
+
+        # A cancelled waiter must not cancel the request other waiters are sharing
+        return await shield(task)
+
+    async def _fetchWithRetry(self, request: HttpXRequest, retryPolicy: RetryPolicy | None = None) -> HttpXResponse:
+        return await self._fetchStream(request, readResponse, retryPolicy)
+
+    async def _fetchStream(
+        self,
+        request: HttpXRequest,
+        consume: Callable[[HttpXResponse], Awaitable[T]],
+        retryPolicy: RetryPolicy | None = None,
+    ) -> T:
+        """发送请求并在响应体读取完成前以 consume 处理响应, consume 可能因重试而被调用多次"""
+        policy = retryPolicy or self._retryPolicy
+
+        breaker = self._breakers.get(request.url.host)
+        if breaker is None:
+            breaker = self._breakers[request.url.host] = CircuitBreaker()
+
+        lastError: str | None = None
+
+        for attempt in range(max(policy.retries, 0) + 1):
+            await breaker.wait()
+
+            if attempt > 0 and self.stats is not None:
+                self.stats.count("api.retries")
+
+            try:
+                response, result = await self._send(request, policy, consume)
+            except HttpXPoolTimeout as e:
+                if self.stats is not None:
+                    self.stats.count("api.errors.PoolTimeout")
+                # No connection was free locally, the server has not seen the request
+                raise NCMApiPoolTimeoutError(e.__repr__()) from e
+            except HttpXTransportError as e:
+                if self.stats is not None:
+                    self.stats.count(f"api.errors.{type(e).__name__}")
+                if not policy.isRetryableError(e):
+                    raise NCMApiRequestError(e.__repr__()) from e
+                breaker.record(False)
+                lastError = e.__repr__()
+                delay = policy.delay(attempt)
+            except HttpXError as e:
+                if self.stats is not None:
+                    self.stats.count(f"api.errors.{type(e).__name__}")
+                # Such as a body that does not match its Content-Encoding, retrying will not help
+                raise NCMApiRequestError(e.__repr__()) from e
+            else:
+                if not policy.isRetryableStatus(response.status_code):
+                    breaker.record(True)
+                    return cast(T, result)
+
+                breaker.record(False)
+                lastError = f"HTTP {response.status_code}"
+
+                retryAfter = parseRetryAfter(response.headers.get("Retry-After"))
+                delay = policy.delay(attempt, retryAfter)
+                if retryAfter is not None:
+                    # The server asked every client to back off, not only this request
+                    breaker.pause(delay)
+
+            if attempt < policy.retries:
+                await sleep(delay)
+
+        raise NCMApiRetryLimitExceededError(lastError)
+
+    def _fetchDone(self, key: tuple[str, str], task: Task[HttpXResponse]) -> None:
+        self._inFlight.pop(key, None)
+        # Mark the error as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def _send(
+        self,
+        request: HttpXRequest,
+        policy: RetryPolicy,
+        consume: Callable[[HttpXResponse], Awaitable[T]],
+    ) -> tuple[HttpXResponse, T | None]:
+        # Connection events reported by the network transport: first time seen
+        events: dict[str, float] = {}
+
+        if self.stats is not None:
+
+            async def trace(event: str, _: dict) -> None:
+                events.setdefault(event.partition(".")[2], perf_counter())
+
+            request.extensions = {**request.extensions, "trace": trace}
+
+        queued = perf_counter()
+        async with self._limiter.slot() as slot:
+            start = perf_counter()
+            response = await self._httpClient.send(request, stream=True)
+            try:
+                if policy.isRetryableStatus(response.status_code):
+                    slot.fail()
+                    return response, None
+                return response, await consume(response)
+            finally:
+                await response.aclose()
+                if self.stats is not None:
+                    self._recordResponse(response, queued, start, perf_counter(), events)
+
+    def _recordResponse(
+        self,
+        response: HttpXResponse,
+        queued: float,
+        start: float,
+        end: float,
+        events: dict[str, float],
+    ) -> None:
+        assert self.stats is not None
+        self.stats.count("api.requests")
+        self.stats.count(f"api.status.{response.status_code}")
+        self.stats.count("api.bytes", response.num_bytes_downloaded)
+        self.stats.observe("api.wait", start - queued)
+
+        # Split off the wait for a pooled connection and the setup of a new one from the server latency
+        sent = events.get("send_request_headers.started")
+        if sent is not None:
+            connecting = events.get("connect_tcp.started")
+            self.stats.observe("api.pool", (sent if connecting is None else connecting) - start)
+            if connecting is not None:
+                self.stats.count("api.connections")
+                self.stats.observe("api.connect", sent - connecting)
+            start = sent
+
+        self.stats.observe(f"api.latency:{NCMStats.endpoint(response.request.url.path)}", end - start)
+
+    async def warmUp(self) -> None:
+        """预先建立连接, 使首批请求无需等待连接建立, 失败时静默忽略"""
+
+        async def connect() -> None:
+            try:
+                await self._httpClient.head("/")
+            except HttpXError:
+                pass
+
+        if self.stats is not None:
+            self.stats.count("api.warmUp", self._warmUpConnections)
+        await gather(*(connect() for _ in range(self._warmUpConnections)))
+
+    async def close(self) -> None:
+        await self._httpClient.aclose()
 
     def saveCookies(self) -> None:
         self._cookieJar.save(str(self._cookiePath))
 
     async def getDetailsForTrack(self, trackId: int) -> NCMTrack:
+        if self.cache is not None:
+            cached = self.cache.tracks.getData(trackId)
+            if cached is not None:
+                return NCMTrack.fromData(cached)
+
         request = self._httpClient.build_request("GET", "/v3/song/detail", params={"c": f"[{{'id':{trackId}}}]"})
-        return NCMTrack.fromApi(await self._fetch(request)).pop()
+        track = NCMTrack.fromApi(await self._fetch(request)).pop()
+
+        self._cacheTracks((track,))
+        return track
 
     async def getDetailsForTracks(self, trackIds: list[int]) -> list[NCMTrack]:
         async def fetchChunk(chunkTrackIds: list[int]) -> list[NCMTrack]:
@@ -95,28 +294,149 @@ class NCMApi:
 
             return NCMTrack.fromApi(await self._fetch(request))
 
+        tracks: dict[int, NCMTrack] = {}
+        if self.cache is not None:
+            for trackId, cached in self.cache.tracks.getManyData(trackIds).items():
+                tracks[trackId] = NCMTrack.fromData(cached)
+
+        missingTrackIds = [trackId for trackId in trackIds if trackId not in tracks]
         chunks = [
-            trackIds[seek : seek + CONFIG_API_DETAIL_TRACK_PER_REQUEST]
-            for seek in range(0, len(trackIds), CONFIG_API_DETAIL_TRACK_PER_REQUEST)
+            missingTrackIds[seek : seek + CONFIG_API_DETAIL_TRACK_PER_REQUEST]
+            for seek in range(0, len(missingTrackIds), CONFIG_API_DETAIL_TRACK_PER_REQUEST)
         ]
 
         async with TaskGroup() as tg:
             tasks = [tg.create_task(fetchChunk(chunk)) for chunk in chunks]
 
-        result: list[NCMTrack] = []
         for task in tasks:
-            result.extend(task.result())
-        return result
+            fetchedTracks = task.result()
+            self._cacheTracks(fetchedTracks)
+            for track in fetchedTracks:
+                tracks[track.id] = track
+
+        return [tracks[trackId] for trackId in trackIds if trackId in tracks]
 
     async def getDetailsForAlbum(self, albumId: int) -> NCMAlbum:
+        if self.cache is not None:
+            cached = self.cache.albums.getData(albumId)
+            if cached is not None:
+                return NCMAlbum.fromData(cached)
+
         request = self._httpClient.build_request("GET", f"/v1/album/{albumId}")
-        return NCMAlbum.fromApi(await self._fetch(request))
+        album = NCMAlbum.fromApi(await self._fetch(request))
+
+        if self.cache is not None:
+            self.cache.albums.setData(albumId, album.toData())
+        self._cacheTracks(album.tracks)
+        return album
 
     async def getDetailsForPlaylist(self, playlistId: int) -> NCMPlaylist:
-        request = self._httpClient.build_request("GET", "/v6/playlist/detail", params={"id": playlistId})
-        return NCMPlaylist.fromApi(await self._fetch(request))
+        params: dict[str, int] = {"id": playlistId}
+
+        # Seen this playlist before, most of its tracks should be cached, only ask for the track ids
+        previousTrackIds = self._getCachedPlaylistTrackIds(playlistId)
+        if previousTrackIds is not None:
+            params["n"] = 0
+
+        request = self._httpClient.build_request("GET", "/v6/playlist/detail", params=params)
+        playlist = NCMPlaylist.fromApi(await self._fetch(request))
+
+        self._cachePlaylist(NCMPlaylist(playlist.id, playlist.name, [], playlist.allTrackIds), previousTrackIds)
+        self._cacheTracks(playlist.tracks)
+        return playlist
+
+    async def streamDetailsForPlaylist(self, playlistId: int) -> NCMPlaylist:
+        """以流式解析获取歌单及其全部曲目的详情, 在响应读取完成前即开始分块获取未附带详情的曲目"""
+
+        params: dict[str, int] = {"id": playlistId}
+
+        previousTrackIds = self._getCachedPlaylistTrackIds(playlistId)
+        if previousTrackIds is not None:
+            params["n"] = 0
+
+        request = self._httpClient.build_request("GET", "/v6/playlist/detail", params=params)
+
+        # Shared between attempts, chunks already requested are not requested again
+        tracks: dict[int, NCMTrack] = {}
+        requestedTrackIds: set[int] = set()
+        chunkTasks: list[Task[list[NCMTrack]]] = []
+
+        def requestChunks(pendingTrackIds: list[int], flush: bool) -> None:
+            while len(pendingTrackIds) >= CONFIG_API_DETAIL_TRACK_PER_REQUEST or flush and pendingTrackIds:
+                chunk = pendingTrackIds[:CONFIG_API_DETAIL_TRACK_PER_REQUEST]
+                del pendingTrackIds[:CONFIG_API_DETAIL_TRACK_PER_REQUEST]
+                requestedTrackIds.update(chunk)
+                chunkTasks.append(create_task(self.getDetailsForTracks(chunk)))
+
+        async def consume(response: HttpXResponse) -> NCMPlaylist:
+            parser = JsonStreamParser(
+                values=(("code",), ("playlist", "id"), ("playlist", "name")),
+                items=(("playlist", "tracks"), ("playlist", "trackIds")),
+            )
+            fields: dict[JsonPath, Any] = {}
+            trackIds: list[int] = []
+            pendingTrackIds: list[int] = []
+
+            try:
+                async for chunk in response.aiter_bytes():
+                    for path, value in parser.feed(chunk):
+                        match path:
+                            case ("playlist", "tracks"):
+                                track = NCMTrack.fromData(value)
+                                tracks.setdefault(track.id, track)
+                            case ("playlist", "trackIds"):
+                                trackId = value["id"]
+                                trackIds.append(trackId)
+                                if trackId not in tracks and trackId not in requestedTrackIds:
+                                    pendingTrackIds.append(trackId)
+                            case _:
+                                fields[path] = value
+                    requestChunks(pendingTrackIds, False)
+                parser.close()
+            except (JSONDecodeError, KeyError, TypeError):
+                raise ObjectParseError("无法以预期的 Json 格式解析响应")
+
+            if fields.get(("code",)) != 200:
+                raise ObjectParseError(f"响应码不为 200: {fields.get(('code',))}")
+            if ("playlist", "id") not in fields or ("playlist", "name") not in fields:
+                raise ObjectParseError("不存在歌单对应的结构")
+
+            # Embedded tracks listed before their ids were requested anyway, drop them from the chunks
+            requestChunks([trackId for trackId in pendingTrackIds if trackId not in tracks], True)
+
+            return NCMPlaylist(fields[("playlist", "id")], fields[("playlist", "name")], [], trackIds)
+
+        try:
+            playlist = await self._fetchStream(request, consume)
+            for chunkTracks in await gather(*chunkTasks):
+                for track in chunkTracks:
+                    tracks.setdefault(track.id, track)
+        finally:
+            for task in chunkTasks:
+                task.cancel()
+
+        self._cachePlaylist(playlist, previousTrackIds)
+        # Requested tracks are cached by getDetailsForTracks
+        self._cacheTracks(track for trackId, track in tracks.items() if trackId not in requestedTrackIds)
+
+        playlist.tracks = [tracks[trackId] for trackId in playlist.trackIds if trackId in tracks]
+        playlist.trackIds = []
+        return playlist
+
+    async def getTrackIdsForPlaylist(self, playlistId: int) -> NCMPlaylist:
+        """仅获取歌单的全部曲目 ID, 不附带曲目详情, 结果不经过缓存"""
+
+        request = self._httpClient.build_request("GET", "/v6/playlist/detail", params={"id": playlistId, "n": 0})
+        playlist = NCMPlaylist.fromApi(await self._fetch(request))
+
+        return NCMPlaylist(playlist.id, playlist.name, [], playlist.allTrackIds)
 
     async def getLyricsByTrack(self, trackId: int) -> NCMLyrics:
+        if self.cache is not None:
+            cached = self.cache.lyrics.getData(trackId)
+            if cached is not None:
+                return NCMLyrics.fromData(cached).withId(trackId)
+
         params = {
             "id": trackId,
             "cp": False,
@@ -130,4 +450,59 @@ class NCMApi:
         }
 
         request = self._httpClient.build_request("GET", "/song/lyric/v1", params=params)
-        return NCMLyrics.fromApi(await self._fetch(request)).withId(trackId)
+        lyrics = NCMLyrics.fromApi(await self._fetch(request)).withId(trackId)
+
+        if self.cache is not None:
+            self.cache.lyrics.setData(trackId, lyrics.toData())
+
+        return lyrics
+
+    async def resolveShortLink(self, url: str) -> str:
+        """解析分享短链, 返回其重定向到的链接"""
+
+        parsedUrl = urlsplit(url)
+        key = f"{parsedUrl.netloc}{parsedUrl.path}".rstrip("/")
+
+        if self.cache is not None:
+            cached = self.cache.shortLinks.get(key)
+            if cached is not None:
+                return cached.decode()
+
+        request = self._httpClient.build_request("GET", url)
+        location = redirectLocation(await self._fetch(request))
+
+        if self.cache is not None:
+            self.cache.shortLinks.set(key, location.encode())
+
+        return location
+
+    def _getCachedPlaylistTrackIds(self, playlistId: int) -> list[int] | None:
+        """上次获取时歌单的曲目 ID, 歌单每次都会重新获取, 此处不计入缓存命中"""
+        if self.cache is None:
+            return None
+
+        cached = self.cache.playlists.getData(playlistId, count=False)
+        if cached is None:
+            return None
+        try:
+            return NCMPlaylist.fromData(cached).allTrackIds
+        except ObjectParseError:
+            return None
+
+    def _cachePlaylist(self, playlist: NCMPlaylist, previousTrackIds: list[int] | None) -> None:
+        """记录歌单的曲目 ID, 仅在与上次记录一致时计为缓存命中"""
+        if self.cache is None:
+            return
+
+        trackIds = playlist.allTrackIds
+        self.cache.playlists.countLookup(previousTrackIds == trackIds)
+        if previousTrackIds is not None and previousTrackIds != trackIds and self.stats is not None:
+            previous, current = set(previousTrackIds), set(trackIds)
+            self.stats.count("api.playlist.added", len(current - previous))
+            self.stats.count("api.playlist.removed", len(previous - current))
+
+        self.cache.playlists.setData(playlist.id, NCMPlaylist(playlist.id, playlist.name, [], trackIds).toData())
+
+    def _cacheTracks(self, tracks: Iterable[NCMTrack]) -> None:
+        if self.cache is not None:
+            self.cache.tracks.setManyData((track.id, track.toData()) for track in tracks)
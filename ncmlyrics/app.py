@@ -1,21 +1,27 @@
-from asyncio import TaskGroup
+from asyncio import TaskGroup, create_task
 from collections.abc import Iterable
+from contextlib import aclosing
 from pathlib import Path
-from re import Pattern
-from re import compile as compileRegex
-from re import escape as escapeRegex
 
 from click import confirm
+from httpx2 import AsyncBaseTransport
 from rich.console import Console
 from rich.progress import Progress, TaskID
 from rich.theme import Theme
 
 from .api import NCMApi
+from .cache import NCMCache
+from .connection import ConnectionPolicy
+from .constant import CONFIG_CONCURRENCY, CONFIG_SOURCE_EXTENSIONS, PLATFORM
 from .error import NCMLyricsAppError, ParseLinkError, UnsupportedLinkError
-from .lrc import Lrc
+from .export import NCMExporter, NCMExportResult, NCMExportStatus
+from .journal import NCMJobJournal
 from .object import NCMAlbum, NCMPlaylist, NCMTrack
-from .type import LinkType, LrcType
-from .util import parseLink, safeFileName
+from .source import SourceFileIndex
+from .stats import NCMStats
+from .sync import NCMSyncState
+from .type import CacheMode, LinkType, LrcType
+from .util import parseLinkAsync
 
 __all__ = ["NCMLyricsApp"]
 
@@ -52,6 +58,11 @@ class NCMLyricsProgress:
         if self._progress and self._taskId is not None:
             self._progress.advance(self._taskId)
 
+    def addTotal(self, count: int) -> None:
+        if self._progress and self._taskId is not None:
+            total = self._progress.tasks[self._taskId].total or 0
+            self._progress.update(self._taskId, total=total + count)
+
     def pause(self) -> None:
         if self._progress:
             self._progress.stop()
@@ -72,35 +83,129 @@ class NCMLyricsApp:
         types: tuple[LrcType, ...],
         outputs: tuple[Path, ...],
         links: tuple[str, ...],
+        jobs: int = CONFIG_CONCURRENCY,
+        cacheMode: CacheMode = CacheMode.Normal,
+        recursive: bool = False,
+        extensions: tuple[str, ...] = CONFIG_SOURCE_EXTENSIONS,
+        pipeline: bool = False,
+        writeIdentical: bool = False,
+        resume: bool = False,
+        sync: bool = False,
+        syncRemove: bool = False,
+        statsPath: Path | None = None,
+        transport: AsyncBaseTransport | None = None,
+        connectionPolicy: ConnectionPolicy | None = None,
+        cookiePath: Path | None = None,
+        statePath: Path | None = None,
     ) -> None:
         self.console = Console(theme=NCMLyricsAppTheme, highlight=False)
         self.progress = NCMLyricsProgress(self.console, enabled=not noProgressBar)
 
-        self.api = NCMApi()
+        self.stats = NCMStats()
+        self.statsPath = statsPath
+
+        self.cacheMode = cacheMode
+        self.cache = NCMCache(cacheMode)
+        self.api = NCMApi(
+            concurrency=jobs,
+            cache=self.cache,
+            stats=self.stats,
+            transport=transport,
+            connectionPolicy=connectionPolicy,
+            cookiePath=cookiePath,
+        )
+        self.exporter = NCMExporter(
+            types=types,
+            outputs=outputs,
+            api=self.api,
+            jobs=jobs,
+            exist=exist,
+            overwrite=overwrite,
+            noPureMusic=noPureMusic,
+            writeIdentical=writeIdentical,
+            recursive=recursive,
+            extensions=extensions,
+            cacheMode=cacheMode,
+            stats=self.stats,
+        )
+        self.jobs = jobs
 
-        self.exist = exist
-        self.overwrite = overwrite
-        self.noPureMusic = noPureMusic
         self.quiet = quiet
-        if len(outputs) == 0:
-            self.outputs: tuple[Path, ...] = (Path(),)
-        else:
-            self.outputs = outputs
+        self.outputs = self.exporter.outputs
         self.types = types
+        self.pipeline = pipeline
+
+        self.writtenCount = 0
+        self.identicalCount = 0
+        # Links and lyric files that could not be done, the journal is kept for --resume
+        self.failedCount = 0
 
         self.links = links
 
+        # Job journals and sync state
+        statePath = statePath or PLATFORM.user_state_path
+
+        self.resume = resume
+        jobKey = NCMJobJournal.jobKey(links, self.outputs, types)
+        self.journal = NCMJobJournal(jobKey, resume, statePath / "jobs" / f"{jobKey}.jsonl")
+
+        self.syncState = NCMSyncState(statePath / "sync.json") if sync else None
+        self.syncRemove = syncRemove
+        # syncKey: (current trackIds, removed trackIds)
+        self.syncPlaylists: dict[str, tuple[list[int], list[int]]] = {}
+        # trackId: lyric file written or confirmed in this run
+        self.exportedPaths: dict[int, Path] = {}
+        # Tracks to be picked up again by the next sync
+        self.unsyncedTrackIds: set[int] = set()
+
     async def run(self) -> None:
+        if self.resume and self.journal.resumable and not self.quiet:
+            self.console.print(
+                f"从任务日志恢复：已解析链接 {len(self.journal.links)}，已完成歌词文件 {len(self.journal.done)}",
+                style="info",
+            )
+
+        # Connections are set up while links are resolved and source files are scanned
+        warmUp = create_task(self.api.warmUp())
+
+        try:
+            if self.pipeline:
+                completed = await self.runPipeline()
+            else:
+                completed = await self.runBatch()
+        finally:
+            warmUp.cancel()
+            self.progress.pause()
+            self.api.saveCookies()
+            await self.api.close()
+            self.cache.close()
+            self.journal.close()
+            if self.statsPath is not None:
+                self.saveStats(self.statsPath)
+
+        if completed and self.failedCount == 0:
+            self.journal.remove()
+
+        if completed:
+            self.finishSync()
+
+        if completed and not self.quiet:
+            self.printSummary()
+            if self.failedCount > 0:
+                self.console.print(f"有 {self.failedCount} 项未能完成，可使用 --resume 重试。", style="warning")
+
+    async def runBatch(self) -> bool:
         self.progress.setup("解析链接与已存在的歌曲列表", len(self.links))
 
         task_resolveLink = []
         tasks: list[NCMTrack | NCMAlbum | NCMPlaylist] = []
         tracks: list[NCMTrack] = []
 
-        async with TaskGroup() as tg:
-            task_existingFiles = tg.create_task(self.getExistingFiles())
-            for link in self.links:
-                task_resolveLink.append(tg.create_task(self.resolveLink(link)))
+        with self.stats.phase("resolveLinks"):
+            async with TaskGroup() as tg:
+                task_existingFiles = tg.create_task(self.exporter.getExistingFiles())
+                for link in self.links:
+                    task_resolveLink.append(tg.create_task(self.resolveLink(link)))
 
         existingFiles = task_existingFiles.result()
         for task in task_resolveLink:
@@ -114,36 +219,102 @@ class NCMLyricsApp:
             self.printTasks(tasks)
             if not confirm("继续操作？", default=True):
                 self.console.print("任务已取消。", style="info")
-                return
+                return False
             self.progress.resume()
         self.progress.setup("解析保存路径", len(tracks))
 
-        task_resolvePath = []
         trackPairs: list[tuple[NCMTrack, Path | None]] = []
-        async with TaskGroup() as tg:
+        with self.stats.phase("resolvePaths"):
             for track in tracks:
-                task_resolvePath.append(tg.create_task(self.resolvePath(existingFiles, track)))
-        for taskPath in task_resolvePath:
-            trackPairs.append(taskPath.result())
+                trackPairs.append(self.resolvePath(existingFiles, track))
+                self.progress.advance()
 
-        # 同一目标路径只导出一次, 避免重复歌曲并发写同一文件
-        exportPairs: list[tuple[NCMTrack, Path | None]] = []
+        # 同一目标路径只导出一次, 避免重复歌曲并发写同一文件; 同一曲目只获取一次歌词
+        exportGroups: dict[int, tuple[NCMTrack, list[Path | None]]] = {}
         seenPaths: set[Path] = set()
+        exportCount = 0
         for track, path in trackPairs:
-            if path is not None and path in seenPaths:
-                continue
             if path is not None:
+                if path in seenPaths:
+                    continue
                 seenPaths.add(path)
-            exportPairs.append((track, path))
-
-        self.progress.setup("输出 Lrc 文件", len(exportPairs))
+            group = exportGroups.get(track.id)
+            if group is None:
+                exportGroups[track.id] = (track, [path])
+            elif path in group[1]:
+                continue
+            else:
+                group[1].append(path)
+            exportCount += 1
+
+        self.progress.setup("输出 Lrc 文件", exportCount)
+
+        with self.stats.phase("export"):
+            async with TaskGroup() as tg:
+                for track, paths in exportGroups.values():
+                    tg.create_task(self.exportLrc(track, paths))
+
+        return True
+
+    async def runPipeline(self) -> bool:
+        """链接解析, 路径解析与歌词输出由 exporter 的流水线同时进行, 不进行确认"""
+
+        # Links first, exported tracks are added to the total when they are known
+        self.progress.setup("解析链接并输出 Lrc 文件", len(self.links))
+
+        def acceptPath(track: NCMTrack, path: Path | None) -> bool:
+            self.progress.addTotal(1)
+            if self.journal.isDone(track.id, path):
+                self.progress.advance()
+                return False
+            return True
+
+        async with aclosing(self.exporter.exportLinks(self.links, self.resolveLink, acceptPath)) as results:
+            async for result in results:
+                self.printResult(result)
+                self.recordResult(result)
+
+        return True
+
+    def saveStats(self, path: Path) -> None:
+        report = {
+            "cache": {
+                table.name: {"hits": table.hits, "misses": table.misses}
+                for table in self.cache.tables
+                if table.hits + table.misses > 0
+            },
+            "results": {
+                "links": len(self.links),
+                "written": self.writtenCount,
+                "identical": self.identicalCount,
+                "failed": self.failedCount,
+            },
+        }
 
-        async with TaskGroup() as tg:
-            for track, path in exportPairs:
-                tg.create_task(self.exportLrc(track, path))
+        try:
+            self.stats.save(path, **report)
+        except OSError as e:
+            self.console.print(f"保存统计报告时出现错误：{path!s} ({e})", style="error")
+
+    def printSummary(self) -> None:
+        cacheStats = [
+            f"{name} {table.hits}/{table.hits + table.misses}"
+            for name, table in (
+                ("歌词", self.cache.lyrics),
+                ("单曲", self.cache.tracks),
+                ("专辑", self.cache.albums),
+                ("歌单", self.cache.playlists),
+            )
+            if table.hits + table.misses > 0
+        ]
+        if cacheStats:
+            self.console.print(f"缓存命中：{'，'.join(cacheStats)}", style="info")
 
-        self.progress.pause()
-        self.api.saveCookies()
+        if self.writtenCount + self.identicalCount > 0:
+            self.console.print(
+                f"歌词文件：写入 {self.writtenCount}，内容未变化而跳过 {self.identicalCount}",
+                style="info",
+            )
 
     def printTasks(self, tasks: Iterable[NCMTrack | NCMAlbum | NCMPlaylist]) -> None:
         def printTracks(tracks: Iterable[NCMTrack], arrowStyle: str | None = None) -> None:
@@ -167,39 +338,30 @@ class NCMLyricsApp:
                     )
                     printTracks(task.tracks, "playlistarrow")
 
-    async def getExistingFiles(self) -> dict[str, list[Path]]:
-        existingFiles: dict[str, list[Path]] = dict()
-        existingFiles["ALL"] = list()
-
-        for output in self.outputs:
-            output = output.absolute()
-            if not output.exists() or not output.is_dir():
-                continue
-            for content in output.iterdir():
-                if not content.is_file():
-                    continue
-                if content.suffix in (".ncm", ".mp3", ".flac"):
-                    existingFiles["ALL"].append(content)
-                    prefix = content.name[0]
-                    if prefix in existingFiles:
-                        existingFiles[prefix].append(content)
-                    else:
-                        existingFiles[prefix] = [content]
-
-        return existingFiles
-
     async def resolveLink(self, link: str) -> NCMTrack | NCMAlbum | NCMPlaylist | None:
+        journaled = self.journal.getLink(link)
+        if journaled is not None:
+            self.progress.advance()
+            return journaled
+
         try:
-            parsed = parseLink(link)
+            parsed = await parseLinkAsync(link, self.api)
         except UnsupportedLinkError:
+            self.failedCount += 1
             self.progress.advance()
             self.console.print(f"不支持的链接：{link}", style="error")
             return None
         except ParseLinkError:
+            self.failedCount += 1
             self.progress.advance()
             self.console.print_exception()
             self.console.print(f"解析链接时出现错误：{link}", style="error")
             return None
+        except NCMLyricsAppError as e:
+            self.failedCount += 1
+            self.progress.advance()
+            self.console.print(f"解析分享短链时出现错误：{link} ({e})", style="error")
+            return None
 
         result: NCMTrack | NCMAlbum | NCMPlaylist
 
@@ -209,91 +371,162 @@ class NCMLyricsApp:
                     result = await self.api.getDetailsForTrack(parsed.id)
                 case LinkType.Album:
                     result = await self.api.getDetailsForAlbum(parsed.id)
+                case LinkType.Playlist if self.syncState is not None:
+                    result = await self.syncPlaylist(parsed.id)
                 case LinkType.Playlist:
-                    result = await self.api.getDetailsForPlaylist(parsed.id)
-                    await result.fillDetailsOfTracks(self.api)
+                    result = await self.api.streamDetailsForPlaylist(parsed.id)
                 case _:
                     raise AssertionError(f"未知的链接类型：{parsed.type}")
         except NCMLyricsAppError as e:
+            self.failedCount += 1
             self.progress.advance()
             self.console.print(f"获取链接内容时出现错误：{link} ({e})", style="error")
             return None
 
+        self.journal.recordLink(link, result)
         self.progress.advance()
         return result
 
-    async def resolvePath(self, existingFiles: dict[str, list[Path]], track: NCMTrack) -> tuple[NCMTrack, Path | None]:
-        regex: Pattern[str] | None = None
-        targetPath: Path | None = None
+    async def syncPlaylist(self, playlistId: int) -> NCMPlaylist:
+        """以一次不附带曲目详情的请求获取歌单, 仅返回自上次同步以来新增的曲目"""
+        assert self.syncState is not None
 
-        # If not in prefix then search all existing files
-        files = existingFiles.get(track.artists[0][0], existingFiles["ALL"])
+        playlist = await self.api.getTrackIdsForPlaylist(playlistId)
+        key = NCMSyncState.syncKey(playlistId, self.outputs, self.types)
 
-        for file in files:
-            if regex is None:
-                escapedArtists = "(,| )".join(escapeRegex(artist) for artist in track.artists[:3])
-                if len(track.artists) > 3:
-                    escapedArtists += rf"((,| ){')?((,| )'.join(escapeRegex(artist) for artist in track.artists[3:])})?"
-                regex = compileRegex(rf"^{escapedArtists} - {escapeRegex(track.name.rstrip('.'))}\.+(ncm|mp3|flac)$")
-            matched = regex.match(file.name)
-            if matched is not None:
-                targetPath = file.with_suffix(".lrc")
-                break
-
-        self.progress.advance()
+        previousTrackIds = self.syncState.getTrackIds(key) or []
+        seenTrackIds = set(previousTrackIds)
+        currentTrackIds = set(playlist.trackIds)
 
-        if targetPath is None:
-            if self.exist:
-                return (track, None)
-            targetPath = self.outputs[-1] / safeFileName(f"{','.join(track.artists)} - {track.name}.lrc")
+        addedTrackIds = [trackId for trackId in playlist.trackIds if trackId not in seenTrackIds]
+        removedTrackIds = [trackId for trackId in previousTrackIds if trackId not in currentTrackIds]
+        self.syncPlaylists[key] = (playlist.trackIds, removedTrackIds)
 
-        return (track, targetPath)
+        tracks = await self.api.getDetailsForTracks(addedTrackIds) if addedTrackIds else []
+        return NCMPlaylist(playlist.id, playlist.name, tracks, [])
 
-    async def exportLrc(self, track: NCMTrack, path: Path | None) -> None:
-        if path is None:
-            self.console.print(
-                "[trackarrow]-->[/trackarrow]",
-                track.prettyString(),
-                "[dark_turquoise]==>[dark_turquoise] [warning]找不到对应的源文件, 跳过此曲目。[/warning]",
-            )
-            self.progress.advance()
-            return
-        if not self.overwrite and path.exists():
-            if not self.quiet:
-                self.console.print(
-                    "[trackarrow]-->[/trackarrow]",
-                    track.prettyString(),
-                    "[dark_turquoise]==>[/dark_turquoise] [warning]对应的歌词文件已存在, 跳过此曲目。[/warning]",
-                )
-            self.progress.advance()
+    def finishSync(self) -> None:
+        """保存同步状态, 并列出或删除已从歌单移除的曲目的歌词文件"""
+        if self.syncState is None:
             return
 
-        try:
-            lyrics = await self.api.getLyricsByTrack(track.id)
-        except NCMLyricsAppError as e:
-            if not self.quiet:
-                self.console.print(
-                    "[trackarrow]-->[/trackarrow]",
-                    track.prettyString(),
-                    f"[dark_turquoise]==>[/dark_turquoise] [warning]获取歌词时出现错误, 跳过此曲目。({e})[/warning]",
-                )
-            self.progress.advance()
-            return
+        activeTrackIds = {trackId for trackIds, _ in self.syncPlaylists.values() for trackId in trackIds}
+        activePaths = set(self.exportedPaths.values())
+        # trackId, lyric file of tracks removed from the playlists
+        removedPaths: list[tuple[int, Path]] = []
+
+        for key, (trackIds, removedTrackIds) in self.syncPlaylists.items():
+            previousTrackIds = set(self.syncState.getTrackIds(key) or ())
+            paths = self.syncState.getPaths(key)
+
+            syncedTrackIds = [
+                trackId for trackId in trackIds if trackId in previousTrackIds or trackId not in self.unsyncedTrackIds
+            ]
+            for trackId in syncedTrackIds:
+                if trackId in self.exportedPaths:
+                    paths[trackId] = self.exportedPaths[trackId]
+
+            for trackId in removedTrackIds:
+                path = paths.pop(trackId, None)
+                if path is None:
+                    if not self.quiet:
+                        self.console.print(f"已从歌单移除：{trackId}，未记录其歌词文件", style="info")
+                else:
+                    removedPaths.append((trackId, path))
+
+            self.syncState.update(key, syncedTrackIds, paths)
+
+        # Playlists synced in earlier runs may still list the same lyric files
+        referencedPaths = self.syncState.referencedPaths()
+
+        for trackId, path in removedPaths:
+            if not self.syncRemove or trackId in activeTrackIds or path in activePaths or path in referencedPaths:
+                if not self.quiet:
+                    self.console.print(f"已从歌单移除：{path!s}", style="info")
+                continue
 
-        if lyrics.isPureMusic and self.noPureMusic:
-            if not self.quiet:
-                self.console.print(
-                    "[trackarrow]-->[/trackarrow]",
-                    track.prettyString(),
-                    "[dark_turquoise]==>[/dark_turquoise] [warning]为纯音乐, 跳过此曲目。[/warning]",
-                )
-        else:
-            if not self.quiet:
-                self.console.print(
-                    "[trackarrow]-->[/trackarrow]",
-                    track.prettyString(),
-                    f"[dark_turquoise]==>[/dark_turquoise] [info]{path!s}[/info]",
-                )
-            await Lrc.fromNCMLyrics(lyrics, self.types).saveAs(path)
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                self.console.print(f"删除歌词文件时出现错误：{path!s} ({e})", style="error")
+            else:
+                if not self.quiet:
+                    self.console.print(f"已删除已从歌单移除的歌词文件：{path!s}", style="info")
+
+        self.syncState.save()
 
+    def resolvePath(self, existingFiles: SourceFileIndex, track: NCMTrack) -> tuple[NCMTrack, Path | None]:
+        return (track, self.exporter.resolvePath(existingFiles, track))
+
+    async def exportLrc(self, track: NCMTrack, paths: list[Path | None]) -> None:
+        pending: list[Path | None] = []
+        for path in paths:
+            if self.journal.isDone(track.id, path):
+                self.progress.advance()
+            else:
+                pending.append(path)
+
+        if not pending:
+            return
+
+        printed: set[NCMExportStatus] = set()
+        for result in await self.exporter.exportTrack(track, pending):
+            # A failed or skipped lyrics download is reported once for all paths of the track
+            if result.status not in printed:
+                self.printResult(result)
+            if result.status in (NCMExportStatus.Failed, NCMExportStatus.PureMusic):
+                printed.add(result.status)
+            self.recordResult(result)
+
+    def recordResult(self, result: NCMExportResult) -> None:
+        """将导出结果计入统计, 任务日志与同步状态"""
+        assert result.track is not None
+        trackId = result.track.id
+
+        match result.status:
+            case NCMExportStatus.Failed:
+                self.failedCount += 1
+                self.unsyncedTrackIds.add(trackId)
+                self.progress.advance()
+                return
+            case NCMExportStatus.NoSource:
+                self.unsyncedTrackIds.add(trackId)
+            case NCMExportStatus.Written:
+                self.writtenCount += 1
+            case NCMExportStatus.Identical:
+                self.identicalCount += 1
+
+        # Existing lyric files are recorded too, so that other synced playlists know they are still needed
+        if result.path is not None and result.status in (
+            NCMExportStatus.Written,
+            NCMExportStatus.Identical,
+            NCMExportStatus.Exists,
+        ):
+            self.exportedPaths[trackId] = result.path
+        self.journal.recordDone(trackId, result.path)
         self.progress.advance()
+
+    def printResult(self, result: NCMExportResult) -> None:
+        assert result.track is not None
+
+        match result.status:
+            case NCMExportStatus.NoSource:
+                message = "[warning]找不到对应的源文件, 跳过此曲目。[/warning]"
+            case _ if self.quiet:
+                return
+            case NCMExportStatus.Exists:
+                message = "[warning]对应的歌词文件已存在, 跳过此曲目。[/warning]"
+            case NCMExportStatus.Failed:
+                message = f"[warning]获取歌词时出现错误, 跳过此曲目。({result.error})[/warning]"
+            case NCMExportStatus.PureMusic:
+                message = "[warning]为纯音乐, 跳过此曲目。[/warning]"
+            case NCMExportStatus.Identical:
+                message = "[info]歌词文件内容未变化, 跳过写入。[/info]"
+            case _:
+                message = f"[info]{result.path!s}[/info]"
+
+        self.console.print(
+            "[trackarrow]-->[/trackarrow]",
+            result.track.prettyString(),
+            f"[dark_turquoise]==>[/dark_turquoise] {message}",
+        )
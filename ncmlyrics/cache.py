@@ -0,0 +1,259 @@
+import sqlite3
+from collections.abc import Iterable
+from json import JSONDecodeError
+from pathlib import Path
+from time import time
+from zlib import compress, decompress
+from zlib import error as ZlibError
+
+from .constant import (
+    CONFIG_CACHE_ALBUMS_MAX_ENTRIES,
+    CONFIG_CACHE_ALBUMS_TTL,
+    CONFIG_CACHE_COMMIT_INTERVAL,
+    CONFIG_CACHE_LYRICS_MAX_ENTRIES,
+    CONFIG_CACHE_LYRICS_TTL,
+    CONFIG_CACHE_PLAYLISTS_MAX_ENTRIES,
+    CONFIG_CACHE_PLAYLISTS_TTL,
+    CONFIG_CACHE_SHORT_LINKS_MAX_ENTRIES,
+    CONFIG_CACHE_SHORT_LINKS_TTL,
+    CONFIG_CACHE_TRACKS_MAX_ENTRIES,
+    CONFIG_CACHE_TRACKS_TTL,
+    PLATFORM,
+)
+from .type import CacheMode
+from .util import dumpJson, loadJson
+
+__all__ = ["NCMCache", "NCMCacheTable"]
+
+
+class NCMCacheTable:
+    """以 ID 为键的缓存表, 内容经过 zlib 压缩, 过期条目视为不存在, 超出容量时淘汰最久未访问的条目"""
+
+    def __init__(
+        self,
+        cache: "NCMCache",
+        name: str,
+        ttl: float | None,
+        maxEntries: int | None,
+        keyType: str = "INTEGER",
+    ) -> None:
+        self._cache = cache
+        self.name = name
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+
+        self.hits = 0
+        self.misses = 0
+
+        # id: accessed, flushed together to avoid a write per hit
+        self._accessed: dict[int | str, float] = {}
+
+        cache._execute(
+            f"CREATE TABLE IF NOT EXISTS {name} "
+            f"(id {keyType} PRIMARY KEY, payload BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)",
+        )
+        cache._execute(f"CREATE INDEX IF NOT EXISTS {name}_accessed ON {name} (accessed)")
+
+    def get(self, id: int | str, count: bool = True) -> bytes | None:
+        return self.getMany((id,), count).get(id)
+
+    def getMany(self, ids: Iterable[int | str], count: bool = True) -> dict[int | str, bytes]:
+        """count 为 False 时不计入命中统计, 用于条目仍需与服务器核对的情况"""
+        ids = tuple(ids)
+        result: dict[int | str, bytes] = {}
+
+        if not self._cache.readable:
+            return result
+
+        now = time()
+        for seek in range(0, len(ids), 500):
+            chunk = ids[seek : seek + 500]
+            rows = self._cache._fetchAll(
+                f"SELECT id, payload, created FROM {self.name} WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for id, payload, created in rows:
+                if self.ttl is not None and created + self.ttl < now:
+                    continue
+                try:
+                    result[id] = decompress(payload)
+                except ZlibError:
+                    continue
+                self._accessed[id] = now
+
+        if count:
+            self.hits += len(result)
+            self.misses += len(set(ids)) - len(result)
+        return result
+
+    def getData(self, id: int | str, count: bool = True) -> dict | None:
+        return self.getManyData((id,), count).get(id)
+
+    def getManyData(self, ids: Iterable[int | str], count: bool = True) -> dict[int | str, dict]:
+        result: dict[int | str, dict] = {}
+
+        for id, payload in self.getMany(ids, count).items():
+            try:
+                result[id] = loadJson(payload)
+            except JSONDecodeError:
+                self.delete(id)
+
+        return result
+
+    def countLookup(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def set(self, id: int | str, payload: bytes) -> None:
+        now = time()
+        self._accessed.pop(id, None)
+        self._cache._write(
+            f"INSERT OR REPLACE INTO {self.name} (id, payload, created, accessed) VALUES (?, ?, ?, ?)",
+            (id, compress(payload), now, now),
+        )
+
+    def setData(self, id: int | str, data: dict) -> None:
+        self.set(id, dumpJson(data))
+
+    def setMany(self, items: Iterable[tuple[int | str, bytes]]) -> None:
+        """以一条批量语句写入多个条目"""
+        now = time()
+        rows = [(id, compress(payload), now, now) for id, payload in items]
+        for id, *_ in rows:
+            self._accessed.pop(id, None)
+        self._cache._writeMany(
+            f"INSERT OR REPLACE INTO {self.name} (id, payload, created, accessed) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+
+    def setManyData(self, items: Iterable[tuple[int | str, dict]]) -> None:
+        self.setMany((id, dumpJson(data)) for id, data in items)
+
+    def delete(self, id: int | str) -> None:
+        self._accessed.pop(id, None)
+        self._cache._write(f"DELETE FROM {self.name} WHERE id = ?", (id,))
+
+    def flush(self) -> None:
+        if self._accessed:
+            self._cache._executeMany(
+                f"UPDATE {self.name} SET accessed = ? WHERE id = ?",
+                [(accessed, id) for id, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def evict(self) -> None:
+        if self.ttl is not None:
+            self._cache._execute(f"DELETE FROM {self.name} WHERE created < ?", (time() - self.ttl,))
+        if self.maxEntries is not None:
+            self._cache._execute(
+                f"DELETE FROM {self.name} WHERE id IN "
+                f"(SELECT id FROM {self.name} ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.maxEntries,),
+            )
+
+
+class NCMCache:
+    """保存在 PLATFORM.user_cache_path 下的 SQLite 缓存
+
+    数据库不可用时所有操作均静默失败, 表现为缓存未命中。
+    """
+
+    def __init__(self, mode: CacheMode = CacheMode.Normal, path: Path | None = None) -> None:
+        self.mode = mode
+        self.path = path or PLATFORM.user_cache_path / "cache.sqlite3"
+
+        self._connection: sqlite3.Connection | None = None
+        self._pendingWrites = 0
+
+        if mode is not CacheMode.Bypass:
+            try:
+                self._connection = sqlite3.connect(self.path, timeout=10)
+                self._connection.execute("PRAGMA journal_mode = WAL")
+                self._connection.execute("PRAGMA synchronous = NORMAL")
+            except sqlite3.Error:
+                self._connection = None
+
+        self.lyrics = NCMCacheTable(self, "lyrics", CONFIG_CACHE_LYRICS_TTL, CONFIG_CACHE_LYRICS_MAX_ENTRIES)
+        self.tracks = NCMCacheTable(self, "tracks", CONFIG_CACHE_TRACKS_TTL, CONFIG_CACHE_TRACKS_MAX_ENTRIES)
+        self.albums = NCMCacheTable(self, "albums", CONFIG_CACHE_ALBUMS_TTL, CONFIG_CACHE_ALBUMS_MAX_ENTRIES)
+        self.playlists = NCMCacheTable(
+            self,
+            "playlists",
+            CONFIG_CACHE_PLAYLISTS_TTL,
+            CONFIG_CACHE_PLAYLISTS_MAX_ENTRIES,
+        )
+        self.shortLinks = NCMCacheTable(
+            self,
+            "shortlinks",
+            CONFIG_CACHE_SHORT_LINKS_TTL,
+            CONFIG_CACHE_SHORT_LINKS_MAX_ENTRIES,
+            keyType="TEXT",
+        )
+
+    @property
+    def tables(self) -> tuple[NCMCacheTable, ...]:
+        return (self.lyrics, self.tracks, self.albums, self.playlists, self.shortLinks)
+
+    @property
+    def readable(self) -> bool:
+        return self._connection is not None and self.mode is CacheMode.Normal
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+
+        for table in self.tables:
+            table.flush()
+            table.evict()
+
+        try:
+            self._connection.commit()
+            self._connection.close()
+        except sqlite3.Error:
+            pass
+        self._connection = None
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(sql, parameters)
+        except sqlite3.Error:
+            pass
+
+    def _executeMany(self, sql: str, parameters: list[tuple]) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.executemany(sql, parameters)
+        except sqlite3.Error:
+            pass
+
+    def _fetchAll(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        if self._connection is None:
+            return []
+        try:
+            return self._connection.execute(sql, parameters).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def _write(self, sql: str, parameters: tuple) -> None:
+        self._execute(sql, parameters)
+        self._wrote(1)
+
+    def _writeMany(self, sql: str, parameters: list[tuple]) -> None:
+        if not parameters:
+            return
+        self._executeMany(sql, parameters)
+        self._wrote(len(parameters))
+
+    def _wrote(self, count: int) -> None:
+        self._pendingWrites += count
+        if self._connection is not None and self._pendingWrites >= CONFIG_CACHE_COMMIT_INTERVAL:
+            self._pendingWrites = 0
+            try:
+                self._connection.commit()
+            except sqlite3.Error:
+                pass
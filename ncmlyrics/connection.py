@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+
+from httpx2 import AsyncHTTPTransport, Limits, Timeout
+
+from .constant import (
+    CONFIG_API_HTTP2,
+    CONFIG_API_KEEPALIVE_EXPIRY,
+    CONFIG_API_MAX_CONNECTIONS,
+    CONFIG_API_TIMEOUT_CONNECT,
+    CONFIG_API_TIMEOUT_POOL,
+    CONFIG_API_TIMEOUT_READ,
+    CONFIG_API_TIMEOUT_WRITE,
+)
+
+try:
+    import h2  # type: ignore
+except ImportError:
+    h2 = None  # type: ignore
+
+__all__ = ["ConnectionPolicy"]
+
+
+@dataclass(frozen=True)
+class ConnectionPolicy:
+    """连接池与超时设置, 超时单位为秒"""
+
+    # None follows the concurrency
+    maxConnections: int | None = CONFIG_API_MAX_CONNECTIONS
+    keepaliveExpiry: float = CONFIG_API_KEEPALIVE_EXPIRY
+    connectTimeout: float = CONFIG_API_TIMEOUT_CONNECT
+    readTimeout: float = CONFIG_API_TIMEOUT_READ
+    writeTimeout: float = CONFIG_API_TIMEOUT_WRITE
+    poolTimeout: float = CONFIG_API_TIMEOUT_POOL
+    # Only takes effect when h2 is installed
+    http2: bool = CONFIG_API_HTTP2
+
+    @property
+    def useHttp2(self) -> bool:
+        return self.http2 and h2 is not None
+
+    def connections(self, concurrency: int) -> int:
+        return self.maxConnections or concurrency
+
+    def limits(self, concurrency: int) -> Limits:
+        connections = self.connections(concurrency)
+        return Limits(
+            max_connections=connections,
+            max_keepalive_connections=connections,
+            keepalive_expiry=self.keepaliveExpiry,
+        )
+
+    def timeout(self) -> Timeout:
+        return Timeout(
+            connect=self.connectTimeout,
+            read=self.readTimeout,
+            write=self.writeTimeout,
+            pool=self.poolTimeout,
+        )
+
+    def transport(self, concurrency: int) -> AsyncHTTPTransport:
+        """访问网络的传输层"""
+        return AsyncHTTPTransport(http2=self.useHttp2, limits=self.limits(concurrency))
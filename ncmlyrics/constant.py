@@ -10,4 +10,51 @@ CONFIG_LRC_AUTO_MERGE_OFFSET = 50
 
 CONFIG_API_DETAIL_TRACK_PER_REQUEST = 150
 
+CONFIG_API_RETRY = 4
+CONFIG_API_RETRY_BACKOFF_BASE = 0.5
+CONFIG_API_RETRY_BACKOFF_MAX = 30.0
+CONFIG_API_RETRY_STATUS = frozenset((429, 502, 503, 504))
+
+CONFIG_API_HTTP2 = True
+# None follows the concurrency, so requests wait on the limiter rather than the pool
+CONFIG_API_MAX_CONNECTIONS: int | None = None
+CONFIG_API_KEEPALIVE_EXPIRY = 30.0
+CONFIG_API_TIMEOUT_CONNECT = 5.0
+CONFIG_API_TIMEOUT_READ = 15.0
+CONFIG_API_TIMEOUT_WRITE = 5.0
+CONFIG_API_TIMEOUT_POOL = 30.0
+
+CONFIG_API_BREAKER_WINDOW = 20
+CONFIG_API_BREAKER_FAILURE_RATE = 0.5
+CONFIG_API_BREAKER_COOLDOWN = 2.0
+CONFIG_API_BREAKER_COOLDOWN_MAX = 60.0
+
+CONFIG_SOURCE_EXTENSIONS = (".ncm", ".mp3", ".flac")
+
+CONFIG_CACHE_LYRICS_TTL = 30 * 24 * 60 * 60
+CONFIG_CACHE_LYRICS_MAX_ENTRIES = 50000
+CONFIG_CACHE_TRACKS_TTL = 90 * 24 * 60 * 60
+CONFIG_CACHE_TRACKS_MAX_ENTRIES = 500000
+CONFIG_CACHE_ALBUMS_TTL = 90 * 24 * 60 * 60
+CONFIG_CACHE_ALBUMS_MAX_ENTRIES = 20000
+CONFIG_CACHE_PLAYLISTS_TTL = 30 * 24 * 60 * 60
+CONFIG_CACHE_PLAYLISTS_MAX_ENTRIES = 5000
+CONFIG_CACHE_SHORT_LINKS_TTL = 365 * 24 * 60 * 60
+CONFIG_CACHE_SHORT_LINKS_MAX_ENTRIES = 100000
+CONFIG_CACHE_COMMIT_INTERVAL = 200
+
+CONFIG_PIPELINE_QUEUE_SIZE = 256
+
+# Journals of interrupted jobs not resumed within this time are removed
+CONFIG_JOURNAL_MAX_AGE = 7 * 24 * 60 * 60
+
+CONFIG_SERVE_HOST = "127.0.0.1"
+CONFIG_SERVE_PORT = 8163
+# Serialized lyric files kept in memory by the serve mode
+CONFIG_SERVE_CACHE_SIZE = 4096
+
+CONFIG_CONCURRENCY = 16
+CONFIG_CONCURRENCY_ADAPTIVE = True
+CONFIG_CONCURRENCY_LATENCY_TOLERANCE = 2.0
+
 PLATFORM = PlatformDirs(appname=__title__, ensure_exists=True)
@@ -2,9 +2,11 @@ from httpx2 import RequestError
 
 __all__ = [
     "NCMApiError",
+    "NCMApiPoolTimeoutError",
     "NCMApiRequestError",
     "NCMApiRetryLimitExceededError",
     "NCMLyricsAppError",
+    "NCMLyricsServeError",
     "ObjectParseError",
     "ParseLinkError",
     "UnsupportedLinkError",
@@ -19,6 +21,10 @@ class NCMApiError(NCMLyricsAppError):
     """使用网易云音乐 API 时出现错误"""
 
 
+class NCMApiPoolTimeoutError(NCMApiError):
+    """等待连接池中的空闲连接超时, 请求未被发送"""
+
+
 class NCMApiRequestError(NCMApiError, RequestError):
     """请求网易云音乐 API 时出现错误"""
 
@@ -27,6 +33,10 @@ class NCMApiRetryLimitExceededError(NCMApiError):
     """请求网易云音乐 API 时错误次数超过重试次数上限"""
 
 
+class NCMLyricsServeError(NCMLyricsAppError):
+    """无法启动歌词服务"""
+
+
 class ObjectParseError(NCMLyricsAppError):
     """解析网易云音乐 API 返回的数据时出现错误"""
 
@@ -0,0 +1,324 @@
+from asyncio import Queue, Task, TaskGroup, create_task, shield
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from enum import StrEnum, auto
+from pathlib import Path
+from time import perf_counter
+from types import TracebackType
+from typing import Self
+
+from .api import NCMApi
+from .cache import NCMCache
+from .constant import CONFIG_CONCURRENCY, CONFIG_PIPELINE_QUEUE_SIZE, CONFIG_SOURCE_EXTENSIONS
+from .error import NCMLyricsAppError
+from .limiter import AdaptiveLimiter
+from .lrc import Lrc
+from .object import NCMAlbum, NCMLyrics, NCMPlaylist, NCMTrack
+from .source import SourceFileIndex, SourceScanner
+from .stats import NCMStats
+from .type import CacheMode, LinkType, LrcType
+from .util import parseLinkAsync, safeFileName
+
+__all__ = ["NCMExportResult", "NCMExportStatus", "NCMExporter"]
+
+
+class NCMExportStatus(StrEnum):
+    # Lyric file written
+    Written = auto()
+    # Lyric file already has this content, not written again
+    Identical = auto()
+    # Lyric file exists and overwrite is off
+    Exists = auto()
+    # No source file for the track and exist is on
+    NoSource = auto()
+    # Pure music and noPureMusic is on
+    PureMusic = auto()
+    # Lyrics could not be fetched
+    Failed = auto()
+    # The link could not be resolved, track and path are None
+    LinkFailed = auto()
+
+
+@dataclass(slots=True)
+class NCMExportResult:
+    track: NCMTrack | None
+    path: Path | None
+    status: NCMExportStatus
+    # Seconds from the start of exporting the track
+    duration: float = 0.0
+    error: NCMLyricsAppError | None = None
+    link: str | None = None
+
+
+ResultCallback = Callable[[NCMExportResult], None]
+# Returns None when the failure of the link has been handled by the caller
+LinkResolver = Callable[[str], Awaitable[NCMTrack | NCMAlbum | NCMPlaylist | None]]
+# Returns False to skip exporting to the path
+PathFilter = Callable[[NCMTrack, Path | None], bool]
+
+
+class NCMExporter:
+    """不依赖终端界面的歌词导出接口, 以异步迭代器按完成顺序产生每首曲目的导出结果
+
+    未给出 api 时将自行创建并在 close 时关闭。提前结束迭代时应使用 contextlib.aclosing 以取消剩余的导出。
+    """
+
+    def __init__(
+        self,
+        types: Iterable[LrcType] = tuple(LrcType),
+        outputs: Iterable[Path] = (),
+        api: NCMApi | None = None,
+        jobs: int = CONFIG_CONCURRENCY,
+        exist: bool = False,
+        overwrite: bool = False,
+        noPureMusic: bool = False,
+        writeIdentical: bool = False,
+        recursive: bool = False,
+        extensions: Iterable[str] = CONFIG_SOURCE_EXTENSIONS,
+        cacheMode: CacheMode = CacheMode.Normal,
+        stats: NCMStats | None = None,
+    ) -> None:
+        self.types = tuple(types)
+        self.outputs = tuple(outputs) or (Path(),)
+        self.jobs = jobs
+        self.exist = exist
+        self.overwrite = overwrite
+        self.noPureMusic = noPureMusic
+        self.writeIdentical = writeIdentical
+        self.recursive = recursive
+        self.extensions = tuple(extensions)
+        self.cacheMode = cacheMode
+        self.stats = stats or NCMStats()
+
+        self._ownsApi = api is None
+        if api is None:
+            api = NCMApi(concurrency=jobs, cache=NCMCache(cacheMode), stats=self.stats)
+        self.api = api
+
+        self.writeLimiter = AdaptiveLimiter(jobs, adaptive=False)
+
+        # trackId: lyrics download shared by the exports of the track in progress, dropped once none is waiting
+        self.lyricsTasks: dict[int, Task[NCMLyrics]] = {}
+        self._lyricsWaiters: dict[int, int] = {}
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._ownsApi:
+            await self.api.close()
+            if self.api.cache is not None:
+                self.api.cache.close()
+
+    async def exportLinks(
+        self,
+        links: Iterable[str],
+        resolveLink: LinkResolver | None = None,
+        acceptPath: PathFilter | None = None,
+    ) -> AsyncIterator[NCMExportResult]:
+        """解析链接并导出其中的全部曲目, 链接解析, 路径解析与歌词导出同时进行
+
+        resolveLink 替代默认的链接解析, 返回 None 时视为调用方已处理该链接的失败;
+        acceptPath 在每个待导出的路径确定时调用, 返回 False 时跳过该路径。
+        """
+
+        async def produce(trackQueue: Queue[NCMTrack | None], emit: ResultCallback) -> None:
+            async def resolveOne(link: str) -> None:
+                result: NCMTrack | NCMAlbum | NCMPlaylist | None
+                if resolveLink is not None:
+                    result = await resolveLink(link)
+                else:
+                    try:
+                        result = await self.resolveLink(link)
+                    except NCMLyricsAppError as e:
+                        emit(NCMExportResult(None, None, NCMExportStatus.LinkFailed, error=e, link=link))
+                        return
+                if result is not None:
+                    for track in result.tracks:
+                        await trackQueue.put(track)
+
+            with self.stats.phase("resolveLinks"):
+                async with TaskGroup() as tg:
+                    for link in links:
+                        tg.create_task(resolveOne(link))
+
+        async for result in self._pipeline(produce, acceptPath):
+            yield result
+
+    async def exportTracks(
+        self,
+        tracks: Iterable[NCMTrack],
+        acceptPath: PathFilter | None = None,
+    ) -> AsyncIterator[NCMExportResult]:
+        """导出给定的曲目, acceptPath 与 exportLinks 相同"""
+
+        async def produce(trackQueue: Queue[NCMTrack | None], _: ResultCallback) -> None:
+            for track in tracks:
+                await trackQueue.put(track)
+
+        async for result in self._pipeline(produce, acceptPath):
+            yield result
+
+    async def resolveLink(self, link: str) -> NCMTrack | NCMAlbum | NCMPlaylist:
+        parsed = await parseLinkAsync(link, self.api)
+
+        match parsed.type:
+            case LinkType.Track:
+                return await self.api.getDetailsForTrack(parsed.id)
+            case LinkType.Album:
+                return await self.api.getDetailsForAlbum(parsed.id)
+            case LinkType.Playlist:
+                return await self.api.streamDetailsForPlaylist(parsed.id)
+            case _:
+                raise AssertionError(f"未知的链接类型：{parsed.type}")
+
+    async def getExistingFiles(self) -> SourceFileIndex:
+        with self.stats.phase("scanSources"):
+            return await SourceScanner(self.extensions, self.recursive, self.cacheMode).scan(self.outputs)
+
+    def resolvePath(self, existingFiles: SourceFileIndex, track: NCMTrack) -> Path | None:
+        """歌词文件的保存路径, 找不到源文件且 exist 时为 None"""
+        sourcePath = existingFiles.find(track)
+        if sourcePath is not None:
+            return sourcePath.with_suffix(".lrc")
+
+        if self.exist:
+            return None
+        return self.outputs[-1] / safeFileName(f"{','.join(track.artists)} - {track.name}.lrc")
+
+    async def getLyrics(self, trackId: int) -> NCMLyrics:
+        """同一曲目同时进行的导出共用一次歌词获取, 获取结果不在导出之间保留"""
+        task = self.lyricsTasks.get(trackId)
+        if task is None:
+            task = self.lyricsTasks[trackId] = create_task(self.api.getLyricsByTrack(trackId))
+        self._lyricsWaiters[trackId] = self._lyricsWaiters.get(trackId, 0) + 1
+
+        try:
+            return await shield(task)
+        finally:
+            self._lyricsWaiters[trackId] -= 1
+            if self._lyricsWaiters[trackId] == 0:
+                del self._lyricsWaiters[trackId]
+                del self.lyricsTasks[trackId]
+                # Every waiter was cancelled
+                task.cancel()
+
+    async def exportTrack(self, track: NCMTrack, paths: Iterable[Path | None]) -> list[NCMExportResult]:
+        """将一首曲目的歌词导出到 paths 中的每个路径, 歌词只获取一次"""
+        start = perf_counter()
+        results: list[NCMExportResult] = []
+        targets: list[Path] = []
+
+        for path in paths:
+            if path is None:
+                results.append(NCMExportResult(track, None, NCMExportStatus.NoSource))
+            elif not self.overwrite and path.exists():
+                results.append(NCMExportResult(track, path, NCMExportStatus.Exists))
+            else:
+                targets.append(path)
+
+        if not targets:
+            return results
+
+        try:
+            with self.stats.measure("app.lyrics"):
+                lyrics = await self.getLyrics(track.id)
+        except NCMLyricsAppError as e:
+            duration = perf_counter() - start
+            results.extend(NCMExportResult(track, path, NCMExportStatus.Failed, duration, e) for path in targets)
+            return results
+
+        if lyrics.isPureMusic and self.noPureMusic:
+            duration = perf_counter() - start
+            results.extend(NCMExportResult(track, path, NCMExportStatus.PureMusic, duration) for path in targets)
+            return results
+
+        with self.stats.measure("lrc.parse"):
+            lrc = Lrc.fromNCMLyrics(lyrics, self.types)
+        with self.stats.measure("lrc.serialize"):
+            content = lrc.serializeLyricFile().encode()
+
+        for path in targets:
+            async with self.writeLimiter.slot():
+                with self.stats.measure("lrc.write"):
+                    written = await Lrc.saveContentAs(path, content, skipIdentical=not self.writeIdentical)
+
+            status = NCMExportStatus.Written if written else NCMExportStatus.Identical
+            results.append(NCMExportResult(track, path, status, perf_counter() - start))
+
+        return results
+
+    async def _pipeline(
+        self,
+        produce: Callable[[Queue[NCMTrack | None], ResultCallback], Awaitable[None]],
+        acceptPath: PathFilter | None = None,
+    ) -> AsyncIterator[NCMExportResult]:
+        trackQueue: Queue[NCMTrack | None] = Queue(CONFIG_PIPELINE_QUEUE_SIZE)
+        exportQueue: Queue[tuple[NCMTrack, Path | None] | None] = Queue(CONFIG_PIPELINE_QUEUE_SIZE)
+        # Unbounded, a slow consumer must not hold up the end of the pipeline
+        results: Queue[NCMExportResult | None] = Queue()
+
+        async def produceTracks() -> None:
+            await produce(trackQueue, results.put_nowait)
+            await trackQueue.put(None)
+
+        async def resolvePaths(existingFilesTask: Task[SourceFileIndex]) -> None:
+            existingFiles = await existingFilesTask
+            seenPaths: set[Path] = set()
+            seenMissing: set[int] = set()
+
+            while (track := await trackQueue.get()) is not None:
+                with self.stats.phase("resolvePaths"):
+                    path = self.resolvePath(existingFiles, track)
+                # Every lyric file is exported once, tracks listed by several links share their lyrics download
+                if path is None:
+                    if track.id in seenMissing:
+                        continue
+                    seenMissing.add(track.id)
+                else:
+                    if path in seenPaths:
+                        continue
+                    seenPaths.add(path)
+                if acceptPath is None or acceptPath(track, path):
+                    await exportQueue.put((track, path))
+
+            for _ in range(self.jobs):
+                await exportQueue.put(None)
+
+        async def export() -> None:
+            while (pair := await exportQueue.get()) is not None:
+                track, path = pair
+                for result in await self.exportTrack(track, (path,)):
+                    results.put_nowait(result)
+
+        async def exportAll() -> None:
+            with self.stats.phase("export"):
+                async with TaskGroup() as tg:
+                    for _ in range(self.jobs):
+                        tg.create_task(export())
+
+        async def run() -> None:
+            try:
+                async with TaskGroup() as tg:
+                    existingFiles = tg.create_task(self.getExistingFiles())
+                    tg.create_task(produceTracks())
+                    tg.create_task(resolvePaths(existingFiles))
+                    tg.create_task(exportAll())
+            finally:
+                results.put_nowait(None)
+
+        task = create_task(run())
+        try:
+            while (result := await results.get()) is not None:
+                yield result
+            await task
+        finally:
+            task.cancel()
@@ -0,0 +1,146 @@
+from collections.abc import Iterable
+from hashlib import sha256
+from json import JSONDecodeError
+from pathlib import Path
+from time import time
+from typing import IO
+
+from .constant import CONFIG_JOURNAL_MAX_AGE, PLATFORM
+from .error import ObjectParseError
+from .object import NCMAlbum, NCMPlaylist, NCMTrack
+from .type import LrcType
+from .util import dumpJson, loadJson
+
+__all__ = ["NCMJobJournal"]
+
+JOURNAL_OBJECT_TYPES: dict[str, type[NCMTrack | NCMAlbum | NCMPlaylist]] = {
+    "track": NCMTrack,
+    "album": NCMAlbum,
+    "playlist": NCMPlaylist,
+}
+
+
+class NCMJobJournal:
+    """保存在 PLATFORM.user_state_path 下的任务日志, 以 Json Lines 记录链接的解析结果与每首曲目的完成情况
+
+    同一组链接, 输出目录与歌词类型视为同一任务。日志不可用时所有操作均静默失败, 表现为没有可恢复的进度。
+    仅在 resume 时读取并记录日志, 否则删除同一任务遗留的日志且不进行记录。超过 CONFIG_JOURNAL_MAX_AGE 未更新的日志会被清理。
+    """
+
+    def __init__(self, key: str, resume: bool = False, path: Path | None = None) -> None:
+        self.path = path or PLATFORM.user_state_path / "jobs" / f"{key}.jsonl"
+        self.resume = resume
+
+        # link: resolved result
+        self.links: dict[str, NCMTrack | NCMAlbum | NCMPlaylist] = {}
+        # trackId, path
+        self.done: set[tuple[int, str | None]] = set()
+
+        self._file: IO[bytes] | None = None
+        self._cutOff = False
+
+        self.prune(self.path.parent, exclude=self.path)
+
+        if not resume:
+            self.remove()
+            return
+
+        self._load()
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("ab")
+            if self._cutOff:
+                self._file.write(b"\n")
+        except OSError:
+            self._file = None
+
+    @staticmethod
+    def jobKey(links: Iterable[str], outputs: Iterable[Path], types: Iterable[LrcType]) -> str:
+        job = {
+            "links": list(links),
+            "outputs": [str(output.absolute()) for output in outputs],
+            "types": [lrcType.value for lrcType in types],
+        }
+        return sha256(dumpJson(job)).hexdigest()[:16]
+
+    @staticmethod
+    def prune(directory: Path, maxAge: float = CONFIG_JOURNAL_MAX_AGE, exclude: Path | None = None) -> None:
+        """删除 directory 中超过 maxAge 秒未更新的任务日志"""
+        expired = time() - maxAge
+        try:
+            for path in directory.glob("*.jsonl"):
+                if path != exclude and path.stat().st_mtime < expired:
+                    path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    @property
+    def resumable(self) -> bool:
+        return len(self.links) > 0 or len(self.done) > 0
+
+    def getLink(self, link: str) -> NCMTrack | NCMAlbum | NCMPlaylist | None:
+        return self.links.get(link)
+
+    def recordLink(self, link: str, result: NCMTrack | NCMAlbum | NCMPlaylist) -> None:
+        self.links[link] = result
+        for name, cls in JOURNAL_OBJECT_TYPES.items():
+            if isinstance(result, cls):
+                self._write({"link": link, "type": name, "data": result.toData()})
+
+    def isDone(self, trackId: int, path: Path | None) -> bool:
+        return (trackId, None if path is None else str(path)) in self.done
+
+    def recordDone(self, trackId: int, path: Path | None) -> None:
+        entry = (trackId, None if path is None else str(path))
+        if entry not in self.done:
+            self.done.add(entry)
+            self._write({"track": trackId, "path": entry[1]})
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+
+    def remove(self) -> None:
+        """删除日志, 用于任务完成后或不进行记录时"""
+        self.close()
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def _load(self) -> None:
+        try:
+            content = self.path.read_bytes()
+        except OSError:
+            return
+
+        self._cutOff = len(content) > 0 and not content.endswith(b"\n")
+
+        for line in content.splitlines():
+            try:
+                record = loadJson(line)
+                if "link" in record:
+                    self.links[record["link"]] = JOURNAL_OBJECT_TYPES[record["type"]].fromData(record["data"])
+                else:
+                    self.done.add((record["track"], record["path"]))
+            except (JSONDecodeError, ObjectParseError, KeyError, TypeError):
+                # The last line may be cut off by the interruption
+                continue
+
+    def _write(self, record: dict) -> None:
+        if self._file is None:
+            return
+
+        try:
+            # Flushed per record, an interrupted run loses at most the record being written
+            self._file.write(dumpJson(record) + b"\n")
+            self._file.flush()
+        except OSError:
+            self.close()
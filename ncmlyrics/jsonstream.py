@@ -0,0 +1,225 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+from json import JSONDecodeError
+from re import compile as compileRegex
+from typing import Any
+
+from .util import loadJson
+
+__all__ = ["JsonStreamParser"]
+
+JsonPath = tuple[str, ...]
+
+RE_WHITESPACE = compileRegex(rb"[ \t\r\n]*")
+RE_STRING_END = compileRegex(rb'(?:[^"\\]++|\\.)*+"')
+RE_SKIP_TO_BRACKET = compileRegex(rb'[^"\[\]{}]*+(?:"(?:[^"\\]++|\\.)*+"[^"\[\]{}]*+)*+')
+RE_SCALAR_END = compileRegex(rb"[,\]} \t\r\n]")
+
+
+@dataclass
+class JsonStreamFrame:
+    # "{" or "["
+    kind: int
+    path: JsonPath
+    key: str | None = None
+    empty: bool = True
+
+
+@dataclass
+class JsonStreamSkip:
+    start: int
+    scan: int
+    depth: int
+    container: bool
+    # None for values that are skipped without decoding
+    path: JsonPath | None
+
+
+class JsonStreamParser:
+    """增量解析 Json, 仅解码所关注路径上的值与数组元素, 其余部分直接跳过且不在缓冲区中保留
+
+    values 中的路径产生其值本身, items 中的路径应为数组, 产生其中的每个元素, 数组元素的路径即为数组的路径。
+    """
+
+    def __init__(self, values: Iterable[JsonPath] = (), items: Iterable[JsonPath] = ()) -> None:
+        self.values = frozenset(values)
+        self.items = frozenset(items)
+        self._ancestors = frozenset(path[:depth] for path in self.values | self.items for depth in range(len(path)))
+
+        self._buffer = bytearray()
+        self._pos = 0
+        self._consumed = 0
+
+        self._stack: list[JsonStreamFrame] = []
+        # value, key, colon, next
+        self._expect = "value"
+        self._skip: JsonStreamSkip | None = None
+        self._finished = False
+
+    def feed(self, chunk: bytes) -> list[tuple[JsonPath, Any]]:
+        self._buffer += chunk
+        events: list[tuple[JsonPath, Any]] = []
+
+        while not self._finished and self._step(events):
+            pass
+
+        # Drop everything that can not be needed again, skipped values are not kept either
+        if self._skip is None:
+            cut = self._pos
+        elif self._skip.path is None:
+            cut = self._skip.scan
+            self._skip.start = self._skip.scan
+        else:
+            cut = self._skip.start
+        if cut:
+            del self._buffer[:cut]
+            self._consumed += cut
+            self._pos -= cut
+            if self._skip is not None:
+                self._skip.start -= cut
+                self._skip.scan -= cut
+
+        return events
+
+    def close(self) -> list[tuple[JsonPath, Any]]:
+        events: list[tuple[JsonPath, Any]] = []
+
+        # A number at the end of the document has no delimiter after it
+        if self._skip is not None and not self._stack:
+            events = self.feed(b" ")
+
+        if not self._finished or self._buffer[self._pos :].strip():
+            raise self._error("Json 不完整或存在多余内容")
+
+        return events
+
+    def _error(self, message: str) -> JSONDecodeError:
+        return JSONDecodeError(message, self._buffer.decode(errors="replace"), self._consumed + self._pos)
+
+    def _step(self, events: list[tuple[JsonPath, Any]]) -> bool:
+        """处理一个结构记号, 数据不足时返回 False"""
+        if self._skip is not None:
+            return self._continueSkip(events)
+
+        self._pos = RE_WHITESPACE.match(self._buffer, self._pos).end()  # type: ignore[union-attr]
+        if self._pos >= len(self._buffer):
+            return False
+
+        char = self._buffer[self._pos]
+
+        match self._expect:
+            case "value":
+                return self._startValue(events, char)
+            case "key":
+                if char == 0x7D and self._stack[-1].empty:  # }
+                    self._pos += 1
+                    return self._endContainer()
+                if char != 0x22:  # "
+                    raise self._error("预期为对象的键")
+                matched = RE_STRING_END.match(self._buffer, self._pos + 1)
+                if matched is None:
+                    return False
+                self._stack[-1].key = loadJson(self._buffer[self._pos : matched.end()])
+                self._pos = matched.end()
+                self._expect = "colon"
+            case "colon":
+                if char != 0x3A:  # :
+                    raise self._error("预期为冒号")
+                self._pos += 1
+                self._expect = "value"
+            case "next":
+                self._pos += 1
+                if char == 0x2C:  # ,
+                    self._expect = "key" if self._stack[-1].kind == 0x7B else "value"
+                elif char == self._stack[-1].kind + 2:  # } or ]
+                    return self._endContainer()
+                else:
+                    raise self._error("预期为逗号或容器结尾")
+
+        return True
+
+    def _startValue(self, events: list[tuple[JsonPath, Any]], char: int) -> bool:
+        if self._stack:
+            frame = self._stack[-1]
+            if frame.kind == 0x5B:  # [
+                if char == 0x5D and frame.empty:  # ]
+                    self._pos += 1
+                    return self._endContainer()
+                path = frame.path
+                captured = path in self.items
+            else:
+                assert frame.key is not None
+                path = (*frame.path, frame.key)
+                captured = path in self.values
+        else:
+            path = ()
+            captured = path in self.values
+
+        if char in b",:]}":
+            raise self._error("预期为值")
+
+        if self._stack:
+            self._stack[-1].empty = False
+
+        if not captured and (path in self._ancestors and char in (0x7B, 0x5B) or path in self.items and char == 0x5B):
+            self._stack.append(JsonStreamFrame(char, path))
+            self._pos += 1
+            self._expect = "key" if char == 0x7B else "value"
+            return True
+
+        self._skip = JsonStreamSkip(self._pos, self._pos, 0, char in (0x7B, 0x5B), path if captured else None)
+        return self._continueSkip(events)
+
+    def _continueSkip(self, events: list[tuple[JsonPath, Any]]) -> bool:
+        skip = self._skip
+        assert skip is not None
+        buffer = self._buffer
+
+        if not skip.container:
+            if buffer[skip.start] == 0x22:
+                matched = RE_STRING_END.match(buffer, skip.start + 1)
+            else:
+                matched = RE_SCALAR_END.search(buffer, skip.start)
+            if matched is None:
+                return False
+            end = matched.end() if buffer[skip.start] == 0x22 else matched.start()
+        else:
+            # Everything up to the next bracket outside of strings is consumed in one match
+            skipToBracket = RE_SKIP_TO_BRACKET.match
+            length = len(buffer)
+            scan, depth = skip.scan, skip.depth
+
+            while True:
+                scan = skipToBracket(buffer, scan).end()  # type: ignore[union-attr]
+                if scan >= length or buffer[scan] == 0x22:
+                    # Out of data, maybe inside a string
+                    skip.scan, skip.depth = scan, depth
+                    return False
+                char = buffer[scan]
+                scan += 1
+                if char == 0x7B or char == 0x5B:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        break
+
+            end = scan
+
+        if skip.path is not None:
+            events.append((skip.path, loadJson(buffer[skip.start : end])))
+
+        self._skip = None
+        self._pos = end
+        return self._endValue()
+
+    def _endContainer(self) -> bool:
+        self._stack.pop()
+        return self._endValue()
+
+    def _endValue(self) -> bool:
+        if self._stack:
+            self._expect = "next"
+        else:
+            self._finished = True
+        return True
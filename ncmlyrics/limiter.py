@@ -0,0 +1,117 @@
+from asyncio import CancelledError, Future, get_running_loop
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from time import monotonic
+
+from .constant import CONFIG_CONCURRENCY_ADAPTIVE, CONFIG_CONCURRENCY_LATENCY_TOLERANCE
+
+__all__ = ["AdaptiveLimiter", "LimiterSlot"]
+
+
+class LimiterSlot:
+    def __init__(self) -> None:
+        self.failed = False
+
+    def fail(self) -> None:
+        """将本次任务记为失败, 用于未抛出异常但结果不可用的情况"""
+        self.failed = True
+
+
+class AdaptiveLimiter:
+    """限制同时进行的任务数量
+
+    启用自适应时按 AIMD 方式调整上限: 任务成功且延迟未明显升高时缓慢增加, 任务失败或延迟超过基线的
+    CONFIG_CONCURRENCY_LATENCY_TOLERANCE 倍时减少, 上限始终位于 1 与 maxLimit 之间。
+    """
+
+    def __init__(self, maxLimit: int, adaptive: bool = CONFIG_CONCURRENCY_ADAPTIVE) -> None:
+        self.maxLimit = max(maxLimit, 1)
+        self.adaptive = adaptive
+
+        self._limit = float(self.maxLimit)
+        self._inFlight = 0
+        self._waiters: deque[Future[None]] = deque()
+
+        self._baseLatency: float | None = None
+        self._lastDecrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), 1)
+
+    @property
+    def inFlight(self) -> int:
+        return self._inFlight
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[LimiterSlot]:
+        await self.acquire()
+        start = monotonic()
+        slot = LimiterSlot()
+
+        try:
+            yield slot
+        except CancelledError:
+            raise
+        except BaseException:
+            slot.fail()
+            raise
+        finally:
+            self.record(monotonic() - start, slot.failed)
+            self.release()
+
+    async def acquire(self) -> None:
+        while self._inFlight >= self.limit:
+            waiter: Future[None] = get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # Hand over the wake up if we were already woken
+                self._wakeUp()
+                raise
+
+        self._inFlight += 1
+
+    def release(self) -> None:
+        self._inFlight -= 1
+        self._wakeUp()
+
+    def record(self, latency: float, failed: bool = False) -> None:
+        if not self.adaptive:
+            return
+
+        if failed:
+            self._decrease(0.5)
+            return
+
+        if self._baseLatency is None or latency < self._baseLatency:
+            self._baseLatency = latency
+        else:
+            # Let the baseline drift slowly so that a single lucky request does not pin it
+            self._baseLatency += (latency - self._baseLatency) * 0.01
+
+        if latency > self._baseLatency * CONFIG_CONCURRENCY_LATENCY_TOLERANCE:
+            self._decrease(0.9)
+        else:
+            self._limit = min(self._limit + 1 / self._limit, self.maxLimit)
+            self._wakeUp()
+
+    def _decrease(self, factor: float) -> None:
+        # Requests sent in the same burst fail together, only react once per round trip
+        now = monotonic()
+        if now - self._lastDecrease < (self._baseLatency or 0.0):
+            return
+        self._lastDecrease = now
+        self._limit = max(self._limit * factor, 1.0)
+
+    def _wakeUp(self) -> None:
+        free = self.limit - self._inFlight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
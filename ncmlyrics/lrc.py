@@ -1,13 +1,15 @@
+import os
+from bisect import bisect_left, insort
 from collections.abc import Generator, Iterable
 from dataclasses import dataclass, field
 from json import JSONDecodeError
 from json import loads as loadJson
 from pathlib import Path
-from re import Match
-from re import compile as compileRegex
+from secrets import token_hex
+from stat import S_IMODE
 from typing import Self
 
-import anyio
+from anyio import to_thread
 
 from .constant import CONFIG_LRC_AUTO_MERGE, CONFIG_LRC_AUTO_MERGE_OFFSET
 from .object import NCMLyrics
@@ -15,11 +17,7 @@ from .type import LrcMetaType, LrcType
 
 __all__ = ["Lrc"]
 
-LRC_RE_COMMIT = compileRegex(r"^\s*#")
-LRC_RE_META = compileRegex(r"^\s*\[(?P<type>ti|ar|al|au|length|by|offset):\s*(?P<content>.+?)\s*\]\s*$")
-LRC_RE_META_NCM_SPECIAL = compileRegex(r"^\s*\{.*\}\s*$")
-LRC_RE_LYRIC = compileRegex(r"^\s*(?P<timeLabels>(?:\s*\[\d{1,2}:\d{1,2}(?:\.\d{1,3})?\])+)\s*(?P<lyric>.+?)\s*$")
-LRC_RE_LYRIC_TIMELABEL = compileRegex(r"\[(?P<minutes>\d{1,2}):(?P<seconds>\d{1,2}(?:\.\d{1,3})?)\]")
+LRC_META_TYPES = {metaType.value: metaType for metaType in LrcMetaType}
 
 
 @dataclass
@@ -36,6 +34,9 @@ class Lrc:
         # timestamp: lrcType: lrcContent
         self.lyrics: dict[int, dict[LrcType, str]] = {}
 
+        # sorted keys of self.lyrics
+        self._timestamps: list[int] = []
+
         # specials: timestamp/metaType: lrcContent/metaContent
         self.specials: LrcSpecials = LrcSpecials()
 
@@ -55,23 +56,24 @@ class Lrc:
             self.parseLyricRow(lrcType, row)
 
     def parseLyricRow(self, lrcType: LrcType, lrcRow: str) -> None:
-        # Skip commit lines
-        if LRC_RE_COMMIT.match(lrcRow) is not None:
-            return
-
-        if LRC_RE_META_NCM_SPECIAL.match(lrcRow) is not None:
-            self.appendSpecialNCMMetaDataRow(lrcRow)
+        rowStart = len(lrcRow) - len(lrcRow.lstrip())
+        if rowStart == len(lrcRow):
             return
 
-        matchedMetaDataRow = LRC_RE_META.match(lrcRow)
-        if matchedMetaDataRow is not None:
-            self.appendMatchedMetaDataRow(lrcType, matchedMetaDataRow)
-            return
-
-        matchedLyricRow = LRC_RE_LYRIC.match(lrcRow)
-        if matchedLyricRow is not None:
-            self.appendMatchedLyricRow(lrcType, matchedLyricRow)
-            return
+        match lrcRow[rowStart]:
+            case "#":
+                # Skip commit lines
+                return
+            case "{":
+                rowEnd = len(lrcRow.rstrip())
+                if rowEnd - rowStart >= 2 and lrcRow[rowEnd - 1] == "}":
+                    self.appendSpecialNCMMetaDataRow(lrcRow)
+            case "[":
+                # Time labels always start with a digit, metadata types never do
+                if lrcRow[rowStart + 1 : rowStart + 2].isdecimal():
+                    self._scanLyricRow(lrcType, lrcRow, rowStart)
+                else:
+                    self._scanMetaDataRow(lrcType, lrcRow, rowStart)
 
     def appendLyric(self, lrcType: LrcType, timestamps: Iterable[int], lyric: str) -> None:
         for timestamp in timestamps:
@@ -79,6 +81,7 @@ class Lrc:
                 self.lyrics[timestamp][lrcType] = lyric
             else:
                 self.lyrics[timestamp] = {lrcType: lyric}
+                insort(self._timestamps, timestamp)
 
     def appendSpecialNCMMetaDataRow(self, lrcRow: str) -> None:
         try:
@@ -103,26 +106,13 @@ class Lrc:
 
         self.specials.metadata.append((LrcMetaType.Author, f"{key}/{value}"))
 
-    def appendMatchedMetaDataRow(self, lrcType: LrcType, matchedLine: Match[str]) -> None:
-        metaType, metaContent = matchedLine.groups()
-
-        try:
-            metaType = LrcMetaType(metaType)
-        except ValueError as e:
-            raise ValueError(f"未知的元数据类型：{e}")
-
+    def appendMetaData(self, lrcType: LrcType, metaType: LrcMetaType, metaContent: str) -> None:
         if metaType in self.metadata:
             self.metadata[metaType][lrcType] = metaContent
         else:
             self.metadata[metaType] = {lrcType: metaContent}
 
-    def appendMatchedLyricRow(self, lrcType: LrcType, matchedLine: Match[str]) -> None:
-        timeLabels, lyric = matchedLine.groups()
-        timestamps: list[int] = []
-
-        for timeLabel in LRC_RE_LYRIC_TIMELABEL.finditer(timeLabels):
-            timestamps.append(self._timeLabel2Timestamp(timeLabel))
-
+    def appendLyricRow(self, lrcType: LrcType, timestamps: list[int], lyric: str) -> None:
         if CONFIG_LRC_AUTO_MERGE:
             mergedTimestamps: list[int] = []
 
@@ -153,20 +143,134 @@ class Lrc:
             yield f"[{metaType.value}:{content}]"
 
     def generateLyricRows(self) -> Generator[str, None, None]:
-        for timestamp in sorted(self.lyrics):
+        for timestamp in self._timestamps:
             for lrcType in self.lyrics[timestamp]:
                 yield self._timestamp2TimeLabel(timestamp) + self.lyrics[timestamp][lrcType]
 
         for timestamp, content in self.specials.timestamp:
             yield self._timestamp2TimeLabel(timestamp) + content
 
-    async def saveAs(self, path: Path) -> None:
-        async with await anyio.open_file(path, "w+") as fs:
-            await fs.write(self.serializeLyricFile())
+    async def saveAs(self, path: Path, skipIdentical: bool = True) -> bool:
+        """先写入同目录下的临时文件再原子替换目标文件, 返回是否进行了写入
+
+        skipIdentical 为 True 时, 若已存在的文件内容与将写入的内容一致则不进行写入。
+        """
+        return await self.saveContentAs(path, self.serializeLyricFile().encode(), skipIdentical)
+
+    @classmethod
+    async def saveContentAs(cls, path: Path, content: bytes, skipIdentical: bool = True) -> bool:
+        """与 saveAs 相同, 但写入已序列化的内容, 以便同一歌词写入多个路径时只序列化一次"""
+        return await to_thread.run_sync(cls._saveAs, path, content, skipIdentical)
+
+    @staticmethod
+    def _saveAs(path: Path, content: bytes, skipIdentical: bool) -> bool:
+        try:
+            existing = path.stat()
+        except FileNotFoundError:
+            existing = None
+
+        if skipIdentical and existing is not None and existing.st_size == len(content):
+            try:
+                if path.read_bytes() == content:
+                    return False
+            except OSError:
+                pass
+
+        tempPath = path.with_name(f".{path.name}.{token_hex(4)}.tmp")
+        # Created with the default mode rather than the private one of tempfile, umask still applies
+        fd = os.open(tempPath, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            with open(fd, "wb") as fs:
+                fs.write(content)
+            if existing is not None:
+                os.chmod(tempPath, S_IMODE(existing.st_mode))
+            os.replace(tempPath, path)
+        except BaseException:
+            tempPath.unlink(missing_ok=True)
+            raise
+
+        return True
+
+    def _scanMetaDataRow(self, lrcType: LrcType, lrcRow: str, rowStart: int) -> None:
+        # [type:content], lrcRow[rowStart] is "["
+        rowEnd = len(lrcRow.rstrip())
+        if lrcRow[rowEnd - 1] != "]":
+            return
+
+        colon = lrcRow.find(":", rowStart + 1, rowEnd - 1)
+        if colon == -1:
+            return
+
+        metaType = LRC_META_TYPES.get(lrcRow[rowStart + 1 : colon])
+        if metaType is None:
+            return
+
+        metaContent = lrcRow[colon + 1 : rowEnd - 1]
+        if not metaContent:
+            return
+
+        # Keep the last character for whitespace-only content, as the former pattern did
+        self.appendMetaData(lrcType, metaType, metaContent.strip() or metaContent[-1])
+
+    def _scanLyricRow(self, lrcType: LrcType, lrcRow: str, rowStart: int) -> None:
+        # [mm:ss.xxx][mm:ss.xxx]...lyric, lrcRow[rowStart] is "["
+        rowLength = len(lrcRow)
+        timestamps: list[int] = []
+        labelEnds: list[int] = []
+        seek = rowStart
+
+        while True:
+            scanned = self._scanTimeLabel(lrcRow, seek)
+            if scanned is None:
+                break
+
+            timestamp, seek = scanned
+            timestamps.append(timestamp)
+            labelEnds.append(seek)
+
+            if seek < rowLength and lrcRow[seek].isspace():
+                seek = rowLength - len(lrcRow[seek:].lstrip())
+            if not lrcRow.startswith("[", seek):
+                break
+
+        if not timestamps:
+            return
+
+        lyric = lrcRow[labelEnds[-1] :]
+        if not lyric:
+            # The last time label is the lyric itself, as the former pattern did
+            if len(timestamps) == 1:
+                return
+            timestamps.pop()
+            labelEnds.pop()
+            lyric = lrcRow[labelEnds[-1] :]
+
+        self.appendLyricRow(lrcType, timestamps, lyric.strip() or lyric[-1])
+
+    @classmethod
+    def _scanTimeLabel(cls, lrcRow: str, seek: int) -> tuple[int, int] | None:
+        # [mm:ss] or [mm:ss.x] to [mm:ss.xxx], returns timestamp and the index after "]"
+        if not lrcRow.startswith("[", seek):
+            return None
+
+        labelEnd = lrcRow.find("]", seek + 4, seek + 11)
+        if labelEnd == -1:
+            return None
+
+        minutes, colon, seconds = lrcRow[seek + 1 : labelEnd].partition(":")
+        if not colon or not 1 <= len(minutes) <= 2 or not minutes.isdecimal():
+            return None
+
+        integer, dot, fraction = seconds.partition(".")
+        if not 1 <= len(integer) <= 2 or not integer.isdecimal():
+            return None
+        if dot and (not 1 <= len(fraction) <= 3 or not fraction.isdecimal()):
+            return None
+
+        return (cls._timeLabel2Timestamp(minutes, seconds), labelEnd + 1)
 
     @staticmethod
-    def _timeLabel2Timestamp(timeLabel: Match[str]) -> int:
-        minutes, seconds = timeLabel.groups()
+    def _timeLabel2Timestamp(minutes: str, seconds: str) -> int:
         return round((int(minutes) * 60 + float(seconds)) * 1000)
 
     @staticmethod
@@ -175,14 +279,16 @@ class Lrc:
         return f"[{seconds // 60:02.0f}:{seconds % 60:06.3f}]"
 
     def _mergeOffset(self, timestamp: int) -> int:
+        # Nearest existing timestamp within the offset, prefer the earlier one on tie
+        index = bisect_left(self._timestamps, timestamp)
         result = timestamp
+        distance = CONFIG_LRC_AUTO_MERGE_OFFSET + 1
 
-        timestampMin = timestamp - CONFIG_LRC_AUTO_MERGE_OFFSET
-        timestampMax = timestamp + CONFIG_LRC_AUTO_MERGE_OFFSET
+        if index > 0 and timestamp - self._timestamps[index - 1] < distance:
+            result = self._timestamps[index - 1]
+            distance = timestamp - result
 
-        for existLyric in self.lyrics:
-            if timestampMin <= existLyric <= timestampMax:
-                result = existLyric
-                break
+        if index < len(self._timestamps) and self._timestamps[index] - timestamp < distance:
+            result = self._timestamps[index]
 
         return result
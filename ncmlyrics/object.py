@@ -1,11 +1,13 @@
 from dataclasses import dataclass
 from json import JSONDecodeError
+from sys import intern
 from typing import TYPE_CHECKING, Any, Self
 
 from httpx2 import Response
 
 from .error import ObjectParseError
 from .type import LrcType
+from .util import loadJson
 
 if TYPE_CHECKING:
     from .api import NCMApi
@@ -13,16 +15,17 @@ if TYPE_CHECKING:
 __all__ = ["NCMAlbum", "NCMLyrics", "NCMPlaylist", "NCMTrack"]
 
 
-@dataclass
+@dataclass(slots=True)
 class NCMTrack:
     id: int
     name: str
-    artists: list[str]
+    # Interned, the same artist shares one string across tracks
+    artists: tuple[str, ...]
 
     @classmethod
     def fromApi(cls, response: Response) -> list[Self]:
         try:
-            data: dict[str, Any] = response.json()
+            data: dict[str, Any] = loadJson(response.content)
         except JSONDecodeError:
             raise ObjectParseError("无法以预期的 Json 格式解析响应")
 
@@ -46,11 +49,14 @@ class NCMTrack:
             return cls(
                 id=data["id"],
                 name=data["name"],
-                artists=[artist["name"] for artist in data["ar"]],
+                artists=tuple(intern(artist["name"]) for artist in data["ar"]),
             )
         except KeyError as e:
             raise ObjectParseError(f"需要的键不存在: {e}")
 
+    def toData(self) -> dict:
+        return {"id": self.id, "name": self.name, "ar": [{"name": artist} for artist in self.artists]}
+
     @property
     def tracks(self) -> list[Self]:
         return [self]
@@ -62,7 +68,7 @@ class NCMTrack:
         return f"{'/'.join(self.artists)} - {self.name}"
 
 
-@dataclass
+@dataclass(slots=True)
 class NCMAlbum:
     id: int
     name: str
@@ -71,13 +77,17 @@ class NCMAlbum:
     @classmethod
     def fromApi(cls, response: Response) -> Self:
         try:
-            data: dict = response.json()
+            data: dict = loadJson(response.content)
         except JSONDecodeError:
             raise ObjectParseError("无法以预期的 Json 格式解析响应")
 
         if data.get("code") != 200:
             raise ObjectParseError(f"响应码不为 200: {data['code']}")
 
+        return cls.fromData(data)
+
+    @classmethod
+    def fromData(cls, data: dict) -> Self:
         album = data.get("album")
         if album is None:
             raise ObjectParseError("不存在专辑对应的结构")
@@ -91,11 +101,14 @@ class NCMAlbum:
         except KeyError as e:
             raise ObjectParseError(f"需要的键不存在: {e}")
 
+    def toData(self) -> dict:
+        return {"album": {"id": self.id, "name": self.name}, "songs": [track.toData() for track in self.tracks]}
+
     def link(self) -> str:
         return f"https://music.163.com/album?id={self.id}"
 
 
-@dataclass
+@dataclass(slots=True)
 class NCMPlaylist:
     id: int
     name: str
@@ -105,25 +118,27 @@ class NCMPlaylist:
     @classmethod
     def fromApi(cls, response: Response) -> Self:
         try:
-            data: dict = response.json()
+            data: dict = loadJson(response.content)
         except JSONDecodeError:
             raise ObjectParseError("无法以预期的 Json 格式解析响应")
 
         if data.get("code") != 200:
             raise ObjectParseError(f"响应码不为 200: {data['code']}")
 
+        return cls.fromData(data)
+
+    @classmethod
+    def fromData(cls, data: dict) -> Self:
         playlist = data.get("playlist")
         if playlist is None:
             raise ObjectParseError("不存在歌单对应的结构")
 
         try:
-            tracks: list[NCMTrack] = []
-            trackIds: list[int] = [track["id"] for track in playlist["trackIds"]]
+            tracks: list[NCMTrack] = [NCMTrack.fromData(track) for track in playlist["tracks"]]
 
-            for track in playlist["tracks"]:
-                parsedTrack = NCMTrack.fromData(track)
-                trackIds.remove(parsedTrack.id)
-                tracks.append(parsedTrack)
+            # Ids of tracks without details, in playlist order
+            embeddedIds = {track.id for track in tracks}
+            trackIds: list[int] = [track["id"] for track in playlist["trackIds"] if track["id"] not in embeddedIds]
 
             return cls(
                 id=playlist["id"],
@@ -134,6 +149,20 @@ class NCMPlaylist:
         except KeyError as e:
             raise ObjectParseError(f"需要的键不存在: {e}")
 
+    def toData(self) -> dict:
+        return {
+            "playlist": {
+                "id": self.id,
+                "name": self.name,
+                "tracks": [track.toData() for track in self.tracks],
+                "trackIds": [{"id": trackId} for trackId in self.allTrackIds],
+            },
+        }
+
+    @property
+    def allTrackIds(self) -> list[int]:
+        return [track.id for track in self.tracks] + self.trackIds
+
     def link(self) -> str:
         return f"https://music.163.com/playlist?id={self.id}"
 
@@ -142,7 +171,7 @@ class NCMPlaylist:
         self.trackIds.clear()
 
 
-@dataclass
+@dataclass(slots=True)
 class NCMLyrics:
     id: int | None
     isPureMusic: bool
@@ -151,13 +180,17 @@ class NCMLyrics:
     @classmethod
     def fromApi(cls, response: Response) -> Self:
         try:
-            data: dict = response.json()
+            data: dict = loadJson(response.content)
         except JSONDecodeError:
             raise ObjectParseError("无法以预期的 Json 格式解析响应")
 
         if data.get("code") != 200:
             raise ObjectParseError(f"响应码不为 200: {data['code']}")
 
+        return cls.fromData(data)
+
+    @classmethod
+    def fromData(cls, data: dict) -> Self:
         lyrics: dict[LrcType, str] = {}
 
         for lrctype in LrcType:
@@ -172,6 +205,11 @@ class NCMLyrics:
             lyrics=lyrics,
         )
 
+    def toData(self) -> dict:
+        data: dict[str, Any] = {lrctype.ncmAPIString(): {"lyric": lyric} for lrctype, lyric in self.lyrics.items()}
+        data["pureMusic"] = self.isPureMusic
+        return data
+
     def withId(self, id: int) -> Self:
         self.id = id
         return self
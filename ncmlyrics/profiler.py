@@ -0,0 +1,149 @@
+from asyncio import AbstractEventLoop, Task, get_running_loop
+from collections.abc import Coroutine, Generator
+from cProfile import Profile
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter
+from typing import Any, TypeVar
+
+from .util import dumpJson
+
+__all__ = ["NCMProfiler"]
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class NCMProfilerTaskStats:
+    """同一协程函数创建的所有任务的耗时汇总, 单位为秒"""
+
+    count: int = 0
+    running: int = 0
+    # From creation to done
+    wall: float = 0.0
+    wallMax: float = 0.0
+    # From creation to the first step
+    delay: float = 0.0
+    delayMax: float = 0.0
+    # Time spent inside the task itself, a long step blocks the event loop
+    busy: float = 0.0
+    stepMax: float = 0.0
+    steps: int = 0
+
+    def toData(self) -> dict[str, Any]:
+        done = self.count - self.running
+        return {
+            "count": self.count,
+            "running": self.running,
+            "wall": self.wall,
+            "wallMean": self.wall / done if done else None,
+            "wallMax": self.wallMax,
+            "delayMean": self.delay / self.count if self.count else None,
+            "delayMax": self.delayMax,
+            "busy": self.busy,
+            "stepMax": self.stepMax,
+            "steps": self.steps,
+        }
+
+
+class NCMProfilerCoroutine(Coroutine):
+    """包装任务的协程, 统计其每一步的执行耗时"""
+
+    __slots__ = ("_coro", "_created", "_started", "_stats")
+
+    def __init__(self, coro: Coroutine, stats: NCMProfilerTaskStats) -> None:
+        self._coro = coro
+        self._stats = stats
+        self._created = perf_counter()
+        self._started = False
+
+    def send(self, value: Any) -> Any:
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args: Any) -> Any:
+        return self._step(self._coro.throw, *args)
+
+    def close(self) -> None:
+        self._coro.close()
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        return self._coro.__await__()
+
+    def _step(self, method: Any, *args: Any) -> Any:
+        stats = self._stats
+        start = perf_counter()
+        if not self._started:
+            self._started = True
+            stats.delay += start - self._created
+            stats.delayMax = max(stats.delayMax, start - self._created)
+
+        try:
+            return method(*args)
+        finally:
+            step = perf_counter() - start
+            stats.busy += step
+            stats.stepMax = max(stats.stepMax, step)
+            stats.steps += 1
+
+    def done(self, _: Task) -> None:
+        stats = self._stats
+        wall = perf_counter() - self._created
+        stats.running -= 1
+        stats.wall += wall
+        stats.wallMax = max(stats.wallMax, wall)
+
+
+class NCMProfiler:
+    """记录一次运行的 CPU 性能剖析与 asyncio 任务耗时
+
+    CPU 剖析使用 cProfile, 仅覆盖事件循环所在线程, 文件读写线程中的耗时计入等待它们的任务。
+    任务耗时通过事件循环的任务工厂按协程函数汇总, 仅在剖析期间生效, 未启用时没有任何开销。
+    """
+
+    def __init__(self) -> None:
+        self.profile = Profile()
+        # Coroutine qualified name: stats
+        self.tasks: dict[str, NCMProfilerTaskStats] = {}
+        self.duration = 0.0
+
+    async def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        loop = get_running_loop()
+        previousFactory = loop.get_task_factory()
+        loop.set_task_factory(self._taskFactory)
+
+        start = perf_counter()
+        self.profile.enable()
+        try:
+            # Run as a task so the root coroutine is timed as well
+            return await loop.create_task(coro)
+        finally:
+            self.profile.disable()
+            self.duration = perf_counter() - start
+            loop.set_task_factory(previousFactory)
+
+    def save(self, path: Path) -> None:
+        """将 CPU 剖析以 pstats 格式写入 path, 任务耗时以 Json 格式写入同目录下的 <path>.tasks.json"""
+        self.profile.dump_stats(path)
+
+        tasks = sorted(self.tasks.items(), key=lambda item: item[1].busy, reverse=True)
+        path.with_name(f"{path.name}.tasks.json").write_bytes(
+            dumpJson(
+                {
+                    "duration": self.duration,
+                    "tasks": {name: stats.toData() for name, stats in tasks},
+                }
+            )
+        )
+
+    def _taskFactory(self, loop: AbstractEventLoop, coro: Coroutine, **kwargs: Any) -> Task:
+        name = getattr(coro, "__qualname__", type(coro).__qualname__)
+        stats = self.tasks.get(name)
+        if stats is None:
+            stats = self.tasks[name] = NCMProfilerTaskStats()
+        stats.count += 1
+        stats.running += 1
+
+        wrapped = NCMProfilerCoroutine(coro, stats)
+        task = Task(wrapped, loop=loop, **kwargs)
+        task.add_done_callback(wrapped.done)
+        return task
@@ -0,0 +1,118 @@
+from asyncio import sleep
+from collections import deque
+from dataclasses import dataclass
+from datetime import UTC
+from email.utils import parsedate_to_datetime
+from random import uniform
+from time import monotonic, time
+
+from httpx2 import LocalProtocolError, NetworkError, RemoteProtocolError, TimeoutException
+
+from .constant import (
+    CONFIG_API_BREAKER_COOLDOWN,
+    CONFIG_API_BREAKER_COOLDOWN_MAX,
+    CONFIG_API_BREAKER_FAILURE_RATE,
+    CONFIG_API_BREAKER_WINDOW,
+    CONFIG_API_RETRY,
+    CONFIG_API_RETRY_BACKOFF_BASE,
+    CONFIG_API_RETRY_BACKOFF_MAX,
+    CONFIG_API_RETRY_STATUS,
+)
+
+__all__ = ["CircuitBreaker", "RetryPolicy", "parseRetryAfter"]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    retries: int = CONFIG_API_RETRY
+    backoffBase: float = CONFIG_API_RETRY_BACKOFF_BASE
+    backoffMax: float = CONFIG_API_RETRY_BACKOFF_MAX
+    jitter: bool = True
+    retryStatus: frozenset[int] = CONFIG_API_RETRY_STATUS
+
+    def delay(self, attempt: int, retryAfter: float | None = None) -> float:
+        """第 attempt 次 (从 0 开始) 失败后需要等待的秒数, 服务器给出 Retry-After 时以其为准"""
+
+        if retryAfter is not None:
+            return min(max(retryAfter, 0.0), self.backoffMax)
+
+        backoff = min(self.backoffBase * 2**attempt, self.backoffMax)
+        if self.jitter:
+            return uniform(0.0, backoff)
+        return backoff
+
+    def isRetryableError(self, error: Exception) -> bool:
+        if isinstance(error, LocalProtocolError):
+            return False
+        return isinstance(error, (TimeoutException, NetworkError, RemoteProtocolError))
+
+    def isRetryableStatus(self, status: int) -> bool:
+        return status in self.retryStatus
+
+
+def parseRetryAfter(value: str | None) -> float | None:
+    """解析 Retry-After 头, 支持秒数与 HTTP 日期两种格式"""
+
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdecimal():
+        return float(value)
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    # HTTP dates are always in UTC, a date without a zone must not be read as local time
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=UTC)
+    return date.timestamp() - time()
+
+
+class CircuitBreaker:
+    """在最近一段请求的失败率过高时暂停对同一主机的所有请求
+
+    暂停时长从 CONFIG_API_BREAKER_COOLDOWN 开始, 连续触发时翻倍, 直至 CONFIG_API_BREAKER_COOLDOWN_MAX。
+    """
+
+    def __init__(
+        self,
+        window: int = CONFIG_API_BREAKER_WINDOW,
+        failureRate: float = CONFIG_API_BREAKER_FAILURE_RATE,
+        cooldown: float = CONFIG_API_BREAKER_COOLDOWN,
+        cooldownMax: float = CONFIG_API_BREAKER_COOLDOWN_MAX,
+    ) -> None:
+        self.failureRate = failureRate
+        self.cooldownBase = cooldown
+        self.cooldownMax = cooldownMax
+
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._cooldown = cooldown
+        self._openUntil = 0.0
+
+    @property
+    def isOpen(self) -> bool:
+        return self._openUntil > monotonic()
+
+    async def wait(self) -> None:
+        while (remaining := self._openUntil - monotonic()) > 0:
+            await sleep(remaining)
+
+    def pause(self, seconds: float) -> None:
+        self._openUntil = max(self._openUntil, monotonic() + seconds)
+
+    def record(self, success: bool) -> None:
+        self._outcomes.append(success)
+
+        if len(self._outcomes) < (self._outcomes.maxlen or 0):
+            return
+
+        failures = self._outcomes.count(False)
+        if failures / len(self._outcomes) >= self.failureRate:
+            self.pause(self._cooldown)
+            self._cooldown = min(self._cooldown * 2, self.cooldownMax)
+            self._outcomes.clear()
+        elif failures == 0:
+            self._cooldown = self.cooldownBase
@@ -0,0 +1,320 @@
+from asyncio import (
+    Event,
+    IncompleteReadError,
+    LimitOverrunError,
+    Server,
+    StreamReader,
+    StreamWriter,
+    Task,
+    create_task,
+    get_running_loop,
+    shield,
+    start_server,
+    start_unix_server,
+)
+from collections import OrderedDict
+from contextlib import suppress
+from http import HTTPStatus
+from pathlib import Path
+from signal import SIGTERM
+from urllib.parse import parse_qs as parseQuery
+from urllib.parse import urlsplit
+
+from click import echo
+from httpx2 import AsyncBaseTransport
+
+from .api import NCMApi
+from .cache import NCMCache
+from .connection import ConnectionPolicy
+from .constant import CONFIG_CONCURRENCY, CONFIG_SERVE_CACHE_SIZE, CONFIG_SERVE_HOST, CONFIG_SERVE_PORT
+from .error import NCMLyricsAppError, NCMLyricsServeError, ParseLinkError, UnsupportedLinkError
+from .lrc import Lrc
+from .stats import NCMStats
+from .type import CacheMode, LinkType, LrcType
+from .util import parseLinkAsync
+
+__all__ = ["NCMLyricsServer", "NCMLyricsServerError"]
+
+# Request line and headers together
+SERVE_MAX_HEADER_SIZE = 16 * 1024
+
+
+class NCMLyricsServerError(Exception):
+    """以 status 响应当前请求"""
+
+    def __init__(self, status: HTTPStatus, message: str | None = None) -> None:
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class NCMLyricsServer:
+    """常驻运行的本地 HTTP 歌词服务, 所有请求共用同一个 API 客户端及其连接池与缓存
+
+    GET /lyrics?id=<曲目 ID> 或 GET /lyrics?link=<单曲链接> 以 LRC 格式返回歌词, 可以 types=origin,translation 指定歌词类型。
+    GET /health 用于检查服务是否可用。给出 socketPath 时监听 Unix 套接字, 否则监听 host:port。
+    """
+
+    def __init__(
+        self,
+        types: tuple[LrcType, ...] = tuple(LrcType),
+        host: str = CONFIG_SERVE_HOST,
+        port: int = CONFIG_SERVE_PORT,
+        socketPath: Path | None = None,
+        jobs: int = CONFIG_CONCURRENCY,
+        cacheMode: CacheMode = CacheMode.Normal,
+        cacheSize: int = CONFIG_SERVE_CACHE_SIZE,
+        statsPath: Path | None = None,
+        transport: AsyncBaseTransport | None = None,
+        connectionPolicy: ConnectionPolicy | None = None,
+        cookiePath: Path | None = None,
+        quiet: bool = False,
+    ) -> None:
+        self.stats = NCMStats()
+        self.statsPath = statsPath
+
+        self.cache = NCMCache(cacheMode)
+        self.api = NCMApi(
+            concurrency=jobs,
+            cache=self.cache,
+            stats=self.stats,
+            transport=transport,
+            connectionPolicy=connectionPolicy,
+            cookiePath=cookiePath,
+        )
+
+        self.types = types
+        self.host = host
+        self.port = port
+        self.socketPath = socketPath
+        self.cacheSize = cacheSize
+        self.quiet = quiet
+
+        self.server: Server | None = None
+        self.writers: set[StreamWriter] = set()
+
+        # (trackId, types): serialized lyric file or None for tracks without lyrics, in least recently used order
+        self.lyricsCache: OrderedDict[tuple[int, tuple[LrcType, ...]], Task[bytes | None]] = OrderedDict()
+
+    @property
+    def address(self) -> str:
+        if self.socketPath is not None:
+            return str(self.socketPath)
+        if self.server is not None and self.server.sockets:
+            host, port = self.server.sockets[0].getsockname()[:2]
+            return f"http://{host}:{port}"
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        if self.socketPath is not None:
+            self.server = await start_unix_server(self.handleConnection, self.socketPath, limit=SERVE_MAX_HEADER_SIZE)
+        else:
+            self.server = await start_server(self.handleConnection, self.host, self.port, limit=SERVE_MAX_HEADER_SIZE)
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            # Idle keep-alive connections would hold up wait_closed
+            for writer in self.writers:
+                writer.close()
+            await self.server.wait_closed()
+            self.server = None
+
+        for task in self.lyricsCache.values():
+            task.cancel()
+        self.lyricsCache.clear()
+
+    async def run(self) -> None:
+        """启动服务并持续运行, 直到被取消或收到 SIGTERM, 结束时关闭 API 客户端与缓存
+
+        收到 SIGTERM 时正常返回, 以便守护进程以退出码 0 结束。
+        """
+        stop = Event()
+
+        loop = get_running_loop()
+        with suppress(NotImplementedError):
+            # Not available on Windows
+            loop.add_signal_handler(SIGTERM, stop.set)
+
+        warmUp: Task[None] | None = None
+        try:
+            try:
+                await self.start()
+            except OSError as e:
+                raise NCMLyricsServeError(f"无法启动歌词服务：{self.address} ({e})") from e
+            assert self.server is not None
+
+            warmUp = create_task(self.api.warmUp())
+            if not self.quiet:
+                echo(f"歌词服务正在监听：{self.address}")
+
+            # The server accepts connections from start() on
+            await stop.wait()
+        finally:
+            if warmUp is not None:
+                warmUp.cancel()
+            with suppress(NotImplementedError):
+                loop.remove_signal_handler(SIGTERM)
+            await self.close()
+            self.api.saveCookies()
+            await self.api.close()
+            self.cache.close()
+            if self.statsPath is not None:
+                self.stats.save(self.statsPath)
+
+    async def getLyrics(self, trackId: int, types: tuple[LrcType, ...]) -> bytes | None:
+        """获取序列化后的歌词文件, 曲目没有歌词时返回 None, 同一曲目的并发请求共用一次获取"""
+        key = (trackId, types)
+
+        task = self.lyricsCache.get(key)
+        if task is None:
+            self.stats.count("serve.cache.misses")
+            task = self.lyricsCache[key] = create_task(self._getLyrics(trackId, types))
+            task.add_done_callback(lambda done: self._getLyricsDone(key, done))
+            while len(self.lyricsCache) > self.cacheSize:
+                self.lyricsCache.popitem(last=False)
+        else:
+            self.stats.count("serve.cache.hits")
+            self.lyricsCache.move_to_end(key)
+
+        return await shield(task)
+
+    async def _getLyrics(self, trackId: int, types: tuple[LrcType, ...]) -> bytes | None:
+        with self.stats.measure("app.lyrics"):
+            lyrics = await self.api.getLyricsByTrack(trackId)
+
+        if not lyrics.lyrics:
+            return None
+
+        with self.stats.measure("lrc.parse"):
+            lrc = Lrc.fromNCMLyrics(lyrics, types)
+        with self.stats.measure("lrc.serialize"):
+            return lrc.serializeLyricFile().encode()
+
+    def _getLyricsDone(self, key: tuple[int, tuple[LrcType, ...]], task: Task[bytes | None]) -> None:
+        # Failures are not cached, the next request tries again
+        failed = task.cancelled() or task.exception() is not None
+        if failed and self.lyricsCache.get(key) is task:
+            del self.lyricsCache[key]
+
+    async def resolveTrackId(self, query: dict[str, list[str]]) -> int:
+        if "id" in query:
+            try:
+                return int(query["id"][0])
+            except ValueError:
+                raise NCMLyricsServerError(HTTPStatus.BAD_REQUEST, f"无效的曲目 ID: {query['id'][0]}")
+
+        if "link" in query:
+            link = query["link"][0]
+            try:
+                parsed = await parseLinkAsync(link, self.api)
+            except (ParseLinkError, UnsupportedLinkError):
+                raise NCMLyricsServerError(HTTPStatus.BAD_REQUEST, f"不支持的链接: {link}")
+            except NCMLyricsAppError as e:
+                # Short links are resolved through the API
+                raise NCMLyricsServerError(HTTPStatus.BAD_GATEWAY, f"解析链接时出现错误: {e}")
+            if parsed.type is not LinkType.Track:
+                raise NCMLyricsServerError(HTTPStatus.BAD_REQUEST, f"仅支持单曲链接: {link}")
+            return parsed.id
+
+        raise NCMLyricsServerError(HTTPStatus.BAD_REQUEST, "请给出 id 或 link 参数")
+
+    def resolveTypes(self, query: dict[str, list[str]]) -> tuple[LrcType, ...]:
+        if "types" not in query:
+            return self.types
+        try:
+            return tuple(LrcType(type) for type in query["types"][0].split(","))
+        except ValueError:
+            raise NCMLyricsServerError(HTTPStatus.BAD_REQUEST, f"无效的歌词类型: {query['types'][0]}")
+
+    async def handle(self, method: str, target: str) -> bytes:
+        if method not in ("GET", "HEAD"):
+            raise NCMLyricsServerError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+        url = urlsplit(target)
+        query = parseQuery(url.query)
+
+        match url.path:
+            case "/health":
+                return b"ok\n"
+            case "/lyrics":
+                trackId = await self.resolveTrackId(query)
+                types = self.resolveTypes(query)
+                try:
+                    lyricFile = await self.getLyrics(trackId, types)
+                except NCMLyricsAppError as e:
+                    raise NCMLyricsServerError(HTTPStatus.BAD_GATEWAY, f"获取歌词时出现错误: {e}")
+                if lyricFile is None:
+                    raise NCMLyricsServerError(HTTPStatus.NOT_FOUND, "此曲目没有歌词")
+                return lyricFile
+            case _:
+                raise NCMLyricsServerError(HTTPStatus.NOT_FOUND)
+
+    async def handleConnection(self, reader: StreamReader, writer: StreamWriter) -> None:
+        self.writers.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (IncompleteReadError, LimitOverrunError, ConnectionError):
+                    return
+
+                try:
+                    requestLine, *headerLines = head.decode("latin-1").split("\r\n")
+                    method, target, version = requestLine.split(" ")
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, b"", keepAlive=False)
+                    return
+
+                headers: dict[str, str] = {}
+                for line in headerLines:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+
+                # Request bodies are not used, but are read to keep the connection in sync
+                try:
+                    length = int(headers.get("content-length", 0))
+                    if length > 0:
+                        await reader.readexactly(length)
+                except (ValueError, IncompleteReadError):
+                    return
+
+                connection = headers.get("connection", "").lower()
+                keepAlive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                with self.stats.measure("serve.request"):
+                    try:
+                        status, body = HTTPStatus.OK, await self.handle(method, target)
+                    except NCMLyricsServerError as e:
+                        status, body = e.status, f"{e}\n".encode()
+                    except Exception as e:  # noqa: BLE001
+                        # Every request gets an answer, even on bugs
+                        status, body = HTTPStatus.INTERNAL_SERVER_ERROR, f"服务内部错误: {e!r}\n".encode()
+
+                self.stats.count(f"serve.status.{status.value}")
+                await self.respond(writer, status, b"" if method == "HEAD" else body, keepAlive, len(body))
+
+                if not keepAlive:
+                    return
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def respond(
+        writer: StreamWriter, status: HTTPStatus, body: bytes, keepAlive: bool, length: int | None = None
+    ) -> None:
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: text/plain; charset=utf-8\r\n"
+                f"Content-Length: {len(body) if length is None else length}\r\n"
+                f"Connection: {'keep-alive' if keepAlive else 'close'}\r\n"
+                "\r\n"
+            ).encode("latin-1")
+            + body
+        )
+        with suppress(ConnectionError):
+            await writer.drain()
@@ -0,0 +1,213 @@
+import os
+from asyncio import TaskGroup
+from collections.abc import Iterable
+from json import dump as dumpJson
+from json import loads as loadJson
+from pathlib import Path
+from re import compile as compileRegex
+from re import escape as escapeRegex
+
+from anyio import to_thread
+
+from .constant import CONFIG_SOURCE_EXTENSIONS, PLATFORM
+from .object import NCMTrack
+from .type import CacheMode
+
+__all__ = ["SourceFileIndex", "SourceScanner"]
+
+SNAPSHOT_VERSION = 1
+
+
+class SourceFileIndex:
+    """已存在的音频源文件索引
+
+    源文件名格式为 "<歌手> - <标题>.<扩展名>", 歌手之间以逗号或空格分隔, 标题末尾的点会被忽略。
+    索引以标题为键, 由于歌手与标题中都可能含有 " - ", 每个可能的分割位置都会被加入索引。
+    """
+
+    def __init__(self, extensions: Iterable[str] = CONFIG_SOURCE_EXTENSIONS) -> None:
+        self.extensions = frozenset(extensions)
+
+        # title: [(artists, path)]
+        self._index: dict[str, list[tuple[str, Path]]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, path: Path) -> None:
+        suffix = path.suffix
+        if suffix not in self.extensions:
+            return
+
+        base = path.name[: -len(suffix)].rstrip(".")
+        seek = base.find(" - ")
+        if seek == -1:
+            return
+
+        while seek != -1:
+            self._index.setdefault(base[seek + 3 :], []).append((base[:seek], path))
+            seek = base.find(" - ", seek + 1)
+
+        self._count += 1
+
+    def find(self, track: NCMTrack) -> Path | None:
+        candidates = self._index.get(track.name.rstrip("."))
+        if not candidates:
+            return None
+
+        escapedArtists = "(,| )".join(escapeRegex(artist) for artist in track.artists[:3])
+        if len(track.artists) > 3:
+            escapedArtists += rf"((,| ){')?((,| )'.join(escapeRegex(artist) for artist in track.artists[3:])})?"
+        regex = compileRegex(escapedArtists)
+
+        for artists, path in candidates:
+            if regex.fullmatch(artists) is not None:
+                return path
+
+        return None
+
+
+class SourceScanner:
+    """在工作线程中扫描输出目录并构建 SourceFileIndex
+
+    递归扫描时每个目录的文件列表按其 mtime 保存在快照中, 目录 mtime 未变化时直接复用快照, 不再重新列出目录内容。
+    仅扫描输出目录本身时每个输出目录只需列出一次, 读写快照的开销高于直接列出, 因此不使用快照。
+    """
+
+    def __init__(
+        self,
+        extensions: Iterable[str] = CONFIG_SOURCE_EXTENSIONS,
+        recursive: bool = False,
+        cacheMode: CacheMode = CacheMode.Normal,
+        snapshotPath: Path | None = None,
+    ) -> None:
+        self.extensions = tuple(extensions)
+        self.recursive = recursive
+        self.cacheMode = cacheMode
+        self.snapshotPath = snapshotPath or PLATFORM.user_cache_path / "sources.json"
+
+        # directory: {"mtime": int, "files": [str], "dirs": [str]}
+        self._previous: dict[str, dict] = {}
+        self._current: dict[str, dict] = {}
+
+    @property
+    def useSnapshot(self) -> bool:
+        return self.recursive and self.cacheMode is not CacheMode.Bypass
+
+    async def scan(self, outputs: Iterable[Path]) -> SourceFileIndex:
+        if self.useSnapshot and self.cacheMode is CacheMode.Normal:
+            self._previous = await to_thread.run_sync(self._loadSnapshot)
+        self._current = {}
+
+        roots: list[str] = []
+        for output in outputs:
+            root = str(output.absolute())
+            if root not in roots:
+                roots.append(root)
+
+        async with TaskGroup() as tg:
+            for root in roots:
+                tg.create_task(self._scanTree(root))
+
+        index = SourceFileIndex(self.extensions)
+        for root in roots:
+            self._fillIndex(index, root)
+
+        if self.useSnapshot:
+            await to_thread.run_sync(self._saveSnapshot, roots)
+
+        return index
+
+    async def _scanTree(self, directory: str) -> None:
+        content = await to_thread.run_sync(self._scanDirectory, directory)
+        if content is None:
+            return
+
+        self._current[directory] = content
+
+        if self.recursive and content["dirs"]:
+            async with TaskGroup() as tg:
+                for name in content["dirs"]:
+                    tg.create_task(self._scanTree(os.path.join(directory, name)))
+
+    def _scanDirectory(self, directory: str) -> dict | None:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self._previous.get(directory)
+        if cached is not None and cached.get("mtime") == mtime:
+            return cached
+
+        files: list[str] = []
+        dirs: list[str] = []
+
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            files.append(entry.name)
+                        elif entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+
+        return {"mtime": mtime, "files": files, "dirs": dirs}
+
+    def _fillIndex(self, index: SourceFileIndex, root: str) -> None:
+        stack = [root]
+
+        while stack:
+            directory = stack.pop()
+            content = self._current.get(directory)
+            if content is None:
+                continue
+
+            for name in content["files"]:
+                index.add(Path(directory, name))
+
+            if self.recursive:
+                stack.extend(os.path.join(directory, name) for name in reversed(content["dirs"]))
+
+    def _loadSnapshot(self) -> dict[str, dict]:
+        try:
+            with self.snapshotPath.open("rb") as fs:
+                snapshot = loadJson(fs.read())
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            return {}
+        return snapshot.get("directories", {})
+
+    def _saveSnapshot(self, roots: list[str]) -> None:
+        # Keep directories of other libraries, drop the ones under the roots scanned this time that are gone
+        prefixes = tuple(os.path.join(root, "") for root in roots)
+        directories = {
+            directory: content
+            for directory, content in self._previous.items()
+            if directory not in roots and not directory.startswith(prefixes)
+        }
+        directories.update(self._current)
+
+        # Nothing was listed again and nothing is gone
+        if directories == self._previous:
+            return
+
+        temporaryPath = self.snapshotPath.with_name(f"{self.snapshotPath.name}.{os.getpid()}.tmp")
+        try:
+            with temporaryPath.open("w", encoding="utf-8") as fs:
+                dumpJson(
+                    {"version": SNAPSHOT_VERSION, "directories": directories},
+                    fs,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            os.replace(temporaryPath, self.snapshotPath)
+        except OSError:
+            temporaryPath.unlink(missing_ok=True)
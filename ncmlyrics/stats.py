@@ -0,0 +1,129 @@
+from bisect import bisect_left
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+from re import compile as compileRegex
+from time import perf_counter, time
+from typing import Any
+
+from .__version__ import __version__
+from .util import dumpJson
+
+__all__ = ["NCMStats", "NCMStatsHistogram"]
+
+STATS_REPORT_VERSION = 1
+
+# Upper bounds in seconds, the last bucket is unbounded
+STATS_HISTOGRAM_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+RE_PATH_ID = compileRegex(r"/\d+(?=/|$)")
+
+
+class NCMStatsHistogram:
+    """固定分桶的耗时直方图, 单位为秒"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+        self.buckets = [0] * (len(STATS_HISTOGRAM_BOUNDS) + 1)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(STATS_HISTOGRAM_BOUNDS, seconds)] += 1
+
+    def quantile(self, q: float) -> float | None:
+        """以所在分桶的上界估计分位数"""
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count > 0:
+                return STATS_HISTOGRAM_BOUNDS[index] if index < len(STATS_HISTOGRAM_BOUNDS) else self.max
+        return self.max
+
+    def toData(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                f"le{bound:g}" if index < len(STATS_HISTOGRAM_BOUNDS) else "inf": count
+                for index, (bound, count) in enumerate(zip((*STATS_HISTOGRAM_BOUNDS, None), self.buckets))
+                if count > 0
+            },
+        }
+
+
+class NCMStats:
+    """一次运行中的计数器, 耗时直方图与阶段耗时, 可输出为 Json 报告
+
+    阶段耗时为处于该阶段内的累计墙钟时间, 流水线模式下各阶段相互重叠。
+    """
+
+    def __init__(self) -> None:
+        self.startedAt = time()
+        self._start = perf_counter()
+
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, NCMStatsHistogram] = {}
+        self.phases: dict[str, float] = {}
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = NCMStatsHistogram()
+        histogram.record(seconds)
+
+    @contextmanager
+    def measure(self, name: str) -> Generator[None, None, None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start)
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - start
+
+    @staticmethod
+    def endpoint(path: str) -> str:
+        """将请求路径中的 ID 替换为占位符, 如 /api/v1/album/123 -> /api/v1/album/{id}"""
+        return RE_PATH_ID.sub("/{id}", path)
+
+    def toData(self, **extra: Any) -> dict[str, Any]:
+        return {
+            "version": STATS_REPORT_VERSION,
+            "ncmlyrics": __version__,
+            "startedAt": self.startedAt,
+            "duration": perf_counter() - self._start,
+            "phases": self.phases,
+            "counters": dict(sorted(self.counters.items())),
+            "histograms": {name: self.histograms[name].toData() for name in sorted(self.histograms)},
+            **extra,
+        }
+
+    def save(self, path: Path, **extra: Any) -> None:
+        path.write_bytes(dumpJson(self.toData(**extra)))
@@ -0,0 +1,73 @@
+import os
+from collections.abc import Iterable
+from hashlib import sha256
+from pathlib import Path
+
+from .constant import PLATFORM
+from .type import LrcType
+from .util import dumpJson, loadJson
+
+__all__ = ["NCMSyncState"]
+
+SYNC_STATE_VERSION = 1
+
+
+class NCMSyncState:
+    """保存在 PLATFORM.user_state_path 下的歌单同步状态, 记录每个歌单上次同步时的曲目与导出的歌词文件
+
+    同一歌单输出到不同的输出目录或歌词类型时分别记录。状态文件不可用时视为从未同步。
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or PLATFORM.user_state_path / "sync.json"
+
+        # key: {"trackIds": [trackId], "paths": {trackId: path}}
+        self.playlists: dict[str, dict] = self._load()
+
+    @staticmethod
+    def syncKey(playlistId: int, outputs: Iterable[Path], types: Iterable[LrcType]) -> str:
+        job = {
+            "outputs": [str(output.absolute()) for output in outputs],
+            "types": [lrcType.value for lrcType in types],
+        }
+        return f"{playlistId}:{sha256(dumpJson(job)).hexdigest()[:16]}"
+
+    def getTrackIds(self, key: str) -> list[int] | None:
+        """上次同步时歌单中的曲目, 从未同步时为 None"""
+        entry = self.playlists.get(key)
+        return None if entry is None else entry["trackIds"]
+
+    def getPaths(self, key: str) -> dict[int, Path]:
+        entry = self.playlists.get(key)
+        if entry is None:
+            return {}
+        return {int(trackId): Path(path) for trackId, path in entry["paths"].items()}
+
+    def referencedPaths(self) -> set[Path]:
+        """所有歌单当前记录的歌词文件"""
+        return {Path(path) for entry in self.playlists.values() for path in entry["paths"].values()}
+
+    def update(self, key: str, trackIds: list[int], paths: dict[int, Path]) -> None:
+        self.playlists[key] = {
+            "trackIds": trackIds,
+            "paths": {str(trackId): str(path) for trackId, path in paths.items()},
+        }
+
+    def save(self) -> None:
+        temporaryPath = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporaryPath.write_bytes(dumpJson({"version": SYNC_STATE_VERSION, "playlists": self.playlists}))
+            os.replace(temporaryPath, self.path)
+        except OSError:
+            temporaryPath.unlink(missing_ok=True)
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            state = loadJson(self.path.read_bytes())
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(state, dict) or state.get("version") != SYNC_STATE_VERSION:
+            return {}
+        return state.get("playlists", {})
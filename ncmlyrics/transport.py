@@ -0,0 +1,126 @@
+from asyncio import sleep
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import deque
+from gzip import GzipFile
+from gzip import open as openGzip
+from pathlib import Path
+from time import perf_counter
+
+from httpx2 import AsyncBaseTransport, Request, Response
+
+from .error import NCMApiRequestError
+from .util import dumpJson, loadJson
+
+__all__ = ["NCMRecordingTransport", "NCMReplayTransport"]
+
+ARCHIVE_VERSION = 1
+
+# Describe the original connection, not the recorded body
+ARCHIVE_SKIPPED_HEADERS = frozenset(("connection", "keep-alive", "transfer-encoding"))
+
+
+class NCMRecordingTransport(AsyncBaseTransport):
+    """将经过的每个请求的响应与耗时记录到存档中, 供 NCMReplayTransport 回放
+
+    存档为 gzip 压缩的 Json Lines, 响应体按接收时的原始编码保存。响应体在记录时被完整读取后才返回。
+    """
+
+    def __init__(self, path: Path, transport: AsyncBaseTransport) -> None:
+        self.path = path
+        self.transport = transport
+
+        self._file = GzipFile(path, "wb")
+        self._file.write(dumpJson({"version": ARCHIVE_VERSION}) + b"\n")
+
+    async def handle_async_request(self, request: Request) -> Response:
+        start = perf_counter()
+        response = await self.transport.handle_async_request(request)
+        try:
+            # Read the stream itself, responses built from bytes are marked as already read
+            content = b"".join([chunk async for chunk in response.stream])  # type: ignore[union-attr]
+        finally:
+            await response.aclose()
+        elapsed = perf_counter() - start
+
+        headers = [(key, value) for key, value in response.headers.multi_items() if key not in ARCHIVE_SKIPPED_HEADERS]
+
+        self._file.write(
+            dumpJson(
+                {
+                    "method": request.method,
+                    "url": str(request.url),
+                    "status": response.status_code,
+                    "headers": headers,
+                    "content": b64encode(content).decode(),
+                    "elapsed": elapsed,
+                }
+            )
+            + b"\n"
+        )
+
+        return Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        self._file.close()
+        await self.transport.aclose()
+
+
+class NCMReplayTransport(AsyncBaseTransport):
+    """以 NCMRecordingTransport 记录的存档响应请求, 不访问网络
+
+    相同的请求按记录顺序依次回放, 记录用尽后重复最后一次的响应。
+    每个响应在其记录耗时乘以 latencyScale 后返回, latencyScale 为 0 时立即返回。
+    """
+
+    def __init__(self, path: Path, latencyScale: float = 1.0) -> None:
+        self.path = path
+        self.latencyScale = latencyScale
+
+        # method url: recorded responses
+        self._entries: dict[tuple[str, str], deque[dict]] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    async def handle_async_request(self, request: Request) -> Response:
+        entries = self._entries.get((request.method, str(request.url)))
+        if entries is None:
+            raise NCMApiRequestError(f"回放存档中不存在此请求: {request.method} {request.url}", request=request)
+
+        entry = entries.popleft() if len(entries) > 1 else entries[0]
+
+        if self.latencyScale > 0:
+            await sleep(entry["elapsed"] * self.latencyScale)
+
+        return Response(
+            entry["status"],
+            headers=entry["headers"],
+            content=entry["content"],
+            request=request,
+        )
+
+    def _load(self) -> None:
+        """读取存档, 存档无法读取时抛出 OSError, 格式错误时抛出 ValueError"""
+        lines: list[bytes] = []
+        with openGzip(self.path, "rb") as file:
+            try:
+                lines.extend(file)
+            except EOFError:
+                # Archive of an interrupted recording, entries before the cut are still usable
+                pass
+
+        header = loadJson(lines[0]) if lines else None
+        if not isinstance(header, dict) or header.get("version") != ARCHIVE_VERSION:
+            raise ValueError("不支持的回放存档版本")
+
+        for line in lines[1:]:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = loadJson(line)
+                entry["content"] = b64decode(entry["content"], validate=True)
+                self._entries.setdefault((entry["method"], entry["url"]), deque()).append(entry)
+            except (KeyError, TypeError, BinasciiError) as e:
+                raise ValueError(f"回放存档格式错误: {e!r}")
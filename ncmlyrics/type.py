@@ -1,6 +1,6 @@
 from enum import StrEnum, auto
 
-__all__ = ["LinkType", "LrcMetaType", "LrcType"]
+__all__ = ["CacheMode", "LinkType", "LrcMetaType", "LrcType"]
 
 
 class LrcType(StrEnum):
@@ -41,3 +41,9 @@ class LinkType(StrEnum):
     Track = auto()
     Album = auto()
     Playlist = auto()
+
+
+class CacheMode(StrEnum):
+    Normal = auto()
+    Refresh = auto()
+    Bypass = auto()
@@ -1,15 +1,36 @@
 from dataclasses import dataclass
+from json import dumps as dumpStdJson
+from json import loads as loadStdJson
 from platform import system
 from re import compile as compileRegex
+from typing import TYPE_CHECKING, Any
 from urllib.parse import parse_qs as parseQuery
 from urllib.parse import urlparse as parseUrl
 
+from httpx2 import Response
 from httpx2 import get as getHttp
 
 from .error import ParseLinkError, UnsupportedLinkError
 from .type import LinkType
 
-__all__ = ["Link", "parseLink", "safeFileName"]
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None  # type: ignore
+
+if TYPE_CHECKING:
+    from .api import NCMApi
+
+__all__ = [
+    "Link",
+    "dumpJson",
+    "isShortLink",
+    "loadJson",
+    "parseLink",
+    "parseLinkAsync",
+    "redirectLocation",
+    "safeFileName",
+]
 
 RE_SHARE_LINK_ID_BY_PATH = compileRegex(r"^/?(?P<id>\d+)$")
 RE_SHARE_LINK_ANDROID_ALBUM_PATH = compileRegex(r"^/album/(?P<id>\d+)/?$")
@@ -61,13 +82,7 @@ def parseLink(url: str) -> Link:
                         case _:
                             raise UnsupportedLinkError(parsedUrl)
                 case "163cn.tv":
-                    response = getHttp(url)
-                    if response.status_code != 302:
-                        raise ParseLinkError(f"未知的 Api 响应: {response.status_code}")
-                    newUrl = response.headers.get("Location")
-                    if newUrl is None:
-                        raise ParseLinkError("Api 未返回重定向结果")
-                    return parseLink(newUrl)
+                    return parseLink(redirectLocation(getHttp(url)))
                 case _:
                     raise UnsupportedLinkError(parsedUrl)
         case "ncmlyrics":  # eg: ncmlyrics://playlist/123456, ncmlyrics://album/12456, ncmlyrics://track/123456
@@ -114,5 +129,41 @@ def parseLink(url: str) -> Link:
     return Link(contentType, contentId)
 
 
+async def parseLinkAsync(url: str, api: "NCMApi") -> Link:
+    """与 parseLink 相同, 但分享短链将通过 api 异步解析, 不阻塞事件循环"""
+
+    if isShortLink(url):
+        return await parseLinkAsync(await api.resolveShortLink(url), api)
+    return parseLink(url)
+
+
+def isShortLink(url: str) -> bool:
+    parsedUrl = parseUrl(url, allow_fragments=False)
+    return parsedUrl.scheme in ("http", "https") and parsedUrl.netloc == "163cn.tv"
+
+
+def redirectLocation(response: Response) -> str:
+    if response.status_code != 302:
+        raise ParseLinkError(f"未知的 Api 响应: {response.status_code}")
+    newUrl = response.headers.get("Location")
+    if newUrl is None:
+        raise ParseLinkError("Api 未返回重定向结果")
+    return newUrl
+
+
 def safeFileName(filename: str) -> str:
     return filename.translate(TRANSLATER_SAFE_FILENAME)
+
+
+def loadJson(content: bytes | str) -> Any:
+    """解析 Json, 已安装 orjson 时使用 orjson, 两者均在格式错误时抛出 JSONDecodeError"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return loadStdJson(content)
+
+
+def dumpJson(data: Any) -> bytes:
+    """序列化为紧凑且保留非 ASCII 字符的 UTF-8 Json"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return dumpStdJson(data, ensure_ascii=False, separators=(",", ":")).encode()
@@ -1,3 +1,35 @@
+from .test_api import TestApi
+from .test_cache import TestCache
+from .test_export import TestExport
+from .test_journal import TestJournal
+from .test_jsonstream import TestJsonStream
+from .test_limiter import TestLimiter
+from .test_lrc import TestLrc
+from .test_object import TestObject
+from .test_profiler import TestProfiler
+from .test_retry import TestRetry
+from .test_serve import TestServe
+from .test_source import TestSource
+from .test_stats import TestStats
+from .test_sync import TestSync
+from .test_transport import TestTransport
 from .test_utils import TestUtils
 
-__all__ = ["TestUtils"]
+__all__ = [
+    "TestApi",
+    "TestCache",
+    "TestExport",
+    "TestJournal",
+    "TestJsonStream",
+    "TestLimiter",
+    "TestLrc",
+    "TestObject",
+    "TestProfiler",
+    "TestRetry",
+    "TestServe",
+    "TestSource",
+    "TestStats",
+    "TestSync",
+    "TestTransport",
+    "TestUtils",
+]
@@ -0,0 +1,113 @@
+from asyncio import gather, sleep
+from collections.abc import AsyncIterator
+from json import dumps, loads
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+
+from httpx2 import MockTransport, PoolTimeout, Request, Response
+
+from ncmlyrics.api import NCMApi
+from ncmlyrics.cache import NCMCache
+from ncmlyrics.constant import CONFIG_API_DETAIL_TRACK_PER_REQUEST
+from ncmlyrics.error import NCMApiPoolTimeoutError
+
+
+def trackData(trackId: int) -> dict:
+    return {"id": trackId, "name": f"track{trackId}", "ar": [{"name": "artist"}]}
+
+
+class TestApi(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.requests: list[Request] = []
+        self.streamFinished = False
+        self.detailsBeforeStreamFinished = 0
+        self.playlistTrackIds = list(range(1000, 2000))
+
+        async def playlistBody(trackIds: list[int]) -> AsyncIterator[bytes]:
+            content = dumps(
+                {
+                    "code": 200,
+                    "playlist": {
+                        "id": 1,
+                        "name": "playlist",
+                        "tracks": [trackData(trackId) for trackId in trackIds[:10]],
+                        "trackIds": [{"id": trackId} for trackId in trackIds],
+                    },
+                },
+            ).encode()
+            for seek in range(0, len(content), 1024):
+                yield content[seek : seek + 1024]
+                await sleep(0.001)
+            self.streamFinished = True
+
+        async def handler(request: Request) -> Response:
+            self.requests.append(request)
+            await sleep(0.01)
+
+            match request.url.path:
+                case "/api/v6/playlist/detail":
+                    return Response(200, content=playlistBody(self.playlistTrackIds))
+                case "/api/v3/song/detail":
+                    if not self.streamFinished:
+                        self.detailsBeforeStreamFinished += 1
+                    trackIds = [track["id"] for track in loads(request.url.params["c"])]
+                    return Response(200, json={"code": 200, "songs": [trackData(trackId) for trackId in trackIds]})
+                case "/api/v1/album/0":
+                    raise PoolTimeout("No free connection", request=request)
+                case _:
+                    return Response(200, json={"code": 200, "lrc": {"lyric": f"[00:01.00]{request.url.params['id']}"}})
+
+        self.directory = TemporaryDirectory()
+        self.api = NCMApi(transport=MockTransport(handler), cookiePath=Path(self.directory.name) / "cookies.txt")
+
+    async def asyncTearDown(self) -> None:
+        await self.api.close()
+        self.directory.cleanup()
+
+    async def test_coalesceRequests(self) -> None:
+        results = await gather(*(self.api.getLyricsByTrack(1) for _ in range(8)), self.api.getLyricsByTrack(2))
+
+        self.assertEqual(len(self.requests), 2, msg="Identical concurrent requests are sent once")
+        self.assertEqual([lyrics.id for lyrics in results], [1] * 8 + [2])
+        self.assertEqual(self.api._inFlight, {})
+
+        await self.api.getLyricsByTrack(1)
+        self.assertEqual(len(self.requests), 3, msg="Finished requests are not shared")
+
+    async def test_streamDetailsForPlaylist(self) -> None:
+        playlist = await self.api.streamDetailsForPlaylist(1)
+
+        self.assertEqual([track.id for track in playlist.tracks], list(range(1000, 2000)))
+        self.assertEqual(playlist.trackIds, [])
+        self.assertEqual(len(self.requests), 1 + -(-990 // CONFIG_API_DETAIL_TRACK_PER_REQUEST))
+        self.assertGreater(self.detailsBeforeStreamFinished, 0, msg="Chunks are requested while streaming")
+
+    async def test_playlistRevalidation(self) -> None:
+        cache = NCMCache(path=Path(self.directory.name) / "cache.sqlite3")
+        self.api.cache = cache
+
+        await self.api.streamDetailsForPlaylist(1)
+        self.assertNotIn("n", self.requests[0].url.params)
+        self.assertEqual((cache.playlists.hits, cache.playlists.misses), (0, 1))
+
+        self.requests.clear()
+        await self.api.streamDetailsForPlaylist(1)
+        self.assertEqual(self.requests[0].url.params["n"], "0", msg="A seen playlist only asks for track ids")
+        self.assertEqual(len(self.requests), 1, msg="Track details come from the cache")
+        self.assertEqual((cache.playlists.hits, cache.playlists.misses), (1, 1))
+
+        self.playlistTrackIds = [*self.playlistTrackIds[1:], 5000]
+        playlist = await self.api.getDetailsForPlaylist(1)
+        await playlist.fillDetailsOfTracks(self.api)
+        self.assertEqual([track.id for track in playlist.tracks][-1], 5000, msg="Added tracks are picked up")
+        self.assertNotIn(1000, [track.id for track in playlist.tracks])
+        self.assertEqual((cache.playlists.hits, cache.playlists.misses), (1, 2), msg="A changed playlist is a miss")
+
+        cache.close()
+
+    async def test_poolTimeout(self) -> None:
+        with self.assertRaises(NCMApiPoolTimeoutError):
+            await self.api.getDetailsForAlbum(0)
+
+        self.assertEqual(len(self.requests), 1, msg="Pool timeouts are not retried")
@@ -0,0 +1,68 @@
+import sqlite3
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import sleep
+from unittest import TestCase
+from zlib import decompress
+
+from ncmlyrics.cache import NCMCache
+from ncmlyrics.type import CacheMode
+
+
+class TestCache(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.path = Path(self.directory.name) / "cache.sqlite3"
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_getSet(self) -> None:
+        cache = NCMCache(path=self.path)
+        self.assertIsNone(cache.lyrics.get(1))
+
+        cache.lyrics.set(1, b"lyric" * 100)
+        cache.lyrics.setData(2, {"lrc": {"lyric": "text"}})
+        cache.tracks.setManyData((trackId, {"id": trackId}) for trackId in range(1000))
+
+        self.assertEqual(cache.lyrics.get(1), b"lyric" * 100)
+        self.assertEqual(cache.lyrics.getData(2), {"lrc": {"lyric": "text"}})
+        self.assertEqual(len(cache.tracks.getManyData(range(2000))), 1000)
+        self.assertEqual((cache.lyrics.hits, cache.lyrics.misses), (2, 1))
+        cache.close()
+
+        with sqlite3.connect(self.path) as connection:
+            (payload,) = connection.execute("SELECT payload FROM lyrics WHERE id = 1").fetchone()
+        self.assertLess(len(payload), 100, msg="Payloads are stored compressed")
+        self.assertEqual(decompress(payload), b"lyric" * 100)
+
+        cache = NCMCache(path=self.path)
+        self.assertEqual(cache.tracks.getData(999), {"id": 999}, msg="Batched writes are committed on close")
+        cache.close()
+
+    def test_expiry(self) -> None:
+        cache = NCMCache(path=self.path)
+        cache.lyrics.ttl = 0.01
+        cache.lyrics.set(1, b"lyric")
+        sleep(0.02)
+        self.assertIsNone(cache.lyrics.get(1))
+        cache.close()
+
+        with sqlite3.connect(self.path) as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM lyrics").fetchone(), (0,))
+
+    def test_modes(self) -> None:
+        cache = NCMCache(CacheMode.Bypass, path=self.path)
+        cache.lyrics.set(1, b"lyric")
+        self.assertIsNone(cache.lyrics.get(1))
+        cache.close()
+        self.assertFalse(self.path.exists(), msg="Bypass does not touch the database")
+
+        cache = NCMCache(CacheMode.Refresh, path=self.path)
+        cache.lyrics.set(1, b"lyric")
+        self.assertIsNone(cache.lyrics.get(1), msg="Refresh writes without reading")
+        cache.close()
+
+        cache = NCMCache(path=self.path)
+        self.assertEqual(cache.lyrics.get(1), b"lyric")
+        cache.close()
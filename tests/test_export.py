@@ -0,0 +1,60 @@
+from asyncio import gather
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+
+from httpx2 import MockTransport, Request, Response
+
+from ncmlyrics.api import NCMApi
+from ncmlyrics.export import NCMExporter, NCMExportStatus
+from ncmlyrics.type import CacheMode
+
+
+class TestExport(IsolatedAsyncioTestCase):
+    async def test_exportLinks(self) -> None:
+        lyricRequests: list[int] = []
+
+        async def handler(request: Request) -> Response:
+            match request.url.path:
+                case "/api/v3/song/detail":
+                    return Response(
+                        200,
+                        json={"code": 200, "songs": [{"id": 1, "name": "track", "ar": [{"name": "artist"}]}]},
+                    )
+                case "/api/song/lyric/v1":
+                    lyricRequests.append(int(request.url.params["id"]))
+                    return Response(200, json={"code": 200, "lrc": {"lyric": "[00:01.00]lyric"}})
+            return Response(404)
+
+        links = ("https://music.163.com/song?id=1", "https://music.163.com/#/song?id=1", "https://example.com/")
+
+        with TemporaryDirectory() as directory:
+            async with NCMExporter(
+                outputs=(Path(directory),),
+                api=NCMApi(transport=MockTransport(handler), cookiePath=Path(directory) / "cookies.txt"),
+                cacheMode=CacheMode.Bypass,
+            ) as exporter:
+                results = [result async for result in exporter.exportLinks(links)]
+                self.assertEqual(
+                    sorted(result.status for result in results),
+                    sorted((NCMExportStatus.LinkFailed, NCMExportStatus.Written)),
+                    msg="A lyric file listed by several links is exported once",
+                )
+                self.assertEqual(lyricRequests, [1])
+
+                written = next(result for result in results if result.status is NCMExportStatus.Written)
+                self.assertEqual(written.path, Path(directory) / "artist - track.lrc")
+                self.assertIn("lyric", written.path.read_text())
+
+                results = [result async for result in exporter.exportTracks([written.track])]
+                self.assertEqual([result.status for result in results], [NCMExportStatus.Exists])
+
+                track = written.track
+                assert track is not None
+                results = await gather(
+                    *(exporter.exportTrack(track, [Path(directory) / f"{name}.lrc"]) for name in ("a", "b"))
+                )
+                self.assertEqual([result.status for (result,) in results], [NCMExportStatus.Written] * 2)
+                self.assertEqual(lyricRequests, [1, 1], msg="Concurrent exports of a track share one download")
+                self.assertEqual(exporter.lyricsTasks, {}, msg="Downloads are not kept once exported")
+                await exporter.api.close()
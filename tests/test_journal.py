@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from ncmlyrics.journal import NCMJobJournal
+from ncmlyrics.object import NCMPlaylist, NCMTrack
+
+
+class TestJournal(TestCase):
+    def test_resume(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "job.jsonl"
+            track = NCMTrack(id=1, name="Name", artists=("Artist",))
+            playlist = NCMPlaylist(id=2, name="Playlist", tracks=[track], trackIds=[])
+
+            journal = NCMJobJournal("job", resume=True, path=path)
+            journal.recordLink("https://music.163.com/playlist?id=2", playlist)
+            journal.recordDone(1, Path("Artist - Name.lrc"))
+            journal.recordDone(3, None)
+            journal.close()
+
+            # Interrupted while writing a record
+            with path.open("ab") as fs:
+                fs.write(b'{"track": 4, "pa')
+
+            journal = NCMJobJournal("job", resume=True, path=path)
+            self.assertEqual(journal.getLink("https://music.163.com/playlist?id=2"), playlist)
+            self.assertTrue(journal.isDone(1, Path("Artist - Name.lrc")))
+            self.assertTrue(journal.isDone(3, None))
+            self.assertFalse(journal.isDone(4, None))
+
+            journal.recordDone(4, None)
+            journal.close()
+            self.assertTrue(NCMJobJournal("job", resume=True, path=path).isDone(4, None))
+
+            NCMJobJournal("job", path=path).close()
+            journal = NCMJobJournal("job", resume=True, path=path)
+            self.assertFalse(journal.resumable, msg="Starting without resume discards the journal")
+            journal.remove()
+            self.assertFalse(path.exists())
+
+            journal = NCMJobJournal("job", path=path)
+            journal.recordDone(1, None)
+            journal.close()
+            self.assertFalse(path.exists(), msg="Nothing is recorded without resume")
+
+    def test_prune(self) -> None:
+        with TemporaryDirectory() as directory:
+            old, recent = Path(directory) / "old.jsonl", Path(directory) / "recent.jsonl"
+            old.touch()
+            recent.touch()
+            os.utime(old, (0, 0))
+
+            NCMJobJournal("other", path=Path(directory) / "other.jsonl").close()
+            self.assertFalse(old.exists(), msg="Stale journals are pruned")
+            self.assertTrue(recent.exists())
+
+            os.utime(recent, (0, 0))
+            NCMJobJournal("recent", resume=True, path=recent).close()
+            self.assertTrue(recent.exists(), msg="The journal being resumed is kept")
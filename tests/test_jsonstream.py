@@ -0,0 +1,44 @@
+from json import JSONDecodeError
+from unittest import TestCase
+
+from ncmlyrics.jsonstream import JsonStreamParser
+
+
+class TestJsonStream(TestCase):
+    def feedBytewise(self, parser: JsonStreamParser, content: bytes) -> list:
+        events = []
+        for seek in range(len(content)):
+            events.extend(parser.feed(content[seek : seek + 1]))
+        events.extend(parser.close())
+        return events
+
+    def test_valuesAndItems(self) -> None:
+        content = (
+            '{"code": 200, "playlist": {"name": "歌单 \\"]}", "tracks": [{"id": 2, "ar": [{"name": "{["}]}], '
+            '"skipped": {"trackIds": [0]}, "trackIds": [{"id": 2}, {"id": 3}], "id": 1}}'
+        ).encode()
+        parser = JsonStreamParser(
+            values=(("code",), ("playlist", "id"), ("playlist", "name")),
+            items=(("playlist", "tracks"), ("playlist", "trackIds")),
+        )
+
+        self.assertEqual(
+            self.feedBytewise(parser, content),
+            [
+                (("code",), 200),
+                (("playlist", "name"), '歌单 "]}'),
+                (("playlist", "tracks"), {"id": 2, "ar": [{"name": "{["}]}),
+                (("playlist", "trackIds"), {"id": 2}),
+                (("playlist", "trackIds"), {"id": 3}),
+                (("playlist", "id"), 1),
+            ],
+        )
+
+    def test_emptyContainers(self) -> None:
+        parser = JsonStreamParser(values=(("a", "b"),), items=(("c",),))
+        self.assertEqual(self.feedBytewise(parser, b'{"a": {}, "c": [ ], "d": [[], {}]}'), [])
+
+    def test_invalid(self) -> None:
+        for content in (b'{"a": 1,}', b'{"a" 1}', b'{"a": [1, }', b'{"a": 1', b'{"a": 1} {}'):
+            with self.assertRaises(JSONDecodeError, msg=content):
+                self.feedBytewise(JsonStreamParser(values=(("a",),)), content)
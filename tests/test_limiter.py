@@ -0,0 +1,69 @@
+from asyncio import CancelledError, create_task, sleep, wait_for
+from unittest import IsolatedAsyncioTestCase
+
+from ncmlyrics.limiter import AdaptiveLimiter
+
+
+class TestLimiter(IsolatedAsyncioTestCase):
+    async def test_aimd(self) -> None:
+        limiter = AdaptiveLimiter(16, adaptive=True)
+        self.assertEqual(limiter.limit, 16)
+
+        limiter.record(0.1, failed=True)
+        self.assertEqual(limiter.limit, 8, msg="Throttling halves the limit")
+
+        for _ in range(10):
+            limiter.record(0.1, failed=True)
+        self.assertEqual(limiter.limit, 1, msg="The limit never goes below 1")
+
+        limiter = AdaptiveLimiter(16, adaptive=True)
+        for _ in range(4):
+            limiter.record(0.1, failed=True)
+        self.assertEqual(limiter.limit, 1)
+        limiter.record(0.01)
+        self.assertEqual(limiter.limit, 2)
+        # Each success adds 1 / limit, about one step per round of successes
+        for _ in range(2):
+            limiter.record(0.01)
+        self.assertEqual(limiter.limit, 2)
+        limiter.record(0.01)
+        self.assertEqual(limiter.limit, 3)
+
+        for _ in range(1000):
+            limiter.record(0.01)
+        self.assertEqual(limiter.limit, 16, msg="The limit never goes above maxLimit")
+
+        limiter = AdaptiveLimiter(10, adaptive=True)
+        limiter.record(0.01)
+        limiter.record(0.1)
+        self.assertEqual(limiter.limit, 9, msg="Latency far above the baseline decreases the limit")
+
+        limiter = AdaptiveLimiter(10, adaptive=False)
+        limiter.record(0.1, failed=True)
+        self.assertEqual(limiter.limit, 10)
+
+    async def test_cancelledWaiter(self) -> None:
+        limiter = AdaptiveLimiter(1, adaptive=False)
+        await limiter.acquire()
+
+        # Cancelled while waiting
+        waiter = create_task(limiter.acquire())
+        await sleep(0)
+        waiter.cancel()
+        with self.assertRaises(CancelledError):
+            await waiter
+
+        # Cancelled after being woken, the slot is handed to the next waiter
+        woken = create_task(limiter.acquire())
+        following = create_task(limiter.acquire())
+        await sleep(0)
+        limiter.release()
+        woken.cancel()
+        with self.assertRaises(CancelledError):
+            await woken
+        await wait_for(following, 1)
+
+        self.assertEqual(limiter.inFlight, 1)
+        limiter.release()
+        self.assertEqual(limiter.inFlight, 0)
+        await wait_for(limiter.acquire(), 1)
@@ -0,0 +1,103 @@
+from asyncio import run
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from ncmlyrics.lrc import Lrc
+from ncmlyrics.object import NCMLyrics
+from ncmlyrics.type import LrcMetaType, LrcType
+
+
+class TestLrc(TestCase):
+    def test_autoMerge(self) -> None:
+        lrc = Lrc.fromNCMLyrics(
+            NCMLyrics(
+                id=None,
+                isPureMusic=False,
+                lyrics={
+                    LrcType.Origin: "[00:01.000]one\n[00:02.000]two\n[00:03.000]three\n",
+                    LrcType.Translation: "[00:01.030]一\n[00:02.060]二\n[00:02.960]三\n",
+                },
+            ),
+        )
+
+        self.assertEqual(
+            lrc.lyrics,
+            {
+                1000: {LrcType.Origin: "one", LrcType.Translation: "一"},
+                2000: {LrcType.Origin: "two"},
+                2060: {LrcType.Translation: "二"},
+                3000: {LrcType.Origin: "three", LrcType.Translation: "三"},
+            },
+        )
+
+    def test_autoMerge_nearest(self) -> None:
+        lrc = Lrc()
+        lrc.parseLyricFile(LrcType.Origin, "[00:01.000]a\n[00:01.080]b\n")
+        lrc.parseLyricFile(LrcType.Translation, "[00:01.050]c\n")
+
+        self.assertEqual(lrc.lyrics[1080], {LrcType.Origin: "b", LrcType.Translation: "c"})
+
+    def test_serializeLyricFile_sorted(self) -> None:
+        lrc = Lrc()
+        lrc.parseLyricFile(LrcType.Origin, "[00:03.000]c\n[00:01.000]a\n[00:02.000][00:04.000]b\n")
+
+        self.assertEqual(
+            lrc.serializeLyricFile(),
+            "[00:01.000]a\n[00:02.000]b\n[00:03.000]c\n[00:04.000]b\n",
+        )
+
+    def test_parseLyricRow(self) -> None:
+        rows = (
+            "# commit",
+            "  [ti:  Title  ] ",
+            "[ar: ]",
+            "[unknown:value]",
+            '{"t":0,"c":[{"tx":"作词: "},{"tx":"Someone"}]}',
+            '{"t":0,"c":[{"tx":"作曲：Nobody"}]}',
+            "{not json}",
+            "[00:01.5] [1:02][00:03.123]  lyric  ",
+            "[00:04.00][00:05.00]",
+            "[00:06.00]",
+            "[00:07.1234]invalid",
+            "[000:08.00]invalid",
+            "[00:09.00][xx]partial",
+        )
+        lrc = Lrc()
+        lrc.parseLyricFile(LrcType.Origin, "\n".join(rows))
+
+        self.assertEqual(
+            lrc.metadata,
+            {LrcMetaType.Title: {LrcType.Origin: "Title"}, LrcMetaType.Artist: {LrcType.Origin: " "}},
+        )
+        self.assertEqual(
+            lrc.specials.metadata,
+            [(LrcMetaType.Author, "作词/Someone"), (LrcMetaType.Author, "作曲/Nobody")],
+        )
+        self.assertEqual(
+            lrc.lyrics,
+            {
+                1500: {LrcType.Origin: "lyric"},
+                62000: {LrcType.Origin: "lyric"},
+                3123: {LrcType.Origin: "lyric"},
+                4000: {LrcType.Origin: "[00:05.00]"},
+                9000: {LrcType.Origin: "[xx]partial"},
+            },
+        )
+
+    def test_saveAs(self) -> None:
+        lrc = Lrc()
+        lrc.parseLyricRow(LrcType.Origin, "[00:01.00]歌词")
+
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "track.lrc"
+
+            self.assertTrue(run(lrc.saveAs(path)))
+            self.assertEqual(path.read_text(encoding="utf-8"), "[00:01.000]歌词\n")
+            self.assertFalse(run(lrc.saveAs(path)), msg="Identical content is not written again")
+            self.assertTrue(run(lrc.saveAs(path, skipIdentical=False)))
+
+            lrc.parseLyricRow(LrcType.Origin, "[00:02.00]更新")
+            self.assertTrue(run(lrc.saveAs(path)))
+            self.assertEqual(path.read_text(encoding="utf-8"), "[00:01.000]歌词\n[00:02.000]更新\n")
+            self.assertEqual([child.name for child in Path(directory).iterdir()], ["track.lrc"])
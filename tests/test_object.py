@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+from ncmlyrics.object import NCMPlaylist
+
+
+class TestObject(TestCase):
+    def test_NCMPlaylist_fromData(self) -> None:
+        playlist = NCMPlaylist.fromData(
+            {
+                "playlist": {
+                    "id": 1,
+                    "name": "playlist",
+                    "tracks": [
+                        {"id": 3, "name": "c", "ar": [{"name": "C"}]},
+                        {"id": 5, "name": "e", "ar": [{"name": "E"}]},
+                    ],
+                    "trackIds": [{"id": 3}, {"id": 4}, {"id": 2}, {"id": 1}],
+                },
+            },
+        )
+
+        self.assertEqual([track.id for track in playlist.tracks], [3, 5])
+        self.assertEqual(playlist.trackIds, [4, 2, 1], msg="Ids without details keep playlist order")
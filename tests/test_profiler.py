@@ -0,0 +1,37 @@
+from asyncio import create_task, run, sleep
+from pathlib import Path
+from pstats import Stats
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from ncmlyrics.profiler import NCMProfiler
+from ncmlyrics.util import loadJson
+
+
+async def child() -> int:
+    await sleep(0.01)
+    return 1
+
+
+async def parent() -> int:
+    return sum([await create_task(child()) for _ in range(3)])
+
+
+class TestProfiler(TestCase):
+    def test_run(self) -> None:
+        profiler = NCMProfiler()
+        self.assertEqual(run(profiler.run(parent())), 3)
+
+        self.assertEqual(profiler.tasks["parent"].count, 1)
+        self.assertEqual(profiler.tasks["child"].count, 3)
+        self.assertEqual(profiler.tasks["child"].running, 0)
+        self.assertGreaterEqual(profiler.tasks["child"].wallMax, 0.01)
+
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "ncmlyrics.prof"
+            profiler.save(path)
+
+            self.assertGreater(Stats(str(path)).total_calls, 0)  # type: ignore[attr-defined]
+            self.assertEqual(
+                loadJson(path.with_name("ncmlyrics.prof.tasks.json").read_bytes())["tasks"]["child"]["count"], 3
+            )
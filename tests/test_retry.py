@@ -0,0 +1,110 @@
+from email.utils import formatdate
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, time
+from unittest import IsolatedAsyncioTestCase
+
+from httpx2 import ByteStream, MockTransport, Request, Response
+
+from ncmlyrics.api import NCMApi
+from ncmlyrics.error import NCMApiRequestError, NCMApiRetryLimitExceededError
+from ncmlyrics.retry import CircuitBreaker, RetryPolicy, parseRetryAfter
+
+
+class TestRetry(IsolatedAsyncioTestCase):
+    def test_delay(self) -> None:
+        policy = RetryPolicy(backoffBase=0.5, backoffMax=3.0)
+        for attempt in range(6):
+            bound = min(0.5 * 2**attempt, 3.0)
+            for _ in range(50):
+                self.assertTrue(0.0 <= policy.delay(attempt) <= bound)
+
+        policy = RetryPolicy(backoffBase=0.5, backoffMax=3.0, jitter=False)
+        self.assertEqual([policy.delay(attempt) for attempt in range(4)], [0.5, 1.0, 2.0, 3.0])
+        self.assertEqual(policy.delay(0, retryAfter=2.0), 2.0, msg="Retry-After replaces the backoff")
+        self.assertEqual(policy.delay(0, retryAfter=60.0), 3.0, msg="Retry-After is capped")
+        self.assertEqual(policy.delay(0, retryAfter=-5.0), 0.0)
+
+    def test_parseRetryAfter(self) -> None:
+        self.assertIsNone(parseRetryAfter(None))
+        self.assertIsNone(parseRetryAfter("soon"))
+        self.assertEqual(parseRetryAfter(" 120 "), 120.0)
+
+        for value in (formatdate(time() + 60, usegmt=True), formatdate(time() + 60)):
+            # GMT and -0000 dates are both UTC
+            delay = parseRetryAfter(value)
+            assert delay is not None
+            self.assertAlmostEqual(delay, 60, delta=2, msg=value)
+        naive = parseRetryAfter("Wed, 21 Oct 2015 07:28:00 -0000")
+        utc = parseRetryAfter("Wed, 21 Oct 2015 07:28:00 GMT")
+        assert naive is not None and utc is not None
+        self.assertAlmostEqual(naive, utc, delta=1)
+
+    async def test_circuitBreaker(self) -> None:
+        breaker = CircuitBreaker(window=4, failureRate=0.5, cooldown=0.05, cooldownMax=0.08)
+
+        for _ in range(3):
+            breaker.record(False)
+        self.assertFalse(breaker.isOpen, msg="The window is not full yet")
+        breaker.record(False)
+        self.assertTrue(breaker.isOpen)
+
+        start = perf_counter()
+        await breaker.wait()
+        self.assertGreaterEqual(perf_counter() - start, 0.04)
+        self.assertFalse(breaker.isOpen)
+
+        for _ in range(4):
+            breaker.record(False)
+        self.assertEqual(breaker._cooldown, 0.08, msg="Repeated trips double the cooldown up to cooldownMax")
+
+        for _ in range(4):
+            breaker.record(True)
+        self.assertEqual(breaker._cooldown, 0.05, msg="A healthy window resets the cooldown")
+
+    async def test_retry(self) -> None:
+        statuses: dict[str, list[int]] = {}
+        responses = {
+            "/seconds": [Response(429, headers={"Retry-After": "30"}), Response(200)],
+            "/date": [Response(503, headers={"Retry-After": formatdate(time() + 30, usegmt=True)}), Response(200)],
+            "/missing": [Response(404), Response(200)],
+            "/unavailable": [Response(503)] * 10,
+            "/corrupt": [Response(200, headers={"Content-Encoding": "gzip"}, stream=ByteStream(b"not gzip"))],
+        }
+
+        async def handler(request: Request) -> Response:
+            path = request.url.path.removeprefix("/api")
+            sent = statuses.setdefault(path, [])
+            response = responses[path][min(len(sent), len(responses[path]) - 1)]
+            sent.append(response.status_code)
+            return response
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        api = NCMApi(
+            retryPolicy=RetryPolicy(retries=2, backoffMax=0.05),
+            transport=MockTransport(handler),
+            cookiePath=Path(directory.name) / "cookies.txt",
+        )
+
+        start = perf_counter()
+        for path in ("/seconds", "/date"):
+            response = await api._fetch(api._httpClient.build_request("GET", path))
+            self.assertEqual(response.status_code, 200)
+        self.assertLess(perf_counter() - start, 1, msg="Retry-After is capped by backoffMax")
+        self.assertEqual(statuses["/seconds"], [429, 200])
+        self.assertEqual(statuses["/date"], [503, 200])
+
+        response = await api._fetch(api._httpClient.build_request("GET", "/missing"))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(statuses["/missing"], [404], msg="Other 4xx responses are not retried")
+
+        with self.assertRaises(NCMApiRetryLimitExceededError):
+            await api._fetch(api._httpClient.build_request("GET", "/unavailable"))
+        self.assertEqual(statuses["/unavailable"], [503] * 3)
+
+        with self.assertRaises(NCMApiRequestError):
+            await api._fetch(api._httpClient.build_request("GET", "/corrupt"))
+        self.assertEqual(statuses["/corrupt"], [200], msg="Undecodable responses are not retried")
+
+        await api.close()
@@ -0,0 +1,109 @@
+from asyncio import CancelledError, create_task, gather, sleep
+from contextlib import redirect_stdout
+from io import StringIO
+from os import getpid, kill
+from pathlib import Path
+from signal import SIGTERM
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from httpx2 import AsyncClient, MockTransport, Request, Response
+
+from ncmlyrics.error import NCMLyricsServeError
+from ncmlyrics.serve import NCMLyricsServer
+from ncmlyrics.type import CacheMode
+
+
+class TestServe(IsolatedAsyncioTestCase):
+    async def test_serve(self) -> None:
+        lyricRequests: list[int] = []
+
+        async def handler(request: Request) -> Response:
+            await sleep(0.01)
+            if request.url.host == "163cn.tv":
+                return Response(503, headers={"Retry-After": "0"})
+            if request.url.path != "/api/song/lyric/v1":
+                return Response(404)
+            trackId = int(request.url.params["id"])
+            lyricRequests.append(trackId)
+            if trackId == 2:
+                return Response(200, json={"code": 200})
+            return Response(200, json={"code": 200, "lrc": {"lyric": f"[00:01.00]{trackId}"}})
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        server = NCMLyricsServer(
+            port=0,
+            cacheMode=CacheMode.Bypass,
+            transport=MockTransport(handler),
+            cookiePath=Path(directory.name) / "cookies.txt",
+            quiet=True,
+        )
+        task = create_task(server.run())
+        while server.server is None:
+            await sleep(0.01)
+
+        async with AsyncClient(base_url=server.address) as client:
+            responses = await gather(*(client.get("/lyrics", params={"id": 1}) for _ in range(4)))
+            self.assertEqual({response.status_code for response in responses}, {200})
+            self.assertEqual(responses[0].text, "[00:01.000]1\n")
+
+            response = await client.get("/lyrics", params={"link": "https://music.163.com/song?id=1"})
+            self.assertEqual(response.content, responses[0].content)
+            self.assertEqual(lyricRequests, [1], msg="Lyrics are fetched once and then served from memory")
+
+            for _ in range(2):
+                self.assertEqual((await client.get("/lyrics", params={"id": 2})).status_code, 404)
+            self.assertEqual(lyricRequests, [1, 2], msg="Tracks without lyrics are remembered too")
+
+            shortLink = await client.get("/lyrics", params={"link": "https://163cn.tv/abc"})
+            self.assertEqual(shortLink.status_code, 502)
+            self.assertEqual((await client.get("/lyrics", params={"id": "x"})).status_code, 400)
+            playlist = await client.get("/lyrics", params={"link": "https://music.163.com/playlist?id=1"})
+            self.assertEqual(playlist.status_code, 400)
+
+            with patch.object(server, "resolveTypes", side_effect=RuntimeError("boom")):
+                self.assertEqual((await client.get("/lyrics", params={"id": 1})).status_code, 500)
+            self.assertEqual((await client.get("/health")).status_code, 200)
+
+        task.cancel()
+        with self.assertRaises(CancelledError):
+            await task
+        self.assertIsNone(server.server)
+
+    async def test_serve_bind_error(self) -> None:
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        server = NCMLyricsServer(
+            socketPath=Path(directory.name) / "missing" / "serve.sock",
+            cacheMode=CacheMode.Bypass,
+            cookiePath=Path(directory.name) / "cookies.txt",
+            quiet=True,
+        )
+        with self.assertRaises(NCMLyricsServeError):
+            await server.run()
+
+    async def test_serve_sigterm(self) -> None:
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        server = NCMLyricsServer(
+            port=0,
+            cacheMode=CacheMode.Bypass,
+            transport=MockTransport(lambda request: Response(404)),
+            cookiePath=Path(directory.name) / "cookies.txt",
+        )
+
+        output = StringIO()
+        with redirect_stdout(output):
+            task = create_task(server.run())
+            while server.server is None:
+                await sleep(0.01)
+            address = server.address
+
+            kill(getpid(), SIGTERM)
+            self.assertIsNone(await task, msg="SIGTERM stops the server without an error")
+
+        self.assertNotIn(":0", address)
+        self.assertEqual(output.getvalue(), f"歌词服务正在监听：{address}\n", msg="The bound address is printed")
+        self.assertIsNone(server.server)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from ncmlyrics.object import NCMTrack
+from ncmlyrics.source import SourceFileIndex, SourceScanner
+from ncmlyrics.type import CacheMode
+
+RESOURCE = Path(__file__).parent / "resource" / "util"
+
+
+def scanSourceFiles(*outputs: Path) -> SourceFileIndex:
+    return asyncio.run(SourceScanner(cacheMode=CacheMode.Bypass).scan(outputs))
+
+
+class TestSource(TestCase):
+    def test_find_existTrackSource(self) -> None:
+        index = scanSourceFiles(RESOURCE / "testExistTrackSource")
+        self.assertEqual(len(index), 4)
+
+        self.assertEqual(
+            index.find(NCMTrack(id=1, name="FlacName", artists=["FlacArtist1", "FlacArtist2"])),
+            RESOURCE / "testExistTrackSource" / "FlacArtist1 FlacArtist2 - FlacName.flac",
+            msg="Artists separated by space",
+        )
+
+        self.assertEqual(
+            index.find(NCMTrack(id=2, name="Mp3Name", artists=["Mp3Artist1", "Mp3Artist2"])),
+            RESOURCE / "testExistTrackSource" / "Mp3Artist1,Mp3Artist2 - Mp3Name.mp3",
+            msg="Artists separated by comma",
+        )
+
+        self.assertEqual(
+            index.find(NCMTrack(id=3, name="Mp3Name", artists=["Mp3Artist"])),
+            RESOURCE / "testExistTrackSource" / "Mp3Artist - Mp3Name.mp3",
+            msg="Same title with different artists",
+        )
+
+        self.assertEqual(
+            index.find(NCMTrack(id=4, name="NcmNameWith.", artists=["NcmArtistWith."])),
+            RESOURCE / "testExistTrackSource" / "NcmArtistWith. - NcmNameWith..ncm",
+            msg="Trailing dots of title",
+        )
+
+        self.assertIsNone(index.find(NCMTrack(id=5, name="Mp3Name", artists=["Mp3Artist2"])))
+        self.assertIsNone(index.find(NCMTrack(id=6, name="Unknown", artists=["Mp3Artist"])))
+
+    def test_find_pickOutput(self) -> None:
+        index = scanSourceFiles(RESOURCE / "pickOutput" / "1", RESOURCE / "pickOutput" / "2")
+
+        self.assertEqual(
+            index.find(NCMTrack(id=1, name="testTrack1", artists=["testArtist"])),
+            RESOURCE / "pickOutput" / "1" / "testArtist - testTrack1.mp3",
+        )
+
+        self.assertEqual(
+            index.find(NCMTrack(id=2, name="testTrack2", artists=["testArtist"])),
+            RESOURCE / "pickOutput" / "2" / "testArtist - testTrack2.mp3",
+        )
+
+    def test_find_manyArtists(self) -> None:
+        index = SourceFileIndex()
+        index.add(Path("A,B C,E - Title - Part.mp3"))
+        index.add(Path("A - B - Title - Part.flac"))
+
+        self.assertEqual(
+            index.find(NCMTrack(id=1, name="Title - Part", artists=["A", "B", "C", "D", "E"])),
+            Path("A,B C,E - Title - Part.mp3"),
+            msg="Artists after the third are optional",
+        )
+
+        self.assertEqual(
+            index.find(NCMTrack(id=2, name="Title - Part", artists=["A - B"])),
+            Path("A - B - Title - Part.flac"),
+            msg="Separator inside artist and title",
+        )
+
+        self.assertIsNone(index.find(NCMTrack(id=3, name="Title - Part", artists=["A", "B"])))
+
+    def test_scan_recursiveSnapshot(self) -> None:
+        with TemporaryDirectory() as temporary:
+            root = Path(temporary, "library")
+            (root / "album").mkdir(parents=True)
+            (root / "album" / "Artist - Nested.flac").touch()
+            (root / "Artist - Top.mp3").touch()
+            (root / "Artist - Other.ogg").touch()
+
+            track = NCMTrack(id=1, name="Nested", artists=["Artist"])
+            snapshotPath = Path(temporary, "sources.json")
+
+            index = asyncio.run(SourceScanner(snapshotPath=snapshotPath).scan((root,)))
+            self.assertEqual(len(index), 1)
+            self.assertIsNone(index.find(track))
+
+            scanner = SourceScanner((".mp3", ".flac", ".ogg"), recursive=True, snapshotPath=snapshotPath)
+            index = asyncio.run(scanner.scan((root,)))
+            self.assertEqual(len(index), 3)
+            self.assertEqual(index.find(track), root / "album" / "Artist - Nested.flac")
+
+            # Unchanged directories are served from the snapshot, changed ones are listed again
+            (root / "album" / "Artist - Nested.flac").rename(root / "album" / "Artist - Renamed.flac")
+            os.utime(root / "album", ns=(0, 0))
+            index = asyncio.run(scanner.scan((root,)))
+            self.assertIsNone(index.find(track))
+            self.assertIsNotNone(index.find(NCMTrack(id=2, name="Renamed", artists=["Artist"])))
+
+    def test_scan_warmSnapshot(self) -> None:
+        with TemporaryDirectory() as temporary:
+            root = Path(temporary, "library")
+            for album in ("a", "b", "c"):
+                (root / album).mkdir(parents=True)
+                (root / album / f"Artist - {album}.mp3").touch()
+            snapshotPath = Path(temporary, "sources.json")
+
+            asyncio.run(SourceScanner(snapshotPath=snapshotPath).scan((root,)))
+            self.assertFalse(snapshotPath.exists(), msg="Flat scans do not use the snapshot")
+
+            scanner = SourceScanner(recursive=True, snapshotPath=snapshotPath)
+            asyncio.run(scanner.scan((root,)))
+            written = snapshotPath.stat().st_mtime_ns
+
+            with patch("ncmlyrics.source.os.scandir", wraps=os.scandir) as scandir:
+                index = asyncio.run(scanner.scan((root,)))
+            self.assertEqual(len(index), 3)
+            self.assertEqual(scandir.call_count, 0, msg="Unchanged directories are not listed again")
+            self.assertEqual(snapshotPath.stat().st_mtime_ns, written, msg="An unchanged snapshot is not rewritten")
+
+            (root / "b" / "Artist - d.mp3").touch()
+            with patch("ncmlyrics.source.os.scandir", wraps=os.scandir) as scandir:
+                index = asyncio.run(scanner.scan((root,)))
+            self.assertEqual(len(index), 4)
+            self.assertEqual(scandir.call_count, 1, msg="Only the changed directory is listed")
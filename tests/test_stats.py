@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from ncmlyrics.stats import NCMStats, NCMStatsHistogram
+
+
+class TestStats(TestCase):
+    def test_histogram(self) -> None:
+        histogram = NCMStatsHistogram()
+        self.assertIsNone(histogram.quantile(0.5))
+
+        for seconds in (0.0005, 0.003, 0.003, 0.04, 120.0):
+            histogram.record(seconds)
+
+        self.assertEqual(histogram.quantile(0.5), 0.005)
+        self.assertEqual(histogram.quantile(0.99), 120.0, msg="Unbounded bucket falls back to max")
+
+        data = histogram.toData()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["min"], 0.0005)
+        self.assertEqual(data["buckets"], {"le0.001": 1, "le0.005": 2, "le0.05": 1, "inf": 1})
+
+    def test_stats(self) -> None:
+        self.assertEqual(NCMStats.endpoint("/api/v1/album/123"), "/api/v1/album/{id}")
+        self.assertEqual(NCMStats.endpoint("/api/v6/playlist/detail"), "/api/v6/playlist/detail")
+
+        stats = NCMStats()
+        stats.count("api.requests")
+        stats.count("api.requests", 2)
+        with stats.measure("lrc.parse"):
+            pass
+        with stats.phase("export"):
+            pass
+        with stats.phase("export"):
+            pass
+
+        data = stats.toData(results={"written": 1})
+        self.assertEqual(data["counters"], {"api.requests": 3})
+        self.assertEqual(data["histograms"]["lrc.parse"]["count"], 1)
+        self.assertEqual(list(data["phases"]), ["export"])
+        self.assertEqual(data["results"], {"written": 1})
@@ -0,0 +1,127 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+
+from httpx2 import MockTransport, Request, Response
+
+from ncmlyrics.app import NCMLyricsApp
+from ncmlyrics.sync import NCMSyncState
+from ncmlyrics.type import CacheMode, LrcType
+from ncmlyrics.util import loadJson
+
+
+class TestSync(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.output = self.directory / "output"
+        self.output.mkdir()
+
+        # playlistId: trackIds
+        self.playlists: dict[int, list[int]] = {}
+        self.requests: list[str] = []
+
+    def handler(self, request: Request) -> Response:
+        # Connection warm-up
+        if request.method == "HEAD":
+            return Response(404)
+
+        self.requests.append(request.url.path)
+        match request.url.path:
+            case "/api/v6/playlist/detail":
+                playlistId = int(request.url.params["id"])
+                playlist = {
+                    "id": playlistId,
+                    "name": f"playlist {playlistId}",
+                    "tracks": [],
+                    "trackIds": [{"id": trackId} for trackId in self.playlists[playlistId]],
+                }
+                return Response(200, json={"code": 200, "playlist": playlist})
+            case "/api/v3/song/detail":
+                songs = [
+                    {"id": song["id"], "name": f"track {song['id']}", "ar": [{"name": "artist"}]}
+                    for song in loadJson(request.url.params["c"])
+                ]
+                return Response(200, json={"code": 200, "songs": songs})
+            case "/api/song/lyric/v1":
+                return Response(200, json={"code": 200, "lrc": {"lyric": f"[00:01.00]{request.url.params['id']}"}})
+        return Response(404)
+
+    async def sync(self, *playlistIds: int, syncRemove: bool = False) -> NCMLyricsApp:
+        self.requests.clear()
+        app = NCMLyricsApp(
+            exist=False,
+            noPureMusic=False,
+            noProgressBar=True,
+            overwrite=False,
+            quiet=True,
+            types=tuple(LrcType),
+            outputs=(self.output,),
+            links=tuple(f"https://music.163.com/playlist?id={playlistId}" for playlistId in playlistIds),
+            cacheMode=CacheMode.Bypass,
+            sync=True,
+            syncRemove=syncRemove,
+            transport=MockTransport(self.handler),
+            cookiePath=self.directory / "cookies.txt",
+            statePath=self.directory / "state",
+        )
+        await app.run()
+        return app
+
+    def lyricFile(self, trackId: int) -> Path:
+        return self.output / f"artist - track {trackId}.lrc"
+
+    def test_state(self) -> None:
+        path = self.directory / "sync.json"
+        key = NCMSyncState.syncKey(1, (self.directory,), tuple(LrcType))
+
+        state = NCMSyncState(path)
+        self.assertIsNone(state.getTrackIds(key), msg="Never synced")
+
+        state.update(key, [3, 1, 2], {1: self.directory / "A - B.lrc"})
+        state.save()
+
+        state = NCMSyncState(path)
+        self.assertEqual(state.getTrackIds(key), [3, 1, 2])
+        self.assertEqual(state.getPaths(key), {1: self.directory / "A - B.lrc"})
+        self.assertEqual(state.referencedPaths(), {self.directory / "A - B.lrc"})
+        self.assertIsNone(state.getTrackIds(NCMSyncState.syncKey(1, (self.directory,), (LrcType.Origin,))))
+
+    async def test_syncPlaylist(self) -> None:
+        self.playlists[1] = [10, 11]
+        app = await self.sync(1)
+        self.assertEqual(app.writtenCount, 2)
+        self.assertTrue(self.lyricFile(10).exists())
+
+        await self.sync(1)
+        self.assertEqual(self.requests, ["/api/v6/playlist/detail"], msg="An unchanged playlist costs one request")
+
+        self.playlists[1] = [10, 11, 12]
+        app = await self.sync(1)
+        self.assertEqual(app.writtenCount, 1, msg="Only the added track is exported")
+        self.assertTrue(self.lyricFile(12).exists())
+
+        self.playlists[1] = [10, 12]
+        await self.sync(1)
+        self.assertTrue(self.lyricFile(11).exists(), msg="Removed tracks are only reported without --sync-remove")
+
+        key = NCMSyncState.syncKey(1, (self.output,), tuple(LrcType))
+        state = NCMSyncState(self.directory / "state" / "sync.json")
+        self.assertEqual(state.getTrackIds(key), [10, 12])
+        self.assertEqual(state.getPaths(key), {10: self.lyricFile(10), 12: self.lyricFile(12)})
+
+    async def test_syncRemove(self) -> None:
+        self.playlists[1] = [10, 11]
+        self.playlists[2] = [11, 12]
+        await self.sync(1)
+        await self.sync(2)
+
+        self.playlists[1] = [10]
+        await self.sync(1, syncRemove=True)
+        self.assertTrue(self.lyricFile(11).exists(), msg="Playlist 2 still lists the track")
+
+        self.playlists[2] = [12]
+        await self.sync(2, syncRemove=True)
+        self.assertFalse(self.lyricFile(11).exists(), msg="No synced playlist lists the track any more")
+        self.assertTrue(self.lyricFile(12).exists())
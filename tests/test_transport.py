@@ -0,0 +1,58 @@
+from asyncio import sleep
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from unittest import IsolatedAsyncioTestCase
+
+from httpx2 import MockTransport, Request, Response
+
+from ncmlyrics.api import NCMApi
+from ncmlyrics.error import NCMApiRequestError
+from ncmlyrics.retry import RetryPolicy
+from ncmlyrics.transport import NCMRecordingTransport, NCMReplayTransport
+
+
+class TestTransport(IsolatedAsyncioTestCase):
+    async def test_recordReplay(self) -> None:
+        attempts: list[int] = []
+
+        async def handler(request: Request) -> Response:
+            await sleep(0.05)
+            trackId = int(request.url.params["id"])
+            # The first attempt of track 2 is throttled
+            if trackId == 2 and trackId not in attempts:
+                attempts.append(trackId)
+                return Response(503)
+            return Response(200, json={"code": 200, "lrc": {"lyric": f"[00:01.00]{trackId}"}})
+
+        policy = RetryPolicy(backoffBase=0)
+
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "archive.jsonl.gz"
+
+            cookiePath = Path(directory) / "cookies.txt"
+
+            api = NCMApi(
+                retryPolicy=policy,
+                transport=NCMRecordingTransport(path, MockTransport(handler)),
+                cookiePath=cookiePath,
+            )
+            recorded = [await api.getLyricsByTrack(trackId) for trackId in (1, 2)]
+            await api.close()
+
+            replay = NCMReplayTransport(path)
+            self.assertEqual(len(replay), 3, msg="The throttled attempt is recorded too")
+
+            api = NCMApi(retryPolicy=policy, transport=replay, cookiePath=cookiePath)
+            start = perf_counter()
+            self.assertEqual([await api.getLyricsByTrack(trackId) for trackId in (1, 2)], recorded)
+            self.assertGreaterEqual(perf_counter() - start, 0.15, msg="Original latency is kept")
+
+            replay.latencyScale = 0
+            start = perf_counter()
+            self.assertEqual(await api.getLyricsByTrack(2), recorded[1], msg="The last response is repeated")
+            self.assertLess(perf_counter() - start, 0.05)
+
+            with self.assertRaises(NCMApiRequestError):
+                await api.getLyricsByTrack(3)
+            await api.close()
@@ -2,7 +2,7 @@ from unittest import TestCase
 
 from ncmlyrics.error import ParseLinkError, UnsupportedLinkError
 from ncmlyrics.type import LinkType
-from ncmlyrics.util import Link, parseLink
+from ncmlyrics.util import Link, isShortLink, parseLink
 
 
 class TestUtils(TestCase):
@@ -70,6 +70,12 @@ class TestUtils(TestCase):
             msg="Shared song from NCM Android Client player",
         )
 
+    def test_isShortLink(self) -> None:
+        self.assertTrue(isShortLink("http://163cn.tv/xpaQwii"))
+        self.assertTrue(isShortLink("https://163cn.tv/xpaQwii"))
+        self.assertFalse(isShortLink("https://music.163.com/song?id=2621105420"))
+        self.assertFalse(isShortLink("track://163cn.tv"))
+
     def test_parseLink_special(self) -> None:
         self.assertEqual(
             parseLink("ncmlyrics://playlist/123456"),